@@ -3,10 +3,11 @@ from discord import app_commands
 from discord.ext import commands
 import datetime
 import aiohttp
-import io
 import json
 import os
 
+from utils.transcript import HtmlTranscript, batch_files, upload_limit
+
 LOG_CONFIG_FILE = "log_config.json"
 
 
@@ -105,34 +106,35 @@ class AdvancedLogging(commands.Cog):
         if not log_channel:
             return
 
-        # Создаем текстовый файл с удаленными сообщениями
-        log_content = f"Массовое удаление сообщений в #{channel.name}\n"
-        log_content += f"Время: {datetime.datetime.utcnow()}\n"
-        log_content += f"Количество сообщений: {len(messages)}\n"
-        log_content += "=" * 50 + "\n\n"
-
-        for msg in sorted(messages, key=lambda x: x.created_at):
-            if not msg.author.bot:
-                log_content += f"[{msg.created_at.strftime('%Y-%m-%d %H:%M:%S')}] {msg.author.name}: {msg.content}\n"
-                if msg.attachments:
-                    log_content += f"📎 Вложения: {len(msg.attachments)}\n"
-                log_content += "\n"
-
-        # Создаем файл
-        file = discord.File(
-            io.BytesIO(log_content.encode('utf-8')),
-            filename=f"bulk_delete_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
-        )
+        # HTML-транскрипт пишется потоково во временный файл
+        now = datetime.datetime.utcnow()
+        info = [
+            ("Время", now),
+            ("Количество сообщений", len(messages)),
+        ]
+        with HtmlTranscript(f"Массовое удаление сообщений в #{channel.name}", info) as transcript:
+            for msg in sorted(messages, key=lambda x: x.created_at):
+                if not msg.author.bot:
+                    await transcript.add_message(msg)
+
+            # Сжатие и разбиение под лимит вложений — в пуле потоков
+            files = await transcript.finish(
+                f"bulk_delete_{now.strftime('%Y%m%d_%H%M%S')}.html",
+                upload_limit(guild.filesize_limit)
+            )
 
-        embed = discord.Embed(
-            title="💥 Массовое удаление сообщений",
-            color=discord.Color.dark_red(),
-            timestamp=datetime.datetime.utcnow()
-        )
-        embed.add_field(name="Канал", value=channel.mention, inline=True)
-        embed.add_field(name="Количество", value=len(messages), inline=True)
+            embed = discord.Embed(
+                title="💥 Массовое удаление сообщений",
+                color=discord.Color.dark_red(),
+                timestamp=now
+            )
+            embed.add_field(name="Канал", value=channel.mention, inline=True)
+            embed.add_field(name="Количество", value=len(messages), inline=True)
+            if len(files) > 1:
+                embed.add_field(name="Транскрипт", value=f"{len(files)} частей (gzip, собрать через cat)", inline=False)
 
-        await log_channel.send(embed=embed, file=file)
+            for i, batch in enumerate(batch_files(files, upload_limit(guild.filesize_limit))):
+                await log_channel.send(embed=embed if i == 0 else None, files=batch)
 
     @commands.Cog.listener()
     async def on_invite_create(self, invite):
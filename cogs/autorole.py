@@ -10,6 +10,8 @@ WELCOME_CONFIG_FILE = "welcome_channels.json"
 
 
 class AutoRole(commands.Cog):
+    required_intents = ("members",)  # on_member_join
+
     def __init__(self, bot):
         self.bot = bot
         self.welcome_channels: dict[int, int] = self.load_config()
@@ -1,30 +1,75 @@
 # cogs/stream_notifier.py
+import asyncio
 import json
 import os
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional, Set
 
-import aiohttp
 import discord
 from discord.ext import commands, tasks
 
+from utils.live_state import get_live_state
+from utils.twitch_auth import TwitchAppToken
+from utils.stream_scheduler import StreamScheduler
+from utils.twitch_eventsub import EventSubManager
+from utils.youtube_live import QuotaBudget, YouTubeLiveTracker
+
 # ID канала, куда слать уведомления о стримах
 STREAM_ANNOUNCE_CHANNEL_ID = 1411074449087922186  # <-- ПОМЕНЯЙ
 
 # Ключи для API (задай в .env или прямо в коде)
 TWITCH_CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
-TWITCH_TOKEN = os.getenv("TWITCH_TOKEN")
+TWITCH_CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")  # Токен приложения получается и обновляется сам
+TWITCH_TOKEN = os.getenv("TWITCH_TOKEN")  # Статический токен, если секрета нет
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))  # Квота проекта Google Cloud
+
+# EventSub: Twitch присылает начало/конец эфира на дашборд (нужен публичный HTTPS-адрес)
+TWITCH_EVENTSUB_SECRET = os.getenv("TWITCH_EVENTSUB_SECRET")
+TWITCH_EVENTSUB_CALLBACK = os.getenv(
+    "TWITCH_EVENTSUB_CALLBACK", os.getenv("DASHBOARD_HOST", "").rstrip("/") + "/eventsub/twitch"
+)
+EVENTSUB_RECONCILE_INTERVAL = 600  # Сверка подписок, с (раньше — если привязки изменились)
 
 LINKS_FILE = "stream_links.json"
 
+TWITCH_BATCH_SIZE = 100  # Максимум user_login в одном запросе Helix
+TWITCH_CONCURRENCY = 4
+STREAM_REQUESTS_PER_MINUTE = 30  # Общий бюджет запросов проверки стримов
+
 
 class StreamNotifier(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.links: Dict[str, Dict[str, str]] = self.load_links()
-        # cache, чтобы не спамить, если стрим уже объявлен
-        self.currently_live = set()
+        # Объявленные эфиры {"twitch:login" / "yt:id": время}: переживают перезапуск, чтобы не спамить
+        self.live_state = get_live_state()
+        self.currently_live: Dict[str, float] = self.live_state.section("stream_notifier")
+        self.youtube = YouTubeLiveTracker(
+            lambda: self.bot.http_client.session, YOUTUBE_API_KEY,
+            QuotaBudget(daily_limit=YOUTUBE_DAILY_QUOTA)
+        )
+        # Частота проверок по уровням (hot/warm/cold) в пределах бюджета запросов
+        self.scheduler = StreamScheduler(requests_per_minute=STREAM_REQUESTS_PER_MINUTE)
+
+        self.twitch_auth = TwitchAppToken(
+            lambda: self.bot.http_client.session, TWITCH_CLIENT_ID, TWITCH_CLIENT_SECRET, TWITCH_TOKEN
+        )
+
+        # Push-уведомления Twitch; опрос остаётся страховкой
+        self.eventsub: Optional[EventSubManager] = None
+        if self.twitch_auth.configured and TWITCH_EVENTSUB_SECRET and TWITCH_EVENTSUB_CALLBACK.startswith("https://"):
+            self.eventsub = EventSubManager(self.twitch_auth, TWITCH_EVENTSUB_CALLBACK, TWITCH_EVENTSUB_SECRET)
+        self._eventsub_tasks = set()
+        self._eventsub_logins: Optional[Set[str]] = None
+        self._eventsub_next = 0.0
+
         self.check_streams.start()
+        if self.eventsub:
+            self.sync_eventsub.start()
+
+    async def cog_load(self):
+        self.live_state.load()
 
     # ---------- Работа с файлом ----------
 
@@ -51,6 +96,7 @@ class StreamNotifier(commands.Cog):
             "`!stream linktwitch <логин>` — привязать Twitch\n"
             "`!stream linkyoutube <channel_id>` — привязать YouTube\n"
             "`!stream show` — показать привязки\n"
+            "`!stream tiers` — частота проверок и EventSub\n"
             "`!stream unlink <twitch|youtube>` — отвязать"
         )
 
@@ -92,6 +138,27 @@ class StreamNotifier(commands.Cog):
             f"• YouTube: `{yt}`"
         )
 
+    @stream_group.command(name="tiers")
+    async def show_tiers(self, ctx: commands.Context):
+        """Показать, как часто сейчас проверяются аккаунты."""
+        tiers = self.scheduler.tiers()
+        expires_in = self.twitch_auth.expires_in
+        if not self.twitch_auth.can_refresh:
+            token = "статический TWITCH_TOKEN" if self.twitch_auth.configured else "не настроен"
+        else:
+            token = (f"истекает через {expires_in / 3600:.1f} ч" if expires_in else "ещё не получен") + \
+                f", обновлений {self.twitch_auth.stats['refreshes']}"
+        await ctx.send(
+            "📡 Частота проверок:\n"
+            f"• 🔥 раз в минуту: {tiers['hot']}\n"
+            f"• 🌤️ раз в 5 минут: {tiers['warm']}\n"
+            f"• ❄️ раз в 30 минут: {tiers['cold']}\n"
+            + (f"📨 EventSub: {len(self.eventsub.covered)} логинов, "
+               f"уведомлений {self.eventsub.stats['notifications']}"
+               if self.eventsub else "📨 EventSub: выключен")
+            + f"\n🔑 Токен Twitch: {token}"
+        )
+
     @stream_group.command(name="unlink")
     async def unlink(self, ctx: commands.Context, platform: str):
         """Отвязать Twitch или YouTube: !stream unlink twitch / youtube."""
@@ -116,129 +183,209 @@ class StreamNotifier(commands.Cog):
 
     # ---------- Проверка стримов ----------
 
-    @tasks.loop(minutes=2)
+    @tasks.loop(seconds=15)
     async def check_streams(self):
         await self.bot.wait_until_ready()
-        channel = self.bot.get_channel(STREAM_ANNOUNCE_CHANNEL_ID)
-        if channel is None:
-            return
-
-        async with aiohttp.ClientSession() as session:
-            for uid, accs in list(self.links.items()):
-                user_mention = f"<@{uid}>"
-
-                # Twitch
-                twitch_login = accs.get("twitch")
-                if twitch_login:
-                    key = f"twitch:{twitch_login}"
-                    is_live, info = await self.check_twitch_live(session, twitch_login)
-                    if is_live and key not in self.currently_live:
-                        self.currently_live.add(key)
-                        title = info.get("title", "Без названия")
-                        url = f"https://twitch.tv/{twitch_login}"
-                        emb = discord.Embed(
-                            title=f"{user_mention} начал стрим на Twitch!",
-                            description=f"**{title}**\n{url}",
-                            color=discord.Color.purple(),
-                        )
-                        await channel.send(content=user_mention, embed=emb)
-                    elif not is_live and key in self.currently_live:
-                        self.currently_live.remove(key)
-
-                # YouTube
-                yt_id = accs.get("youtube")
-                if yt_id:
-                    key = f"yt:{yt_id}"
-                    is_live, info = await self.check_youtube_live(session, yt_id)
-                    if is_live and key not in self.currently_live:
-                        self.currently_live.add(key)
-                        title = info.get("title", "Без названия")
-                        url = info.get("url", "https://youtube.com/")
-                        emb = discord.Embed(
-                            title=f"{user_mention} запустил стрим на YouTube!",
-                            description=f"**{title}**\n{url}",
-                            color=discord.Color.red(),
-                        )
-                        await channel.send(content=user_mention, embed=emb)
-                    elif not is_live and key in self.currently_live:
-                        self.currently_live.remove(key)
+        twitch_users, youtube_users = self.linked_accounts()
+
+        # Какие аккаунты пора проверять — решает расписание по уровням
+        keys = [f"twitch:{login}" for login in twitch_users] + [f"yt:{yt_id}" for yt_id in youtube_users]
+        self.scheduler.sync(keys)
+        for key in set(self.currently_live) - set(keys):
+            self.clear_live(key)  # Отвязанные аккаунты
+        due = self.scheduler.due()
+        due_twitch = [key.split(":", 1)[1] for key in due if key.startswith("twitch:")]
+        due_youtube = [key.split(":", 1)[1] for key in due if key.startswith("yt:")]
+
+        # Twitch: логины пачками, затем один проход по разнице с currently_live
+        if due_twitch:
+            live, checked = await self.check_twitch_live_batch(due_twitch)
+            for login in due_twitch:
+                self.scheduler.complete(f"twitch:{login}", login in live if login in checked else None)
+            for login in checked:
+                key = f"twitch:{login}"
+                if login in live and key not in self.currently_live:
+                    self.mark_live(key)
+                    await self.announce_twitch(login, twitch_users[login], live[login].get("title"))
+                elif login not in live:
+                    self.clear_live(key, twitch_users[login])
+
+        # YouTube: RSS-ленты + пакетные videos.list в пределах квоты
+        if due_youtube:
+            live, checked = await self.youtube.poll(due_youtube, linked=list(youtube_users))
+            for yt_id in due_youtube:
+                self.scheduler.complete(f"yt:{yt_id}", yt_id in live if yt_id in checked else None)
+            for yt_id in checked:
+                key = f"yt:{yt_id}"
+                if yt_id in live and key not in self.currently_live:
+                    self.mark_live(key)
+                    await self.announce_youtube(youtube_users[yt_id], live[yt_id].get("title"),
+                                                live[yt_id].get("url", "https://youtube.com/"))
+                elif yt_id not in live:
+                    self.clear_live(key, youtube_users[yt_id])
+
+        self.scheduler.save_history()
 
     @check_streams.before_loop
     async def before_check_streams(self):
         await self.bot.wait_until_ready()
 
-    def cog_unload(self):
-        self.check_streams.cancel()
+    def mark_live(self, key: str):
+        self.currently_live[key] = time.time()
+        self.live_state.changed()
+
+    def clear_live(self, key: str, uids: Optional[List[str]] = None):
+        if self.currently_live.pop(key, None) is not None:
+            self.live_state.changed()
+            if uids:
+                self.bot.dispatch("stream_offline", uids)
+
+    def linked_accounts(self):
+        """({twitch_login: [uid]}, {youtube_channel_id: [uid]})"""
+        twitch_users: Dict[str, List[str]] = {}
+        youtube_users: Dict[str, List[str]] = {}
+        for uid, accs in list(self.links.items()):
+            if accs.get("twitch"):
+                twitch_users.setdefault(accs["twitch"], []).append(uid)
+            if accs.get("youtube"):
+                youtube_users.setdefault(accs["youtube"], []).append(uid)
+        return twitch_users, youtube_users
+
+    async def announce_twitch(self, login: str, uids: List[str], title: Optional[str]):
+        url = f"https://twitch.tv/{login}"
+        # Анонсы по серверам (StreamNotifications в режиме polling)
+        self.bot.dispatch("stream_live", uids, url, title)
+        channel = self.bot.get_channel(STREAM_ANNOUNCE_CHANNEL_ID)
+        if channel is None:
+            return
+        user_mention = " ".join(f"<@{uid}>" for uid in uids)
+        emb = discord.Embed(
+            title=f"{user_mention} начал стрим на Twitch!",
+            description=f"**{title or 'Без названия'}**\n{url}",
+            color=discord.Color.purple(),
+        )
+        await channel.send(content=user_mention, embed=emb)
 
-    # ---------- Twitch API ----------
+    async def announce_youtube(self, uids: List[str], title: Optional[str], url: str):
+        self.bot.dispatch("stream_live", uids, url, title)
+        channel = self.bot.get_channel(STREAM_ANNOUNCE_CHANNEL_ID)
+        if channel is None:
+            return
+        user_mention = " ".join(f"<@{uid}>" for uid in uids)
+        emb = discord.Embed(
+            title=f"{user_mention} запустил стрим на YouTube!",
+            description=f"**{title or 'Без названия'}**\n{url}",
+            color=discord.Color.red(),
+        )
+        await channel.send(content=user_mention, embed=emb)
 
-    async def check_twitch_live(self, session: aiohttp.ClientSession, login: str):
-        """
-        Возвращает (is_live: bool, info: dict)
-        info: {title: str}
-        """
-        if not TWITCH_CLIENT_ID or not TWITCH_TOKEN:
-            return False, {}
+    # ---------- EventSub ----------
 
-        headers = {
-            "Client-ID": TWITCH_CLIENT_ID,
-            "Authorization": f"Bearer {TWITCH_TOKEN}",
-        }
-        params = {"user_login": login}
+    @tasks.loop(minutes=1)
+    async def sync_eventsub(self):
+        """Сверить подписки EventSub с привязками"""
+        logins = set(self.linked_accounts()[0])
+        if logins == self._eventsub_logins and time.time() < self._eventsub_next:
+            return
+        pending = await self.eventsub.reconcile(sorted(logins))
+        self._eventsub_logins = logins
+        # Пока Twitch подтверждает адрес или Helix не отвечает, проверяем снова через минуту
+        self._eventsub_next = time.time() + (60 if pending else EVENTSUB_RECONCILE_INTERVAL)
+        self.scheduler.covered = {f"twitch:{login}" for login in self.eventsub.covered}
+
+    @sync_eventsub.before_loop
+    async def before_sync_eventsub(self):
+        await self.bot.wait_until_ready()
 
-        url = "https://api.twitch.tv/helix/streams"
-        try:
-            async with session.get(url, headers=headers, params=params) as resp:
-                if resp.status != 200:
-                    return False, {}
-                data = await resp.json()
-        except Exception:
-            return False, {}
+    def dispatch_eventsub(self, subscription_type: str, event: dict):
+        """Вызывается дашбордом: обработка идёт в фоне, Twitch сразу получает ответ"""
+        self.eventsub.stats["notifications"] += 1
+        task = asyncio.create_task(self.handle_eventsub(subscription_type, event))
+        self._eventsub_tasks.add(task)
+        task.add_done_callback(self._eventsub_tasks.discard)
+
+    def eventsub_revoked(self, subscription: dict):
+        """Twitch отозвал подписку (канал удалён, токен отозван и т.п.) — пересоздать при сверке"""
+        self.eventsub.stats["revoked"] += 1
+        broadcaster_id = subscription.get("condition", {}).get("broadcaster_user_id")
+        print(f"⚠️ EventSub: подписка {subscription.get('type')} ({broadcaster_id}) отозвана: {subscription.get('status')}")
+        self._eventsub_next = 0.0
+
+    async def handle_eventsub(self, subscription_type: str, event: dict):
+        login = event.get("broadcaster_user_login", "").lower()
+        key = f"twitch:{login}"
+        twitch_users = self.linked_accounts()[0]
+        if login not in twitch_users:
+            return
 
-        streams = data.get("data", [])
-        if not streams:
-            return False, {}
+        if subscription_type == "stream.offline":
+            self.clear_live(key, twitch_users[login])
+            self.scheduler.complete(key, False)
+            return
+        if subscription_type != "stream.online" or event.get("type", "live") != "live":
+            return
 
-        stream = streams[0]
-        return True, {"title": stream.get("title", "")}
+        self.scheduler.complete(key, True)
+        if key in self.currently_live:
+            return
+        self.mark_live(key)
 
-    # ---------- YouTube API ----------
+        # В событии нет названия стрима: один запрос к /channels (в /streams эфир появляется позже)
+        title = await self.fetch_twitch_title(event.get("broadcaster_user_id"))
+        await self.announce_twitch(login, twitch_users[login], title)
+        self.scheduler.save_history()
 
-    async def check_youtube_live(self, session: aiohttp.ClientSession, channel_id: str):
-        """
-        Возвращает (is_live: bool, info: dict)
-        info: {title: str, url: str}
-        """
-        if not YOUTUBE_API_KEY:
-            return False, {}
-
-        # Ищем live-видео на канале
-        url = "https://www.googleapis.com/youtube/v3/search"
-        params = {
-            "part": "snippet",
-            "channelId": channel_id,
-            "eventType": "live",
-            "type": "video",
-            "key": YOUTUBE_API_KEY,
-            "maxResults": 1,
-        }
-        try:
-            async with session.get(url, params=params) as resp:
-                if resp.status != 200:
-                    return False, {}
-                data = await resp.json()
-        except Exception:
-            return False, {}
+    def cog_unload(self):
+        self.check_streams.cancel()
+        self.sync_eventsub.cancel()
+        for task in self._eventsub_tasks:
+            task.cancel()
+        self.scheduler.save_history()
+        self.live_state.flush()
 
-        items = data.get("items", [])
-        if not items:
-            return False, {}
+    # ---------- Twitch API ----------
 
-        video = items[0]
-        vid_id = video["id"]["videoId"]
-        title = video["snippet"]["title"]
-        url = f"https://www.youtube.com/watch?v={vid_id}"
-        return True, {"title": title, "url": url}
+    async def check_twitch_live_batch(self, logins: List[str]):
+        """
+        Возвращает (live: {login: info}, checked: set логинов)
+        Helix принимает до 100 user_login за запрос; пачки идут параллельно.
+        checked — логины из успешных запросов: при ошибке статус остальных не меняем.
+        """
+        live: Dict[str, dict] = {}
+        checked: Set[str] = set()
+        if not self.twitch_auth.configured:
+            return live, checked
+
+        semaphore = asyncio.Semaphore(TWITCH_CONCURRENCY)
+
+        async def fetch(chunk: List[str]):
+            params = [("user_login", login) for login in chunk] + [("first", "100")]
+            async with semaphore:
+                status, data = await self.twitch_auth.request("GET", "https://api.twitch.tv/helix/streams",
+                                                              params=params)
+            if status != 200 or not isinstance(data, dict):
+                return
+
+            checked.update(chunk)
+            for stream in data.get("data", []):
+                login = stream.get("user_login", "").lower()
+                if stream.get("type", "live") == "live":
+                    live[login] = {"title": stream.get("title", "")}
+
+        chunks = [logins[i:i + TWITCH_BATCH_SIZE] for i in range(0, len(logins), TWITCH_BATCH_SIZE)]
+        await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+        return live, checked
+
+    async def fetch_twitch_title(self, broadcaster_id: Optional[str]) -> Optional[str]:
+        """Название стрима из настроек канала; None — не удалось"""
+        if not broadcaster_id or not self.twitch_auth.configured:
+            return None
+        status, data = await self.twitch_auth.request("GET", "https://api.twitch.tv/helix/channels",
+                                                      params={"broadcaster_id": broadcaster_id})
+        if status != 200 or not isinstance(data, dict):
+            return None
+        channels = data.get("data", [])
+        return channels[0].get("title") if channels else None
 
 
 async def setup(bot: commands.Bot):
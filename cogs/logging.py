@@ -6,11 +6,30 @@ import json
 import os
 from typing import Optional
 
+from utils.audit_log import AuditLogFetcher, add_audit_fields
+from utils.log_pipeline import (EVENT_CLASSES, LOG_CLASSES, LOG_CLASS_TITLES, LogPipeline,
+                                normalize_priority_classes)
+from utils.timer_wheel import TimerWheel
+
 
 class Logging(commands.Cog):
+    required_intents = ("members",)  # on_member_* события
+
     def __init__(self, bot):
         self.bot = bot
         self.config_file = "logging_config.json"
+        self.audit_fetchers = {}  # guild_id -> AuditLogFetcher
+
+        # Объединение всплесков голосовых событий (переподключения, мьют/анмьют)
+        self.voice_debounce_seconds = 10  # Окно затишья перед отправкой
+        self.voice_max_hold = 60  # Максимальная задержка записи
+        self.voice_sessions = {}  # (guild_id, member_id) -> накопленные события
+        self.voice_wheel = TimerWheel(tick=1.0)
+
+        # Приоритетная очередь отправки логов
+        self.priority_cache = {}  # guild_id -> нормализованные настройки классов
+        self.log_pipeline = LogPipeline(self.deliver_logs, self.get_priority_classes)
+
         self.load_config()
 
     def load_config(self):
@@ -21,6 +40,7 @@ class Logging(commands.Cog):
         else:
             self.config = {}
             self.save_config()
+        self.priority_cache = {}
 
     def save_config(self):
         """Сохраняет конфигурацию"""
@@ -51,6 +71,7 @@ class Logging(commands.Cog):
         if guild_id not in self.config:
             self.config[guild_id] = self.get_guild_config(guild_id)
         self.config[guild_id][key] = value
+        self.priority_cache.pop(int(guild_id), None)
         self.save_config()
 
     async def get_log_channel(self, guild):
@@ -72,18 +93,40 @@ class Logging(commands.Cog):
 
         return log_channel
 
-    async def send_log(self, guild, embed, event_type):
-        """Отправляет лог в канал если событие включено"""
+    def is_event_enabled(self, guild, event_type):
+        """Проверяет, включено ли логирование события на сервере"""
         guild_config = self.get_guild_config(guild.id)
+        return guild_config["enabled_events"].get(event_type, True)
+
+    async def find_audit_entry(self, guild, action, target_id):
+        """Ищет запись журнала аудита (запросы объединяются по серверу)"""
+        fetcher = self.audit_fetchers.get(guild.id)
+        if fetcher is None:
+            fetcher = self.audit_fetchers[guild.id] = AuditLogFetcher(guild)
+        return await fetcher.lookup(action, target_id)
+
+    def get_priority_classes(self, guild_id):
+        """Настройки классов приоритета для сервера (с кэшем)"""
+        classes = self.priority_cache.get(guild_id)
+        if classes is None:
+            raw = self.get_guild_config(guild_id).get("priority_classes")
+            classes = self.priority_cache[guild_id] = normalize_priority_classes(raw)
+        return classes
 
+    async def send_log(self, guild, embed, event_type):
+        """Ставит лог в очередь своего класса приоритета если событие включено"""
         # Проверяем включено ли логирование этого события
-        if not guild_config["enabled_events"].get(event_type, True):
+        if not self.is_event_enabled(guild, event_type):
             return
 
+        self.log_pipeline.put(guild, EVENT_CLASSES.get(event_type, "message"), embed)
+
+    async def deliver_logs(self, guild, embeds):
+        """Отправляет пачку эмбедов из очереди в канал логов"""
         log_channel = await self.get_log_channel(guild)
         if log_channel:
             try:
-                await log_channel.send(embed=embed)
+                await log_channel.send(embeds=embeds)
             except:
                 pass  # Если нет прав для отправки
 
@@ -191,6 +234,9 @@ class Logging(commands.Cog):
     @commands.Cog.listener()
     async def on_member_ban(self, guild, user):
         """Логирование бана"""
+        if not self.is_event_enabled(guild, "member_ban"):
+            return
+
         embed = discord.Embed(
             title="🔨 Участник забанен",
             color=discord.Color.red(),
@@ -200,13 +246,9 @@ class Logging(commands.Cog):
         embed.add_field(name="Участник", value=f"{user.name}#{user.discriminator}", inline=True)
         embed.add_field(name="ID", value=user.id, inline=True)
 
-        # Пытаемся получить информацию о бане
-        try:
-            ban = await guild.fetch_ban(user)
-            if ban.reason:
-                embed.add_field(name="Причина", value=ban.reason, inline=False)
-        except:
-            pass
+        # Модератор и причина из журнала аудита (один запрос на всплеск банов)
+        entry = await self.find_audit_entry(guild, discord.AuditLogAction.ban, user.id)
+        add_audit_fields(embed, entry)
 
         embed.set_thumbnail(url=user.avatar.url if user.avatar else user.default_avatar.url)
 
@@ -215,6 +257,9 @@ class Logging(commands.Cog):
     @commands.Cog.listener()
     async def on_member_unban(self, guild, user):
         """Логирование разбана"""
+        if not self.is_event_enabled(guild, "member_unban"):
+            return
+
         embed = discord.Embed(
             title="🔓 Участник разбанен",
             color=discord.Color.green(),
@@ -224,6 +269,9 @@ class Logging(commands.Cog):
         embed.add_field(name="Участник", value=f"{user.name}#{user.discriminator}", inline=True)
         embed.add_field(name="ID", value=user.id, inline=True)
 
+        entry = await self.find_audit_entry(guild, discord.AuditLogAction.unban, user.id)
+        add_audit_fields(embed, entry)
+
         embed.set_thumbnail(url=user.avatar.url if user.avatar else user.default_avatar.url)
 
         await self.send_log(guild, embed, "member_unban")
@@ -232,7 +280,7 @@ class Logging(commands.Cog):
     async def on_member_update(self, before, after):
         """Логирование изменений участника"""
         # Смена ника
-        if before.display_name != after.display_name:
+        if before.display_name != after.display_name and self.is_event_enabled(after.guild, "member_update"):
             embed = discord.Embed(
                 title="👤 Смена ника",
                 color=discord.Color.blue(),
@@ -241,11 +289,17 @@ class Logging(commands.Cog):
             embed.add_field(name="Участник", value=after.mention, inline=True)
             embed.add_field(name="Было", value=before.display_name, inline=True)
             embed.add_field(name="Стало", value=after.display_name, inline=True)
+
+            # Глобальное имя меняется без записи в журнале аудита
+            if before.nick != after.nick:
+                entry = await self.find_audit_entry(after.guild, discord.AuditLogAction.member_update, after.id)
+                add_audit_fields(embed, entry)
+
             embed.set_thumbnail(url=after.avatar.url if after.avatar else after.default_avatar.url)
             await self.send_log(after.guild, embed, "member_update")
 
         # Смена ролей
-        if before.roles != after.roles:
+        if before.roles != after.roles and self.is_event_enabled(after.guild, "role_changes"):
             added_roles = [role for role in after.roles if role not in before.roles]
             removed_roles = [role for role in before.roles if role not in after.roles]
 
@@ -264,6 +318,9 @@ class Logging(commands.Cog):
                     embed.add_field(name="Удалены", value=", ".join([role.mention for role in removed_roles]),
                                     inline=False)
 
+                entry = await self.find_audit_entry(after.guild, discord.AuditLogAction.member_role_update, after.id)
+                add_audit_fields(embed, entry)
+
                 embed.set_thumbnail(url=after.avatar.url if after.avatar else after.default_avatar.url)
                 await self.send_log(after.guild, embed, "role_changes")
 
@@ -271,6 +328,9 @@ class Logging(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel):
         """Логирование создания канала"""
+        if not self.is_event_enabled(channel.guild, "channel_changes"):
+            return
+
         embed = discord.Embed(
             title="📁 Канал создан",
             color=discord.Color.green(),
@@ -282,11 +342,17 @@ class Logging(commands.Cog):
         embed.add_field(name="Название", value=channel.name, inline=True)
         embed.add_field(name="Категория", value=channel.category.name if channel.category else "Нет", inline=True)
 
+        entry = await self.find_audit_entry(channel.guild, discord.AuditLogAction.channel_create, channel.id)
+        add_audit_fields(embed, entry)
+
         await self.send_log(channel.guild, embed, "channel_changes")
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel):
         """Логирование удаления канала"""
+        if not self.is_event_enabled(channel.guild, "channel_changes"):
+            return
+
         embed = discord.Embed(
             title="🗑️ Канал удалён",
             color=discord.Color.red(),
@@ -298,6 +364,9 @@ class Logging(commands.Cog):
         embed.add_field(name="Название", value=channel.name, inline=True)
         embed.add_field(name="Категория", value=channel.category.name if channel.category else "Нет", inline=True)
 
+        entry = await self.find_audit_entry(channel.guild, discord.AuditLogAction.channel_delete, channel.id)
+        add_audit_fields(embed, entry)
+
         await self.send_log(channel.guild, embed, "channel_changes")
 
     @commands.Cog.listener()
@@ -313,7 +382,7 @@ class Logging(commands.Cog):
             after_cat = after.category.name if after.category else "Нет"
             changes.append(f"**Категория:** {before_cat} → {after_cat}")
 
-        if changes:
+        if changes and self.is_event_enabled(after.guild, "channel_changes"):
             embed = discord.Embed(
                 title="⚙️ Канал изменён",
                 color=discord.Color.blue(),
@@ -325,12 +394,68 @@ class Logging(commands.Cog):
             embed.add_field(name="Канал", value=after.mention, inline=True)
             embed.add_field(name="Изменения", value="\n".join(changes), inline=False)
 
+            entry = await self.find_audit_entry(after.guild, discord.AuditLogAction.channel_update, after.id)
+            add_audit_fields(embed, entry)
+
             await self.send_log(after.guild, embed, "channel_changes")
 
     # ===== ГОЛОСОВЫЕ КАНАЛЫ =====
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
-        """Логирование изменений голосового статуса"""
+        """Логирование изменений голосового статуса (с объединением всплесков)"""
+        # Интересуют только смена канала и самомьют
+        if before.channel == after.channel and before.self_mute == after.self_mute:
+            return
+
+        if not self.is_event_enabled(member.guild, "voice_changes"):
+            return
+
+        key = (member.guild.id, member.id)
+        now = datetime.datetime.utcnow()
+        session = self.voice_sessions.get(key)
+
+        if session is None:
+            session = self.voice_sessions[key] = {
+                "member": member,
+                "first_at": now,
+                "last_at": now,
+                "first_event": (before, after),
+                "events": 0,
+                "channels": [before.channel.name if before.channel else None],
+                "mute_toggles": 0,
+            }
+
+        session["member"] = member
+        session["last_at"] = now
+        session["events"] += 1
+
+        if before.channel != after.channel:
+            session["channels"].append(after.channel.name if after.channel else None)
+        elif before.self_mute != after.self_mute:
+            session["mute_toggles"] += 1
+
+        # Ждём затишья, но не дольше voice_max_hold с первого события
+        held = (now - session["first_at"]).total_seconds()
+        delay = max(0, min(self.voice_debounce_seconds, self.voice_max_hold - held))
+        self.voice_wheel.schedule(key, delay, lambda: self.flush_voice_session(key))
+
+    async def flush_voice_session(self, key):
+        """Отправляет накопленные голосовые события участника одной записью"""
+        session = self.voice_sessions.pop(key, None)
+        if session is None:
+            return
+
+        member = session["member"]
+        if session["events"] == 1:
+            embed = self.build_voice_embed(member, *session["first_event"])
+        else:
+            embed = self.build_voice_summary_embed(member, session)
+
+        if embed:
+            await self.send_log(member.guild, embed, "voice_changes")
+
+    def build_voice_embed(self, member, before, after):
+        """Эмбед для одиночного изменения голосового статуса"""
         # Вход в голосовой канал
         if not before.channel and after.channel:
             embed = discord.Embed(
@@ -340,7 +465,7 @@ class Logging(commands.Cog):
             )
             embed.add_field(name="Участник", value=member.mention, inline=True)
             embed.add_field(name="Канал", value=after.channel.name, inline=True)
-            await self.send_log(member.guild, embed, "voice_changes")
+            return embed
 
         # Выход из голосового канала
         elif before.channel and not after.channel:
@@ -351,7 +476,7 @@ class Logging(commands.Cog):
             )
             embed.add_field(name="Участник", value=member.mention, inline=True)
             embed.add_field(name="Канал", value=before.channel.name, inline=True)
-            await self.send_log(member.guild, embed, "voice_changes")
+            return embed
 
         # Смена голосового канала
         elif before.channel and after.channel and before.channel != after.channel:
@@ -363,7 +488,7 @@ class Logging(commands.Cog):
             embed.add_field(name="Участник", value=member.mention, inline=True)
             embed.add_field(name="Было", value=before.channel.name, inline=True)
             embed.add_field(name="Стало", value=after.channel.name, inline=True)
-            await self.send_log(member.guild, embed, "voice_changes")
+            return embed
 
         # Мьют/дефьют
         elif before.self_mute != after.self_mute:
@@ -375,7 +500,46 @@ class Logging(commands.Cog):
             )
             embed.add_field(name="Участник", value=member.mention, inline=True)
             embed.add_field(name="Канал", value=after.channel.name if after.channel else "Неизвестно", inline=True)
-            await self.send_log(member.guild, embed, "voice_changes")
+            return embed
+
+        return None
+
+    def build_voice_summary_embed(self, member, session):
+        """Сводный эмбед для серии голосовых событий, например: вход в A → B → выход за 12с"""
+        route = []
+        channels = session["channels"]
+        for i, name in enumerate(channels):
+            if name is None:
+                if i > 0:
+                    route.append("выход")
+            elif i > 0 and channels[i - 1] is None:
+                route.append(f"вход в {name}")
+            else:
+                route.append(name)
+
+        seconds = int((session["last_at"] - session["first_at"]).total_seconds())
+
+        embed = discord.Embed(
+            title="🎧 Голосовая активность",
+            color=discord.Color.blue(),
+            timestamp=datetime.datetime.utcnow()
+        )
+        embed.add_field(name="Участник", value=member.mention, inline=True)
+        embed.add_field(name="Событий", value=session["events"], inline=True)
+        embed.add_field(name="Длительность", value=f"{seconds}с", inline=True)
+
+        if len(route) > 1:
+            route_text = " → ".join(route)
+            if len(route_text) > 1024:
+                route_text = "… → " + route_text[-1020:]
+            embed.add_field(name="Маршрут", value=f"{route_text} за {seconds}с", inline=False)
+        elif route:
+            embed.add_field(name="Канал", value=route[0], inline=True)
+
+        if session["mute_toggles"]:
+            embed.add_field(name="Самомьют", value=f"переключался {session['mute_toggles']} раз", inline=True)
+
+        return embed
 
     # ===== СЛЭШ-КОМАНДЫ ДЛЯ НАСТРОЙКИ =====
     @app_commands.command(name="logs_channel", description="Установить канал для логов")
@@ -506,6 +670,18 @@ class Logging(commands.Cog):
                 inline=True
             )
 
+        # Классы приоритета и состояние очереди
+        classes = self.get_priority_classes(interaction.guild_id)
+        sizes = self.log_pipeline.queue_sizes(interaction.guild_id)
+        dropped = self.log_pipeline.dropped.get(interaction.guild_id, {})
+        policy_names = {"delay": "ожидание", "coalesce": "объединение", "drop": "отбрасывание"}
+        priority_lines = [
+            f"**{LOG_CLASS_TITLES[c]}** — вес {classes[c]['weight']}, {policy_names[classes[c]['policy']]}, "
+            f"в очереди {sizes[c]}, отброшено {dropped.get(c, 0)}"
+            for c in LOG_CLASSES
+        ]
+        embed.add_field(name="⚖️ Приоритеты", value="\n".join(priority_lines), inline=False)
+
         embed.add_field(
             name="📋 Команды",
             value=(
@@ -540,6 +716,14 @@ class Logging(commands.Cog):
         else:
             await interaction.response.send_message("❌ Канал логов не найден! Установите его командой `/logs_channel`", ephemeral=True)
 
+    async def cog_unload(self):
+        self.voice_wheel.stop()
+        # Накопленные голосовые события отправляем сразу, а не теряем
+        for key in list(self.voice_sessions):
+            await self.flush_voice_session(key)
+        await self.log_pipeline.drain()
+        self.log_pipeline.stop()
+
 
 async def setup(bot):
     await bot.add_cog(Logging(bot))
\ No newline at end of file
@@ -61,6 +61,8 @@ class Moder(commands.Cog):
     - ручные мьюты: /mute / /unmute / /tempmute / /muted_list / /muteinfo
     """
 
+    required_intents = ("members", "message_content")  # Фильтры текста, on_member_join
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.warnings = self.load_warnings()
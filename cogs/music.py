@@ -2,13 +2,18 @@
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
-import yt_dlp as youtube_dl
 import asyncio
+import audioop
 from collections import deque
 import math
 import datetime
 import random
 
+from utils.progress_updater import ProgressUpdater
+from utils.track_prefetch import TrackPrefetcher
+from utils.ytdl_cache import YTDLCache
+from utils.ytdl_pool import YTDLPool
+
 # Улучшенные настройки для yt-dlp с обработкой ошибок
 ytdl_format_options = {
     'format': 'bestaudio/best',
@@ -41,36 +46,16 @@ ffmpeg_options = {
     'options': '-vn -bufsize 512k -af volume=0.15 -max_muxing_queue_size 1024'
 }
 
+PREFETCH_SECONDS = 15  # За сколько секунд до конца трека готовить следующий
+PRIME_TIMEOUT = 15  # Сколько ждать первого кадра от FFmpeg
 
-# Создаем ytdl с обработчиком ошибок
-class CustomYTDL(youtube_dl.YoutubeDL):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def extract_info(self, url, download=True, process=False, force_generic_extractor=False):
-        try:
-            return super().extract_info(url, download, process, force_generic_extractor)
-        except Exception as e:
-            print(f"YTDL Error: {e}")
-            # Пробуем альтернативный подход
-            return self._extract_with_fallback(url)
-
-    def _extract_with_fallback(self, url):
-        # Альтернативные настройки для проблемных видео
-        fallback_options = self.params.copy()
-        fallback_options.update({
-            'format': 'worstaudio/worst',
-            'retries': 20,
-            'fragment_retries': 20,
-            'skip_unavailable_fragments': True,
-            'ignoreerrors': True,
-        })
 
-        with youtube_dl.YoutubeDL(fallback_options) as ytdl_fallback:
-            return ytdl_fallback.extract_info(url, download=False)
+# Извлечение в отдельных процессах: yt-dlp не держит GIL основного процесса
+ytdl_pool = YTDLPool(ytdl_format_options)
 
 
-ytdl = CustomYTDL(ytdl_format_options)
+# Метаданные треков и ссылки на потоки: повторные /play не ходят в yt-dlp
+ytdl_cache = YTDLCache(ytdl_pool.extract)
 
 
 class Song:
@@ -147,6 +132,15 @@ class Song:
 
         return embed
 
+    def progress_signature(self):
+        """Видимое состояние прогресса: сообщение правится, только когда оно меняется"""
+        bar = None
+        if self.duration:
+            current_pos = self.get_current_position()
+            if current_pos < self.duration:
+                bar = self.create_progress_bar(current_pos, self.duration)
+        return bar, self.is_paused
+
     def create_progress_bar(self, elapsed, total, length=15):
         progress = min(elapsed / total, 1.0)
         filled = int(length * progress)
@@ -165,6 +159,29 @@ class YTDLSource(discord.PCMVolumeTransformer):
         self.data = data
         self.title = data.get('title')
         self.url = data.get('url')
+        self._primed = None  # Первый кадр, прочитанный заранее
+
+    @classmethod
+    async def prepare(cls, url):
+        """Источник, у которого FFmpeg уже запущен и отдал первый кадр (для заготовки следующего трека)"""
+        data = await ytdl_cache.get(url, stream=True)
+        player = cls(discord.FFmpegPCMAudio(data['url'], **ffmpeg_options), data=data)
+        try:
+            frame = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, player.original.read),
+                                           PRIME_TIMEOUT)
+            if not frame:
+                raise Exception("FFmpeg не отдал звук")
+            player._primed = frame
+        except BaseException:
+            player.cleanup()  # Завершает FFmpeg, в том числе при отмене заготовки
+            raise
+        return player
+
+    def read(self):
+        if self._primed is not None:
+            frame, self._primed = self._primed, None
+            return audioop.mul(frame, 2, min(self.volume, 2.0))
+        return super().read()
 
     @classmethod
     async def from_url(cls, url, *, loop=None, stream=False, retry_count=0):
@@ -175,16 +192,18 @@ class YTDLSource(discord.PCMVolumeTransformer):
             raise Exception("Не удалось загрузить трек после нескольких попыток")
 
         try:
-            data = await loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=not stream))
-
-            if 'entries' in data:
-                data = data['entries'][0]
+            if stream:
+                data = await ytdl_cache.get(url, stream=True)
+            else:
+                data = await ytdl_pool.extract(url, download=True)
 
-            filename = data['url'] if stream else ytdl.prepare_filename(data)
+            filename = data['url'] if stream else data['filepath']
             return cls(discord.FFmpegPCMAudio(filename, **ffmpeg_options), data=data)
 
         except Exception as e:
             print(f"Ошибка при загрузке {url}: {e}")
+            if stream:
+                ytdl_cache.invalidate_stream(url)  # Возможно, протухла ссылка из кэша
             # Ретри с экспоненциальной задержкой
             delay = min(2 ** retry_count, 10)  # Макс 10 секунд
             await asyncio.sleep(delay)
@@ -198,6 +217,15 @@ class MusicCog(commands.Cog):
         self.current_songs = {}
         self.start_times = {}
         self.nowplaying_messages = {}
+        # Правки прогресса: только при изменении бара, в общем бюджете запросов
+        self.progress = ProgressUpdater()
+        # Следующий трек готовится заранее: переключение без паузы
+        self.prefetch = TrackPrefetcher(
+            resolve=lambda song: ytdl_cache.get(song.webpage_url, stream=True),
+            build=lambda song: YTDLSource.prepare(song.webpage_url),
+            release=lambda player: player.cleanup(),
+        )
+        self.background_tasks = set()  # Ссылки на фоновые таски, чтобы их не собрал GC
         self.update_progress.start()
 
     def get_queue(self, guild_id):
@@ -216,7 +244,8 @@ class MusicCog(commands.Cog):
             return
 
         try:
-            player = await YTDLSource.from_url(song.webpage_url, loop=self.bot.loop, stream=True)
+            player = await self.prefetch.take(guild_id, song) \
+                or await YTDLSource.from_url(song.webpage_url, loop=self.bot.loop, stream=True)
 
             def after_play(error):
                 if error:
@@ -253,6 +282,7 @@ class MusicCog(commands.Cog):
 
         # Увеличиваем счетчик попыток для этого трека
         song.retry_count += 1
+        ytdl_cache.invalidate_stream(song.webpage_url)  # FFmpeg мог упасть на протухшей ссылке
 
         if song.retry_count <= 2:
             # Пробуем еще раз с задержкой
@@ -271,13 +301,11 @@ class MusicCog(commands.Cog):
         guild_id = interaction.guild.id
         queue = self.get_queue(guild_id)
 
-        # Останавливаем обновление предыдущего сообщения
+        # Останавливаем обновление предыдущего сообщения (удаляем в фоне — следующий трек не ждёт Discord)
         if guild_id in self.nowplaying_messages:
-            try:
-                await self.nowplaying_messages[guild_id].delete()
-            except:
-                pass
-            del self.nowplaying_messages[guild_id]
+            task = asyncio.create_task(self.delete_quietly(self.nowplaying_messages.pop(guild_id)))
+            self.background_tasks.add(task)
+            task.add_done_callback(self.background_tasks.discard)
 
         if queue:
             song = queue.popleft()
@@ -289,6 +317,7 @@ class MusicCog(commands.Cog):
 
             await self.safe_play(interaction, song)
         else:
+            self.prefetch.discard(guild_id)
             # Если очередь пуста, отключаемся через 1 минуту
             await asyncio.sleep(60)
             voice_client = interaction.guild.voice_client
@@ -307,28 +336,69 @@ class MusicCog(commands.Cog):
                 await voice_client.disconnect()
                 await interaction.channel.send("👋 Очередь пуста, отключаюсь")
 
+    async def delete_quietly(self, message):
+        try:
+            await message.delete()
+        except discord.HTTPException:
+            pass
+
+    def prefetch_next(self, guild_id):
+        """Ссылку на следующий трек — сразу, FFmpeg — за PREFETCH_SECONDS до конца текущего"""
+        queue = self.queues.get(guild_id)
+        song = self.current_songs.get(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if not queue or not song or not voice_client or not voice_client.is_connected():
+            self.prefetch.discard(guild_id)
+            return
+        upcoming = queue[0]  # Другой объект трека, чем в заготовке — очередь изменилась, заготовка выбросится
+        self.prefetch.warm(guild_id, upcoming)
+        self.prefetch.discard_expired(guild_id)  # В том числе на паузе
+        if song.duration and not song.is_paused \
+                and song.duration - song.get_current_position() <= PREFETCH_SECONDS:
+            self.prefetch.ensure(guild_id, upcoming)
+
     @tasks.loop(seconds=1)
     async def update_progress(self):
-        """Обновляет прогресс-бар каждые секунду"""
+        """Обновляет прогресс-бар, когда он меняется (см. ProgressUpdater)"""
         for guild_id, message in list(self.nowplaying_messages.items()):
-            try:
-                if guild_id in self.current_songs:
-                    song = self.current_songs[guild_id]
-                    voice_client = self.bot.get_guild(guild_id).voice_client
-
-                    if voice_client and (voice_client.is_playing() or song.is_paused):
-                        embed = song.get_embed(now_playing=True)
-                        await message.edit(embed=embed)
-                    elif not voice_client or not voice_client.is_connected():
-                        # Если бот отключился, удаляем сообщение
-                        await message.delete()
-                        del self.nowplaying_messages[guild_id]
-            except (discord.NotFound, discord.HTTPException):
-                # Сообщение было удалено
-                if guild_id in self.nowplaying_messages:
-                    del self.nowplaying_messages[guild_id]
-            except Exception as e:
-                print(f"Ошибка при обновлении прогресса: {e}")
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild.voice_client if guild else None
+            if guild_id in self.current_songs and (not voice_client or not voice_client.is_connected()):
+                # Если бот отключился, удаляем сообщение
+                self.forget_nowplaying(guild_id)
+                try:
+                    await message.delete()
+                except discord.HTTPException:
+                    pass
+
+        for guild_id in list(self.current_songs):
+            self.prefetch_next(guild_id)
+
+        try:
+            await self.progress.tick(self.nowplaying_messages, self.progress_signature,
+                                     self.progress_embed, on_gone=self.forget_nowplaying)
+        except Exception as e:
+            print(f"Ошибка при обновлении прогресса: {e}")
+
+    def progress_signature(self, guild_id):
+        song = self.current_songs.get(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if not song or not voice_client or not (voice_client.is_playing() or song.is_paused):
+            return None
+        return song.progress_signature()
+
+    def progress_embed(self, guild_id):
+        return self.current_songs[guild_id].get_embed(now_playing=True)
+
+    def forget_nowplaying(self, guild_id):
+        self.nowplaying_messages.pop(guild_id, None)
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        # Сообщения под «сейчас играет» — прогресс уезжает из вида и перестаёт обновляться
+        self.progress.message_posted(message.channel.id, message.id)
 
     @app_commands.command(name="play", description="Добавляет трек в очередь")
     @app_commands.describe(url="Ссылка на YouTube видео или название для поиска")
@@ -351,9 +421,7 @@ class MusicCog(commands.Cog):
                 voice_client = await channel.connect()
 
             # Получаем информацию о треке
-            data = await self.bot.loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=False))
-            if 'entries' in data:
-                data = data['entries'][0]
+            data = await ytdl_cache.get(url)
 
             song = Song(data, interaction.user)
             queue = self.get_queue(interaction.guild.id)
@@ -435,6 +503,7 @@ class MusicCog(commands.Cog):
         """Очищает очередь"""
         queue = self.get_queue(interaction.guild.id)
         queue.clear()
+        self.prefetch.discard(interaction.guild.id)
         await interaction.response.send_message("🗑️ Очередь очищена")
 
     @app_commands.command(name="leave", description="Покидает голосовой канал и очищает очередь")
@@ -446,6 +515,7 @@ class MusicCog(commands.Cog):
             # Очищаем очередь и текущий трек
             if guild_id in self.queues:
                 self.queues[guild_id].clear()
+            self.prefetch.discard(guild_id)
             if guild_id in self.current_songs:
                 del self.current_songs[guild_id]
             if guild_id in self.start_times:
@@ -498,6 +568,7 @@ class MusicCog(commands.Cog):
             # Очищаем очередь и текущий трек
             if guild_id in self.queues:
                 self.queues[guild_id].clear()
+            self.prefetch.discard(guild_id)
             if guild_id in self.current_songs:
                 del self.current_songs[guild_id]
             if guild_id in self.start_times:
@@ -510,8 +581,14 @@ class MusicCog(commands.Cog):
                 del self.nowplaying_messages[guild_id]
             await interaction.response.send_message("⏹️ Воспроизведение остановлено и очередь очищена")
 
+    async def cog_load(self):
+        ytdl_pool.start()
+
     def cog_unload(self):
         self.update_progress.cancel()
+        self.prefetch.discard_all()
+        print(f"🎵 {ytdl_pool.report()}")
+        ytdl_pool.shutdown()
 
 
 async def setup(bot):
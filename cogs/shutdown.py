@@ -164,6 +164,15 @@ class Shutdown(commands.Cog):
             total_commands = len([cmd for cmd in self.bot.tree.walk_commands()])
             embed.add_field(name="⚙️ Слэш-команды", value=total_commands, inline=True)
 
+            # Исходящие HTTP-запросы по хостам
+            http_client = getattr(self.bot, 'http_client', None)
+            if http_client is not None and http_client.hosts:
+                lines = []
+                for host, metrics in sorted(http_client.metrics().items(), key=lambda item: -item[1]["requests"])[:8]:
+                    p50 = f"{metrics['latency_p50'] * 1000:.0f}ms" if metrics["latency_p50"] is not None else "—"
+                    lines.append(f"`{host}`: {metrics['requests']} зап., ошибок {metrics['errors']}, p50 {p50}")
+                embed.add_field(name="🌐 HTTP", value="\n".join(lines), inline=False)
+
             await interaction.response.send_message(embed=embed)
 
         except Exception as e:
@@ -6,6 +6,9 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional
 
+from utils.intents import STREAM_DETECTION
+from utils.live_state import get_live_state
+
 class StreamNotifications(commands.Cog):
     """Система уведомлений о начале стримов на Twitch/YouTube"""
     
@@ -13,7 +16,49 @@ class StreamNotifications(commands.Cog):
         self.bot = bot
         self.config_file = "stream_config.json"
         self.config = self._load_config()
+        # В режиме polling стримы приходят от StreamNotifier (cogs/follow.py), статусы участников не нужны
+        self.polling = STREAM_DETECTION == "polling"
+        self.required_intents = () if self.polling else ("presences",)
+        self.enabled_guilds = set()  # ID серверов с включёнными уведомлениями и каналом: проверяются первыми
+        self._refresh_enabled_guilds()
         self.cooldown_minutes = 10  # Не спамить уведомлениями
+        self.stale_hours = 24  # Отметки старше суток при запуске считаем оставшимися от прошлых эфиров
+        # Активные стримы {guild_id: {user_id: {...}}} — в общем снимке, а не в stream_config.json
+        self.live_state = get_live_state()
+        self.active_streams = self.live_state.section("stream_notifications")
+        
+    async def cog_load(self):
+        """Восстановить активные стримы и перенести их из старого формата конфига"""
+        self.live_state.load()
+        
+        migrated = False
+        for guild_id, guild_config in self.config.items():
+            old = guild_config.pop("active_streams", None)
+            if old is None:
+                continue
+            migrated = True
+            if old and guild_id not in self.active_streams:
+                self.active_streams[guild_id] = old
+        if migrated:
+            self._save_config()
+        
+        border = datetime.now() - timedelta(hours=self.stale_hours)
+        for guild_id, streams in list(self.active_streams.items()):
+            for user_id, info in list(streams.items()):
+                try:
+                    stale = datetime.fromisoformat(info.get("started_at", "")) < border
+                except ValueError:
+                    stale = True
+                if stale:
+                    del streams[user_id]
+                    migrated = True
+            if not streams:
+                del self.active_streams[guild_id]
+        if migrated:
+            self.live_state.changed()
+    
+    def cog_unload(self):
+        self.live_state.flush()
         
     def _load_config(self) -> dict:
         """Загрузка конфигурации из JSON"""
@@ -26,17 +71,33 @@ class StreamNotifications(commands.Cog):
         """Сохранение конфигурации"""
         with open(self.config_file, 'w', encoding='utf-8') as f:
             json.dump(self.config, f, indent=2, ensure_ascii=False)
+        self._refresh_enabled_guilds()
+    
+    def reload_config(self):
+        """Перечитать конфигурацию (после изменения через дашборд)"""
+        self.config = self._load_config()
+        self._refresh_enabled_guilds()
+    
+    def _refresh_enabled_guilds(self):
+        self.enabled_guilds = {
+            int(guild_id) for guild_id, guild_config in self.config.items()
+            if guild_id.isdigit() and guild_config.get("enabled", False) and guild_config.get("announce_channel")
+        }
     
-    def _get_guild_config(self, guild_id: str) -> dict:
-        """Получить конфигурацию сервера"""
+    def _get_guild_config(self, guild_id: str, create: bool = False) -> dict:
+        """
+        Получить конфигурацию сервера.
+        Без create отсутствующая конфигурация не добавляется (на диск попадёт только изменённая).
+        """
         if guild_id not in self.config:
-            self.config[guild_id] = {
+            default = {
                 "enabled": False,
                 "announce_channel": None,
                 "ping_role": None,
-                "active_streams": {}
             }
-            self._save_config()
+            if not create:
+                return default
+            self.config[guild_id] = default
         return self.config[guild_id]
     
     def _is_streaming_activity(self, activity: discord.Activity) -> bool:
@@ -53,8 +114,7 @@ class StreamNotifications(commands.Cog):
     
     def _can_notify(self, guild_id: str, user_id: str) -> bool:
         """Проверка можно ли отправить уведомление (cooldown)"""
-        guild_config = self._get_guild_config(guild_id)
-        active_streams = guild_config.get("active_streams", {})
+        active_streams = self.active_streams.get(guild_id, {})
         
         if user_id in active_streams:
             last_notify = active_streams[user_id].get("started_at")
@@ -70,48 +130,48 @@ class StreamNotifications(commands.Cog):
     
     def _mark_notified(self, guild_id: str, user_id: str):
         """Отметить что уведомление отправлено"""
-        guild_config = self._get_guild_config(guild_id)
-        if "active_streams" not in guild_config:
-            guild_config["active_streams"] = {}
-        
-        guild_config["active_streams"][user_id] = {
+        self.active_streams.setdefault(guild_id, {})[user_id] = {
             "started_at": datetime.now().isoformat(),
             "notified": True
         }
-        self._save_config()
+        self.live_state.changed()
     
     def _clear_stream(self, guild_id: str, user_id: str):
         """Очистить статус стрима"""
-        guild_config = self._get_guild_config(guild_id)
-        if "active_streams" in guild_config and user_id in guild_config["active_streams"]:
-            del guild_config["active_streams"][user_id]
-            self._save_config()
+        streams = self.active_streams.get(guild_id)
+        if streams and user_id in streams:
+            del streams[user_id]
+            if not streams:
+                del self.active_streams[guild_id]
+            self.live_state.changed()
     
     @commands.Cog.listener()
     async def on_presence_update(self, before: discord.Member, after: discord.Member):
         """Отслеживание начала стрима"""
-        guild_id = str(after.guild.id)
-        user_id = str(after.id)
-        guild_config = self._get_guild_config(guild_id)
+        # Самое частое событие шлюза: отсеиваем как можно дешевле
+        if self.polling or after.guild.id not in self.enabled_guilds:
+            return
         
-        # Проверяем что уведомления включены
-        if not guild_config.get("enabled", False):
+        streaming = discord.ActivityType.streaming
+        after_streams = [act for act in after.activities if act.type == streaming]
+        before_streams = [act for act in before.activities if act.type == streaming]
+        if not after_streams and not before_streams:
             return
         
-        # Проверяем что канал настроен
+        guild_id = str(after.guild.id)
+        user_id = str(after.id)
+        guild_config = self._get_guild_config(guild_id)
         announce_channel_id = guild_config.get("announce_channel")
-        if not announce_channel_id:
-            return
         
-        # Ищем стримящую активность
+        # Ищем стримящую активность (Twitch/YouTube)
         streaming_activity = None
-        for activity in after.activities:
+        for activity in after_streams:
             if self._is_streaming_activity(activity):
                 streaming_activity = activity
                 break
         
         # Проверяем статус до и после
-        was_streaming = any(self._is_streaming_activity(act) for act in before.activities)
+        was_streaming = any(self._is_streaming_activity(act) for act in before_streams)
         is_streaming = streaming_activity is not None
         
         # Если начал стримить
@@ -130,6 +190,36 @@ class StreamNotifications(commands.Cog):
         elif was_streaming and not is_streaming:
             self._clear_stream(guild_id, user_id)
     
+    @commands.Cog.listener()
+    async def on_stream_live(self, user_ids: list, url: str, title: Optional[str]):
+        """Начало стрима по данным API (режим polling)"""
+        if not self.polling:
+            return
+        activity = discord.Streaming(name=title or "", url=url)
+        for guild_id in list(self.enabled_guilds):
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            guild_config = self._get_guild_config(str(guild_id))
+            channel = self.bot.get_channel(int(guild_config["announce_channel"]))
+            if channel is None:
+                continue
+            for user_id in user_ids:
+                member = guild.get_member(int(user_id))
+                if member is None or not self._can_notify(str(guild_id), str(user_id)):
+                    continue
+                await self._send_stream_notification(channel, member, activity, guild_config)
+                self._mark_notified(str(guild_id), str(user_id))
+    
+    @commands.Cog.listener()
+    async def on_stream_offline(self, user_ids: list):
+        """Конец стрима по данным API (режим polling)"""
+        if not self.polling:
+            return
+        for guild_id in list(self.active_streams):
+            for user_id in user_ids:
+                self._clear_stream(guild_id, str(user_id))
+    
     async def _send_stream_notification(self, channel: discord.TextChannel, member: discord.Member, 
                                        activity: discord.Activity, guild_config: dict):
         """Отправить уведомление о стриме"""
@@ -174,7 +264,7 @@ class StreamNotifications(commands.Cog):
     async def stream_setup(self, interaction: discord.Interaction, channel: discord.TextChannel):
         """Настройка канала для анонсов"""
         guild_id = str(interaction.guild.id)
-        guild_config = self._get_guild_config(guild_id)
+        guild_config = self._get_guild_config(guild_id, create=True)
         
         guild_config["announce_channel"] = str(channel.id)
         guild_config["enabled"] = True
@@ -194,7 +284,7 @@ class StreamNotifications(commands.Cog):
     async def stream_role(self, interaction: discord.Interaction, role: discord.Role):
         """Настройка роли для пинга"""
         guild_id = str(interaction.guild.id)
-        guild_config = self._get_guild_config(guild_id)
+        guild_config = self._get_guild_config(guild_id, create=True)
         
         guild_config["ping_role"] = str(role.id)
         self._save_config()
@@ -212,7 +302,7 @@ class StreamNotifications(commands.Cog):
     async def stream_toggle(self, interaction: discord.Interaction):
         """Переключение уведомлений"""
         guild_id = str(interaction.guild.id)
-        guild_config = self._get_guild_config(guild_id)
+        guild_config = self._get_guild_config(guild_id, create=True)
         
         current = guild_config.get("enabled", False)
         guild_config["enabled"] = not current
@@ -270,7 +360,7 @@ class StreamNotifications(commands.Cog):
             embed.add_field(name="🔔 Роль для пинга", value="❌ Не настроена", inline=False)
         
         # Активные стримы
-        active_count = len(guild_config.get("active_streams", {}))
+        active_count = len(self.active_streams.get(guild_id, {}))
         embed.add_field(name="🔴 Активных стримов", value=str(active_count), inline=False)
         
         await interaction.response.send_message(embed=embed)
@@ -3,12 +3,22 @@ from discord import app_commands
 from discord.ext import commands
 import aiohttp
 import asyncio
+import html
 import json
 import os
+import re
 from typing import Dict, List, Optional
 import datetime
 
 from cogs.shutdown import is_admin_or_owner
+from utils.telegram_forwarded import ForwardedMessages
+from utils.telegram_html import TELEGRAM_TEXT_LIMIT, TelegramBatcher, split_html
+from utils.telegram_media import AttachmentRelay, describe
+from utils.telegram_outbox import RELAY_METHOD, TELEGRAM_API_BASE, TelegramOutbox
+from utils.telegram_poller import TelegramPoller
+from utils.telegram_routes import MESSAGE_FORMATS, compile_routes, route_accepts
+
+WEBHOOK_NAME = "Telegram Bridge"
 
 
 def is_bot_owner():
@@ -21,12 +31,41 @@ def is_bot_owner():
 
 
 class TelegramBridge(commands.Cog):
+    required_intents = ("message_content",)  # Пересылка текста сообщений
+
     def __init__(self, bot):
         self.bot = bot
         self.config_file = 'telegram_bridge_config.json'
         self.config = self.load_config()
-        self.session = None
-        self.last_processed_message = None  # Чтобы избежать дублирования
+        # Скомпилированная таблица маршрутов: int(канал Discord) → маршрут, чат Telegram → канал
+        self.routes, self.inbound_routes = compile_routes(self.config)
+        # Исходящая очередь с лимитами Telegram и спулом на диске
+        self.outbox = TelegramOutbox(
+            lambda: self.config.get("telegram_bot_token", ""), self.get_session,
+            api_base=self.config.get("telegram_api_base") or TELEGRAM_API_BASE
+        )
+        # Уже пересланные сообщения (анти-дублирование) и их копии в Telegram для правок/удалений
+        self.forwarded = ForwardedMessages(self.outbox.db)
+        self.outbox.on_sent = self.on_telegram_sent
+        self.batchers: Dict[str, TelegramBatcher] = {}  # Склейка сообщений по чатам (режим batch_messages)
+        # Потоковая пересылка вложений (CDN Discord → загрузка в Telegram без буферизации)
+        self.relay = AttachmentRelay(
+            self.outbox, self.get_session,
+            max_bytes=int(self.config.get("max_attachment_mb", 20)) * 1024 * 1024
+        )
+        self.outbox.on_relay = self.relay_attachments
+        # Обратное направление: long polling getUpdates → вебхук в канале Discord
+        self.poller = TelegramPoller(self.outbox, self.handle_telegram_update)
+        self.webhooks: Dict[int, discord.Webhook] = {}
+
+    async def cog_load(self):
+        self.outbox.start()
+        if self.config.get("enabled", False) and self.config.get("forward_telegram_to_discord", False):
+            self.poller.start()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """HTTP-сессия для запросов к Telegram (общая для всего бота)"""
+        return self.bot.http_client.session
 
     def load_config(self) -> Dict:
         """Загрузка конфигурации из файла"""
@@ -38,7 +77,14 @@ class TelegramBridge(commands.Cog):
             "forward_discord_to_telegram": True,
             "include_bot_messages": True,  # Включать сообщения от ботов
             "include_system_messages": True,  # Включать системные сообщения
-            "message_format": "detailed"  # detailed или simple
+            "message_format": "detailed",  # detailed или simple
+            "batch_messages": False,  # Склеивать сообщения, пришедшие подряд, в одно
+            "batch_window_seconds": 3,
+            "forward_attachments": True,  # Пересылать сами файлы, а не только их список
+            "max_attachment_mb": 20,  # Лимит загрузки файлов ботом в Telegram — 50 МБ
+            "forward_telegram_to_discord": False,
+            "telegram_api_base": TELEGRAM_API_BASE,  # Можно указать локальный Bot API сервер
+            "routes": []  # Дополнительные пары канал Discord ↔ чат Telegram со своими настройками
         }
 
         try:
@@ -70,88 +116,109 @@ class TelegramBridge(commands.Cog):
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=4, ensure_ascii=False)
+            self.routes, self.inbound_routes = compile_routes(self.config)
             return True
         except Exception as e:
             print(f"❌ Ошибка сохранения конфигурации: {e}")
             return False
 
+    @staticmethod
+    def split_message(text: str) -> List[str]:
+        """Разбивает длинные сообщения на части (Telegram имеет лимит 4096 символов), не ломая HTML"""
+        return split_html(text)
+
     async def send_telegram_message(self, text: str, parse_mode: str = "HTML") -> bool:
-        """Отправка сообщения в Telegram"""
+        """Отправка сообщения в Telegram сразу, с ожиданием результата (для команд)"""
         if not self.config["telegram_bot_token"] or not self.config["telegram_chat_id"]:
             return False
 
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-
-        url = f"https://api.telegram.org/bot{self.config['telegram_bot_token']}/sendMessage"
-
-        # Разбиваем длинные сообщения на части (Telegram имеет лимит 4096 символов)
-        if len(text) > 4000:
-            parts = [text[i:i + 4000] for i in range(0, len(text), 4000)]
-            success = True
-            for part in parts:
-                payload = {
-                    "chat_id": self.config["telegram_chat_id"],
-                    "text": part,
-                    "parse_mode": parse_mode
-                }
-                try:
-                    async with self.session.post(url, json=payload) as response:
-                        if response.status != 200:
-                            success = False
-                except Exception:
-                    success = False
-            return success
-        else:
-            payload = {
-                "chat_id": self.config["telegram_chat_id"],
-                "text": text,
-                "parse_mode": parse_mode
-            }
+        success = True
+        for part in self.split_message(text):
+            result = await self.outbox.send_now(
+                self.config["telegram_chat_id"], "sendMessage",
+                {"text": part, "parse_mode": parse_mode}
+            )
+            if result is None:
+                success = False
+        return success
+
+    def queue_telegram_message(self, text: str, parse_mode: str = "HTML", chat_id: Optional[str] = None,
+                               ref: Optional[int] = None) -> bool:
+        """
+        Постановка сообщения в исходящую очередь (не блокирует обработчик событий).
+        ref — ID сообщения Discord: если оно уйдёт отдельным сообщением Telegram,
+        его message_id запомнится для правок и удалений
+        """
+        chat_id = chat_id or self.config["telegram_chat_id"]
+        if not self.config["telegram_bot_token"] or not chat_id:
+            return False
 
-            try:
-                async with self.session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        return True
-                    else:
-                        error_text = await response.text()
-                        print(f"❌ Ошибка отправки в Telegram: {error_text}")
-                        return False
-            except Exception as e:
-                print(f"❌ Ошибка соединения с Telegram: {e}")
-                return False
-
-    def format_discord_message(self, message) -> str:
+        if self.config.get("batch_messages", False) and parse_mode == "HTML":
+            self.get_batcher(chat_id).add(text)
+            return True
+
+        parts = self.split_message(text)
+        for part in parts:
+            self.outbox.enqueue(
+                chat_id, "sendMessage", {"text": part, "parse_mode": parse_mode},
+                ref=str(ref) if ref and len(parts) == 1 else None
+            )
+        return True
+
+    def on_telegram_sent(self, item: dict, result: dict):
+        """Сообщение из очереди доставлено — запоминаем его message_id"""
+        if item["method"] == "sendMessage" and isinstance(result, dict):
+            self.forwarded.set_target(int(item["ref"]), item["chat_id"], result["message_id"])
+
+    def get_batcher(self, chat_id: str) -> TelegramBatcher:
+        """Склейка сообщений для чата (пересоздаётся при смене окна)"""
+        window = float(self.config.get("batch_window_seconds", 3))
+        batcher = self.batchers.get(chat_id)
+        if batcher is None or batcher.window != window:
+            if batcher is not None:
+                batcher.flush()
+            batcher = TelegramBatcher(
+                lambda text: self.outbox.enqueue(chat_id, "sendMessage", {"text": text, "parse_mode": "HTML"}),
+                window=window
+            )
+            self.batchers[chat_id] = batcher
+        return batcher
+
+    def flush_batchers(self):
+        for batcher in self.batchers.values():
+            batcher.flush()
+
+    def format_discord_message(self, message, message_format: Optional[str] = None) -> str:
         """Форматирование сообщения Discord для Telegram"""
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # Используем get с значением по умолчанию на случай отсутствия ключа
-        message_format = self.config.get("message_format", "detailed")
+        message_format = message_format or self.config.get("message_format", "detailed")
 
         if message_format == "simple":
             # Простой формат
             if message.author.bot:
-                author = f"🤖 {message.author.display_name}"
+                author = f"🤖 {html.escape(message.author.display_name)}"
             else:
-                author = f"👤 {message.author.display_name}"
+                author = f"👤 {html.escape(message.author.display_name)}"
 
-            text = f"{author}: {message.content}"
+            text = f"{author}: {html.escape(message.content)}"
 
         else:
             # Детальный формат
             if message.author.bot:
-                author = f"<b>🤖 БОТ: {message.author.display_name}</b>"
+                author = f"<b>🤖 БОТ: {html.escape(message.author.display_name)}</b>"
             else:
-                author = f"<b>👤 {message.author.display_name}</b>"
+                author = f"<b>👤 {html.escape(message.author.display_name)}</b>"
 
-            channel = f"<i>#{message.channel.name}</i>"
+            channel = f"<i>#{html.escape(message.channel.name)}</i>"
             time = f"<code>{timestamp}</code>"
 
             text = f"{author} в {channel}\n"
             text += f"Время: {time}\n"
 
             if message.content:
-                text += f"\n💬 {message.content}"
+                text += f"\n💬 {html.escape(message.content)}"
 
         # Добавляем информацию о вложениях
         if message.attachments:
@@ -165,7 +232,7 @@ class TelegramBridge(commands.Cog):
                 elif any(attachment.filename.lower().endswith(ext) for ext in ['.mp3', '.wav', '.ogg']):
                     file_type = "🔊 Аудио"
 
-                attachments_info.append(f"{file_type}: {attachment.filename} ({attachment.size} bytes)")
+                attachments_info.append(f"{file_type}: {html.escape(attachment.filename)} ({attachment.size} bytes)")
 
             text += f"\n\n📁 Вложения ({len(message.attachments)}):\n" + "\n".join(attachments_info)
 
@@ -174,95 +241,206 @@ class TelegramBridge(commands.Cog):
             text += f"\n\n🔗 Эмбеды: {len(message.embeds)}"
             for embed in message.embeds:
                 if embed.title:
-                    text += f"\n- Заголовок: {embed.title}"
+                    text += f"\n- Заголовок: {html.escape(embed.title)}"
                 if embed.description:
                     desc = embed.description[:100] + "..." if len(embed.description) > 100 else embed.description
-                    text += f"\n- Описание: {desc}"
+                    text += f"\n- Описание: {html.escape(desc)}"
 
         # Добавляем информацию о стикерах
         if message.stickers:
             text += f"\n\n🎨 Стикеры: {len(message.stickers)}"
             for sticker in message.stickers:
-                text += f"\n- {sticker.name}"
+                text += f"\n- {html.escape(sticker.name)}"
 
         return text
 
     @commands.Cog.listener()
     async def on_message(self, message):
         """Обработка сообщений из Discord для отправки в Telegram"""
+        # Каналы без моста отсеиваются одним поиском в словаре
+        route = self.routes.get(message.channel.id)
+        if route is None:
+            return
+
         # Используем get с значениями по умолчанию для всех ключей
         if not self.config.get("enabled", False) or not self.config.get("forward_discord_to_telegram", True):
             return
 
-        # Проверяем, что сообщение из нужного канала логов
-        discord_log_channel_id = self.config.get("discord_log_channel_id", "")
-        if not discord_log_channel_id:
+        # Сообщения, которые мы сами принесли из Telegram, обратно не пересылаем
+        if self.is_bridge_echo(message):
             return
 
-        if str(message.channel.id) != str(discord_log_channel_id):
+        if not route_accepts(route, message):
             return
 
-        # Проверяем, не обрабатывали ли мы уже это сообщение (анти-дублирование)
-        if self.last_processed_message == message.id:
+        # Повторы событий шлюза (resume, переупорядочивание) отсеиваются по журналу
+        if not self.forwarded.claim(message.id):
             return
 
-        self.last_processed_message = message.id
-
         # Форматируем и отправляем сообщение
-        telegram_text = self.format_discord_message(message)
+        telegram_text = self.format_discord_message(message, route["message_format"])
 
-        # Отправляем в Telegram
-        success = await self.send_telegram_message(telegram_text)
+        # Ставим в очередь на отправку в Telegram
+        if not self.queue_telegram_message(telegram_text, chat_id=route["telegram_chat_id"], ref=message.id):
+            self.forwarded.release(message.id)
+            print(f"❌ Не удалось поставить сообщение {message.id} в очередь Telegram")
+            return
+
+        if message.attachments and route["forward_attachments"]:
+            chat_id = route["telegram_chat_id"]
+            # Текст, ждущий склейки, сначала уходит в очередь — вложения встают за ним
+            batcher = self.batchers.get(chat_id)
+            if batcher is not None:
+                batcher.flush()
+            caption = f"📎 <b>{html.escape(message.author.display_name)}</b> в <i>#{html.escape(message.channel.name)}</i>"
+            self.outbox.enqueue(chat_id, RELAY_METHOD, {
+                "discord_id": message.id,
+                "caption": caption,
+                "attachments": [describe(attachment) for attachment in message.attachments],
+            })
+
+    async def relay_attachments(self, chat_id: str, payload: dict):
+        """Пересылка вложений сообщения в Telegram (выполняется очередью чата после текста)"""
+        not_sent = await self.relay.relay(chat_id, payload["attachments"], payload["caption"])
+        if not_sent:
+            print(f"⚠️ Не пересланы вложения сообщения {payload['discord_id']}: {', '.join(not_sent)}")
+
+    def is_bridge_echo(self, message: discord.Message) -> bool:
+        """Сообщение отправлено нашим вебхуком (пришло из Telegram)"""
+        webhook = self.webhooks.get(message.channel.id)
+        return webhook is not None and message.webhook_id == webhook.id
+
+    async def get_webhook(self, channel: discord.TextChannel) -> discord.Webhook:
+        """Вебхук моста в канале (ищется один раз, дальше берётся из кэша)"""
+        webhook = self.webhooks.get(channel.id)
+        if webhook is None:
+            for existing in await channel.webhooks():
+                if existing.name == WEBHOOK_NAME and existing.user == self.bot.user:
+                    webhook = existing
+                    break
+            else:
+                webhook = await channel.create_webhook(name=WEBHOOK_NAME)
+            self.webhooks[channel.id] = webhook
+        return webhook
+
+    @staticmethod
+    def format_telegram_message(message: dict) -> str:
+        """Текст сообщения Telegram для Discord"""
+        text = message.get("text") or message.get("caption") or ""
+        for key, label in (("photo", "🖼️ [фото]"), ("video", "🎥 [видео]"), ("document", "📎 [файл]"),
+                           ("voice", "🔊 [голосовое]"), ("sticker", "🎨 [стикер]")):
+            if key in message:
+                text = f"{label} {text}".strip()
+                break
+        return text[:2000]
+
+    async def handle_telegram_update(self, update: dict):
+        """Пересылка сообщения из чата Telegram в канал логов через вебхук"""
+        message = update.get("message")
+        channel_id = self.inbound_routes.get(str(message["chat"]["id"])) if message else None
+        if channel_id is None:
+            return
+
+        text = self.format_telegram_message(message)
+        if not text:
+            return
 
-        if not success:
-            print(f"❌ Не удалось отправить сообщение {message.id} в Telegram")
+        await self.bot.wait_until_ready()
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            return
+
+        sender = message.get("from") or {}
+        name = " ".join(filter(None, (sender.get("first_name"), sender.get("last_name")))) or "Telegram"
+        # Discord не принимает "discord" и "clyde" в имени вебхука
+        name = re.sub(r"discord|clyde", "***", name, flags=re.IGNORECASE)[:70] + " (TG)"
+        # Файлы Bot API содержат токен в URL, поэтому аватар берём только публичный — по username
+        avatar_url = f"https://t.me/i/userpic/320/{sender['username']}.jpg" if sender.get("username") else None
+
+        for attempt in range(2):
+            webhook = await self.get_webhook(channel)
+            try:
+                await webhook.send(text, username=name, avatar_url=avatar_url,
+                                   allowed_mentions=discord.AllowedMentions.none())
+                return
+            except discord.NotFound:
+                # Вебхук удалили вручную — создаём заново
+                self.webhooks.pop(channel.id, None)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before, after):
         """Обработка редактированных сообщений"""
+        route = self.routes.get(after.channel.id)
+        if route is None:
+            return
+
         if not self.config.get("enabled", False) or not self.config.get("forward_discord_to_telegram", True):
             return
 
-        discord_log_channel_id = self.config.get("discord_log_channel_id", "")
-        if not discord_log_channel_id:
+        if self.is_bridge_echo(after) or not route_accepts(route, after):
             return
 
-        if str(after.channel.id) != str(discord_log_channel_id):
+        # Закрепление, подгрузка превью ссылок и т.п. — текст не менялся
+        if before.content == after.content and \
+                [e.to_dict() for e in before.embeds] == [e.to_dict() for e in after.embeds]:
             return
 
+        # Сообщение ушло в Telegram отдельно — правим его на месте
+        target = self.forwarded.target(after.id)
+        if target is not None and target[0] == route["telegram_chat_id"]:
+            telegram_text = self.format_discord_message(after, route["message_format"])
+            if len(telegram_text) <= TELEGRAM_TEXT_LIMIT:
+                self.outbox.enqueue(target[0], "editMessageText", {
+                    "message_id": target[1],
+                    "text": telegram_text,
+                    "parse_mode": "HTML",
+                })
+                return
+
         # Отправляем уведомление о редактировании
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         telegram_text = f"✏️ <b>СООБЩЕНИЕ ОТРЕДАКТИРОВАНО</b>\n"
-        telegram_text += f"👤 <b>{after.author.display_name}</b>\n"
+        telegram_text += f"👤 <b>{html.escape(after.author.display_name)}</b>\n"
         telegram_text += f"📅 <code>{timestamp}</code>\n\n"
-        telegram_text += f"<b>Было:</b>\n<code>{before.content if before.content else '[без текста]'}</code>\n\n"
-        telegram_text += f"<b>Стало:</b>\n<code>{after.content if after.content else '[без текста]'}</code>"
+        telegram_text += f"<b>Было:</b>\n<code>{html.escape(before.content) if before.content else '[без текста]'}</code>\n\n"
+        telegram_text += f"<b>Стало:</b>\n<code>{html.escape(after.content) if after.content else '[без текста]'}</code>"
 
-        await self.send_telegram_message(telegram_text)
+        self.queue_telegram_message(telegram_text, chat_id=route["telegram_chat_id"])
 
     @commands.Cog.listener()
     async def on_message_delete(self, message):
         """Обработка удаленных сообщений"""
+        route = self.routes.get(message.channel.id)
+        if route is None:
+            return
+
         if not self.config.get("enabled", False) or not self.config.get("forward_discord_to_telegram", True):
             return
 
-        discord_log_channel_id = self.config.get("discord_log_channel_id", "")
-        if not discord_log_channel_id:
+        if self.is_bridge_echo(message) or not route_accepts(route, message):
+            return
+
+        # Повтор уже обработанного удаления
+        if self.forwarded.is_deleted(message.id):
             return
 
-        if str(message.channel.id) != str(discord_log_channel_id):
+        # Сообщение ушло в Telegram отдельно — удаляем и его
+        target = self.forwarded.target(message.id)
+        if target is not None and target[0] == route["telegram_chat_id"]:
+            self.outbox.enqueue(target[0], "deleteMessage", {"message_id": target[1]})
+            self.forwarded.clear_target(message.id)
             return
 
         # Отправляем уведомление об удалении
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         telegram_text = f"🗑️ <b>СООБЩЕНИЕ УДАЛЕНО</b>\n"
-        telegram_text += f"👤 <b>{message.author.display_name}</b>\n"
+        telegram_text += f"👤 <b>{html.escape(message.author.display_name)}</b>\n"
         telegram_text += f"📅 <code>{timestamp}</code>\n\n"
-        telegram_text += f"<b>Содержимое:</b>\n<code>{message.content if message.content else '[без текста]'}</code>"
+        telegram_text += f"<b>Содержимое:</b>\n<code>{html.escape(message.content) if message.content else '[без текста]'}</code>"
 
-        await self.send_telegram_message(telegram_text)
+        self.queue_telegram_message(telegram_text, chat_id=route["telegram_chat_id"])
 
     @app_commands.command(name="setup_logs_bridge",
                           description="Настроить мост для логов между Discord и Telegram (только для владельца)")
@@ -336,6 +514,12 @@ class TelegramBridge(commands.Cog):
         embed.add_field(name="🔄 Статус", value="✅ Включен" if self.config.get("enabled", False) else "❌ Выключен",
                         inline=True)
         embed.add_field(name="Discord → Telegram", value="✅ Включено", inline=True)
+        if self.config.get("forward_telegram_to_discord", False):
+            inbound = "✅ Работает" if self.poller.running else "⚠️ Не запущено"
+            inbound += f"\nПолучено: {self.poller.stats['updates']}"
+        else:
+            inbound = "❌ Выключено"
+        embed.add_field(name="Telegram → Discord", value=inbound, inline=True)
         embed.add_field(name="🤖 Сообщения ботов",
                         value="✅ Включены" if self.config.get("include_bot_messages", True) else "❌ Выключены",
                         inline=True)
@@ -363,6 +547,56 @@ class TelegramBridge(commands.Cog):
         message_format = self.config.get("message_format", "detailed")
         embed.add_field(name="📝 Формат", value="Детальный" if message_format == "detailed" else "Простой", inline=True)
 
+        # Метрики исходящей очереди
+        metrics = self.outbox.metrics()
+        latency = (
+            f"p50 {metrics['latency_p50']:.1f}с / p95 {metrics['latency_p95']:.1f}с"
+            if metrics["latency_p50"] is not None else "нет данных"
+        )
+        embed.add_field(
+            name="📤 Очередь",
+            value=(
+                f"В очереди: {metrics['depth']}\n"
+                f"Отправлено: {metrics['sent']}\n"
+                f"Повторов: {metrics['retries']}, 429: {metrics['rate_limited']}\n"
+                f"Ошибок: {metrics['failed']}\n"
+                f"Дублей отсеяно: {self.forwarded.duplicates}"
+            ),
+            inline=True
+        )
+        embed.add_field(name="⏱️ Задержка доставки", value=latency, inline=True)
+
+        if self.config.get("forward_attachments", True):
+            relay = self.relay.stats
+            attachments = (
+                f"✅ до {self.config.get('max_attachment_mb', 20)} МБ\n"
+                f"Файлов: {relay['files']} ({relay['bytes'] / 1024 / 1024:.1f} МБ)\n"
+                f"Пропущено: {relay['skipped']}, ошибок: {relay['failed']}"
+            )
+        else:
+            attachments = "❌ Выключена"
+        embed.add_field(name="📎 Вложения", value=attachments, inline=True)
+
+        if self.config.get("batch_messages", False):
+            messages = sum(b.messages for b in self.batchers.values())
+            batches = sum(b.batches for b in self.batchers.values())
+            batching = (
+                f"✅ Окно {self.config.get('batch_window_seconds', 3)}с\n"
+                + (f"{messages} → {batches} ({messages / batches:.1f} на сообщение)" if batches else "Нет данных")
+            )
+        else:
+            batching = "❌ Выключена"
+        embed.add_field(name="📦 Склейка", value=batching, inline=True)
+
+        routes = [
+            f"<#{channel_id}> → `{route['telegram_chat_id']}`"
+            f" ({'детальный' if route['message_format'] == 'detailed' else 'простой'})"
+            for channel_id, route in list(self.routes.items())[:10]
+        ]
+        if len(self.routes) > 10:
+            routes.append(f"... и ещё {len(self.routes) - 10}")
+        embed.add_field(name=f"🧭 Маршруты ({len(self.routes)})", value="\n".join(routes) or "Нет", inline=False)
+
         # Тестируем соединение с Telegram
         if self.config.get("enabled", False) and self.config.get("telegram_bot_token"):
             test_success = await self.send_telegram_message("🔍 <b>Проверка связи моста логов...</b>")
@@ -376,6 +610,8 @@ class TelegramBridge(commands.Cog):
     async def enable_logs_bridge(self, interaction: discord.Interaction):
         """Включить мост для логов"""
         self.config["enabled"] = True
+        if self.config.get("forward_telegram_to_discord", False):
+            self.poller.start()
         if self.save_config():
             embed = discord.Embed(
                 title="✅ Мост для логов включен",
@@ -395,6 +631,7 @@ class TelegramBridge(commands.Cog):
     async def disable_logs_bridge(self, interaction: discord.Interaction):
         """Выключить мост для логов"""
         self.config["enabled"] = False
+        self.poller.stop()
         if self.save_config():
             embed = discord.Embed(
                 title="✅ Мост для логов выключен",
@@ -424,7 +661,7 @@ class TelegramBridge(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        telegram_text = f"🧪 <b>ТЕСТОВОЕ СООБЩЕНИЕ ИЗ DISCORD</b>\n\n<code>{message}</code>"
+        telegram_text = f"🧪 <b>ТЕСТОВОЕ СООБЩЕНИЕ ИЗ DISCORD</b>\n\n<code>{html.escape(message)}</code>"
         success = await self.send_telegram_message(telegram_text)
 
         if success:
@@ -491,12 +728,159 @@ class TelegramBridge(commands.Cog):
             )
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    @app_commands.command(name="add_bridge_route",
+                          description="Добавить маршрут канал Discord → чат Telegram (только для владельца)")
+    @app_commands.describe(
+        channel="Канал Discord",
+        chat_id="ID чата в Telegram",
+        format="Формат сообщений (detailed или simple)",
+        include_bots="Пересылать сообщения ботов",
+        keywords="Пересылать только сообщения с этими словами (через запятую)"
+    )
+    @is_admin_or_owner()
+    async def add_bridge_route(self, interaction: discord.Interaction, channel: discord.TextChannel, chat_id: str,
+                               format: str = "detailed", include_bots: bool = True, keywords: str = ""):
+        """Добавить или заменить маршрут для канала"""
+        if format.lower() not in MESSAGE_FORMATS:
+            embed = discord.Embed(
+                title="❌ Неверный формат",
+                description="Доступные форматы: detailed, simple",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        if str(channel.id) == str(self.config.get("discord_log_channel_id")):
+            embed = discord.Embed(
+                title="❌ Канал уже используется",
+                description="Это основной канал логов, его настройки меняются через `/setup_logs_bridge`",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        routes = [r for r in self.config.get("routes", []) if str(r.get("discord_channel_id")) != str(channel.id)]
+        routes.append({
+            "discord_channel_id": str(channel.id),
+            "telegram_chat_id": chat_id,
+            "message_format": format.lower(),
+            "include_bot_messages": include_bots,
+            "keywords": [k.strip() for k in keywords.split(",") if k.strip()],
+        })
+        self.config["routes"] = routes
+
+        if self.save_config():
+            embed = discord.Embed(
+                title="✅ Маршрут добавлен",
+                description=f"{channel.mention} → Telegram `{chat_id}`",
+                color=discord.Color.green()
+            )
+            if keywords:
+                embed.add_field(name="Фильтр", value=keywords, inline=False)
+        else:
+            embed = discord.Embed(
+                title="❌ Ошибка",
+                description="Не удалось сохранить настройки!",
+                color=discord.Color.red()
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="remove_bridge_route", description="Удалить маршрут моста (только для владельца)")
+    @app_commands.describe(channel="Канал Discord")
+    @is_admin_or_owner()
+    async def remove_bridge_route(self, interaction: discord.Interaction, channel: discord.TextChannel):
+        """Удалить маршрут для канала"""
+        routes = self.config.get("routes", [])
+        remaining = [r for r in routes if str(r.get("discord_channel_id")) != str(channel.id)]
+        if len(remaining) == len(routes):
+            embed = discord.Embed(
+                title="❌ Маршрут не найден",
+                description=f"Для {channel.mention} нет дополнительного маршрута",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        self.config["routes"] = remaining
+        if self.save_config():
+            embed = discord.Embed(
+                title="✅ Маршрут удалён",
+                description=f"Сообщения из {channel.mention} больше не пересылаются",
+                color=discord.Color.green()
+            )
+        else:
+            embed = discord.Embed(
+                title="❌ Ошибка",
+                description="Не удалось сохранить настройки!",
+                color=discord.Color.red()
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="set_logs_batching",
+                          description="Склеивать сообщения логов в одно сообщение Telegram (только для владельца)")
+    @app_commands.describe(
+        enabled="Включить склейку",
+        window="Окно склейки в секундах (1-60)"
+    )
+    @is_admin_or_owner()
+    async def set_logs_batching(self, interaction: discord.Interaction, enabled: bool,
+                                window: app_commands.Range[int, 1, 60] = 3):
+        """Включить или выключить склейку сообщений"""
+        self.config["batch_messages"] = enabled
+        self.config["batch_window_seconds"] = window
+        if not enabled:
+            self.flush_batchers()
+            self.batchers.clear()
+
+        if self.save_config():
+            embed = discord.Embed(
+                title="✅ Склейка включена" if enabled else "✅ Склейка выключена",
+                description=(
+                    f"Сообщения, пришедшие в течение {window}с, отправляются в Telegram одним сообщением"
+                    if enabled else "Каждое сообщение отправляется в Telegram отдельно"
+                ),
+                color=discord.Color.green()
+            )
+        else:
+            embed = discord.Embed(
+                title="❌ Ошибка",
+                description="Не удалось сохранить настройки!",
+                color=discord.Color.red()
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="set_telegram_to_discord",
+                          description="Пересылать сообщения из Telegram в канал логов (только для владельца)")
+    @app_commands.describe(enabled="Включить обратное направление")
+    @is_admin_or_owner()
+    async def set_telegram_to_discord(self, interaction: discord.Interaction, enabled: bool):
+        """Включить или выключить пересылку Telegram → Discord"""
+        self.config["forward_telegram_to_discord"] = enabled
+        if enabled and self.config.get("enabled", False):
+            self.poller.start()
+        elif not enabled:
+            self.poller.stop()
+
+        if self.save_config():
+            embed = discord.Embed(
+                title="✅ Telegram → Discord включено" if enabled else "✅ Telegram → Discord выключено",
+                description=(
+                    "Сообщения из чата Telegram будут появляться в канале логов от имени отправителя"
+                    if enabled else "Сообщения из Telegram больше не пересылаются"
+                ),
+                color=discord.Color.green()
+            )
+        else:
+            embed = discord.Embed(
+                title="❌ Ошибка",
+                description="Не удалось сохранить настройки!",
+                color=discord.Color.red()
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @commands.Cog.listener()
     async def on_ready(self):
         """Инициализация при готовности бота"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-
         log_channel_info = "не настроен"
         discord_log_channel_id = self.config.get("discord_log_channel_id")
         if discord_log_channel_id:
@@ -510,8 +894,10 @@ class TelegramBridge(commands.Cog):
 
     def cog_unload(self):
         """Очистка при выгрузке кога"""
-        if self.session:
-            asyncio.create_task(self.session.close())
+        # Неотправленные сообщения остаются в спуле до следующего запуска
+        self.flush_batchers()
+        self.poller.stop()
+        self.outbox.close()
 
     # Обработчик ошибок для команд
     @setup_logs_bridge.error
@@ -521,6 +907,10 @@ class TelegramBridge(commands.Cog):
     @send_test_log.error
     @set_logs_channel.error
     @set_message_format.error
+    @set_logs_batching.error
+    @add_bridge_route.error
+    @remove_bridge_route.error
+    @set_telegram_to_discord.error
     async def telegram_bridge_error(self, interaction: discord.Interaction, error):
         """Обработчик ошибок для команд моста"""
         if isinstance(error, app_commands.CheckFailure):
@@ -3,13 +3,14 @@ import asyncio
 import datetime
 import json
 import os
-from io import StringIO
 
 import discord
 from discord.ext import commands
 from discord import app_commands
 from discord.ui import View, Button, Select, Modal, TextInput
 
+from utils.transcript import HtmlTranscript, batch_files, upload_limit
+
 # ==== НАСТРОЙКИ, КОТОРЫЕ ПОКА ОСТАВИМ КОНСТАНТАМИ ====
 LOG_CHANNEL_ID = 1437390123741352057  # канал для логов тикетов (укажи свой)
 
@@ -122,34 +123,29 @@ class TicketCloseView(View):
 
         await interaction.response.defer()
 
-        # Генерация транскрипта
+        # Генерация транскрипта (HTML, рендерится по частям)
         log_channel = guild.get_channel(LOG_CHANNEL_ID)
-        transcript = StringIO()
-        transcript.write(f"Тикет: #{channel.name}\nID: {channel.id}\n")
-        transcript.write(f"Закрыл: {member} ({member.id})\n")
-        transcript.write(f"Дата закрытия: {datetime.datetime.utcnow()} UTC\n\n")
-        transcript.write("---- Сообщения ----\n")
-
-        async for msg in channel.history(limit=None, oldest_first=True):
-            author = f"{msg.author} ({msg.author.id})"
-            content = msg.content if msg.content else ""
-            transcript.write(f"[{msg.created_at}] {author}: {content}\n")
-            for a in msg.attachments:
-                transcript.write(f"    [Файл] {a.url}\n")
-
-        transcript.seek(0)
 
         if log_channel:
-            file = discord.File(
-                fp=transcript,
-                filename=f"ticket-{channel.id}.txt"
-            )
-            embed = discord.Embed(
-                title="Тикет закрыт",
-                description=f"Канал: {channel.mention}\nЗакрыл: {member.mention}",
-                color=discord.Color.red()
-            )
-            await log_channel.send(embed=embed, file=file)
+            info = [
+                ("ID", channel.id),
+                ("Закрыл", f"{member} ({member.id})"),
+                ("Дата закрытия", f"{datetime.datetime.utcnow()} UTC"),
+            ]
+            with HtmlTranscript(f"Тикет: #{channel.name}", info) as transcript:
+                async for msg in channel.history(limit=None, oldest_first=True):
+                    await transcript.add_message(msg)
+
+                files = await transcript.finish(f"ticket-{channel.id}.html", upload_limit(guild.filesize_limit))
+
+                embed = discord.Embed(
+                    title="Тикет закрыт",
+                    description=f"Канал: {channel.mention}\nЗакрыл: {member.mention}",
+                    color=discord.Color.red()
+                )
+                embed.add_field(name="Сообщений", value=transcript.message_count, inline=True)
+                for i, batch in enumerate(batch_files(files, upload_limit(guild.filesize_limit))):
+                    await log_channel.send(embed=embed if i == 0 else None, files=batch)
 
         await channel.send("Тикет будет удалён через 5 секунд...")
         await asyncio.sleep(5)
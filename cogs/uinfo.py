@@ -54,9 +54,14 @@ class UserInfo(commands.Cog):
         }
 
         status = str(user.status)
+        if self.bot.intents.presences:
+            status_value = f"{status_emojis.get(status, '⚫')} {status_text.get(status, 'Неизвестно')}"
+        else:
+            # STREAM_DETECTION=polling: без интента presences все выглядят «не в сети»
+            status_value = "❔ Недоступен (интент presences выключен)"
         em.add_field(
             name="Статус:",
-            value=f"{status_emojis.get(status, '⚫')} {status_text.get(status, 'Неизвестно')}",
+            value=status_value,
             inline=True
         )
 
@@ -41,10 +41,12 @@ def create_app(bot=None):
     from dashboard.routes.auth import auth_bp
     from dashboard.routes.api import api_bp
     from dashboard.routes.views import views_bp
+    from dashboard.routes.eventsub import eventsub_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(views_bp)
+    app.register_blueprint(eventsub_bp, url_prefix='/eventsub')
     
     @app.route('/health')
     async def health_check():
@@ -58,7 +60,7 @@ def create_app(bot=None):
         
         # Public routes that don't require authentication
         public_routes = ['auth.login', 'auth.callback', 'auth.logout', 'health_check', 
-                        'views.index', 'static']
+                        'views.index', 'static', 'eventsub.']
         
         if request.endpoint and any(request.endpoint.startswith(r) for r in public_routes):
             return None
@@ -7,6 +7,8 @@ import os
 from quart import Blueprint, jsonify, request, session
 from functools import wraps
 
+from utils.log_pipeline import normalize_priority_classes
+
 api_bp = Blueprint('api', __name__)
 
 # Config file paths
@@ -228,6 +230,7 @@ async def get_logging_settings(guild_id):
             'voice_changes': True
         }
     })
+    guild_config['priority_classes'] = normalize_priority_classes(guild_config.get('priority_classes'))
     return jsonify(guild_config)
 
 
@@ -245,6 +248,8 @@ async def update_logging_settings(guild_id):
         config[guild_id]['log_channel'] = data['log_channel']
     if 'enabled_events' in data:
         config[guild_id]['enabled_events'] = data['enabled_events']
+    if 'priority_classes' in data:
+        config[guild_id]['priority_classes'] = normalize_priority_classes(data['priority_classes'])
     
     if save_json_config(LOGGING_CONFIG, config):
         from dashboard.app import get_bot
@@ -412,8 +417,8 @@ async def update_streams_settings(guild_id):
         bot = get_bot()
         if bot:
             stream_cog = bot.get_cog('StreamNotifications')
-            if stream_cog and hasattr(stream_cog, '_load_config'):
-                stream_cog._load_config()
+            if stream_cog and hasattr(stream_cog, 'reload_config'):
+                stream_cog.reload_config()
         
         return jsonify({'success': True, 'message': 'Настройки стримов сохранены'})
     
@@ -440,8 +445,10 @@ async def get_guild_stats(guild_id):
     text_channels = len([c for c in guild.channels if c.type.name == 'text'])
     voice_channels = len([c for c in guild.channels if c.type.name == 'voice'])
     
-    # Count online members
-    online_members = len([m for m in guild.members if m.status.name != 'offline'])
+    # Count online members (unknown without the presences intent, e.g. STREAM_DETECTION=polling)
+    online_members = None
+    if bot.intents.presences:
+        online_members = len([m for m in guild.members if m.status.name != 'offline'])
     
     return jsonify({
         'member_count': guild.member_count,
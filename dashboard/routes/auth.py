@@ -4,6 +4,7 @@ Discord OAuth2 Authentication Routes
 
 import os
 import aiohttp
+from contextlib import asynccontextmanager
 from quart import Blueprint, redirect, request, session, url_for, current_app
 from urllib.parse import urlencode
 
@@ -13,6 +14,18 @@ auth_bp = Blueprint('auth', __name__)
 OAUTH2_SCOPES = ['identify', 'guilds']
 
 
+@asynccontextmanager
+async def get_http_session():
+    """Shared HTTP session of the bot (pooled, with metrics), or a short-lived one without a bot"""
+    from dashboard.app import get_bot
+    bot = get_bot()
+    if bot is not None:
+        yield bot.http_client.session
+        return
+    async with aiohttp.ClientSession() as session_http:
+        yield session_http
+
+
 def get_oauth2_url():
     """Generate Discord OAuth2 authorization URL"""
     params = {
@@ -36,7 +49,7 @@ async def exchange_code(code: str) -> dict:
     
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
     
-    async with aiohttp.ClientSession() as session_http:
+    async with get_http_session() as session_http:
         async with session_http.post(
             'https://discord.com/api/oauth2/token',
             data=data,
@@ -49,7 +62,7 @@ async def get_user_info(access_token: str) -> dict:
     """Get user information from Discord API"""
     headers = {'Authorization': f'Bearer {access_token}'}
     
-    async with aiohttp.ClientSession() as session_http:
+    async with get_http_session() as session_http:
         async with session_http.get(
             f"{current_app.config['DISCORD_API_BASE']}/users/@me",
             headers=headers
@@ -61,7 +74,7 @@ async def get_user_guilds(access_token: str) -> list:
     """Get user's guilds from Discord API"""
     headers = {'Authorization': f'Bearer {access_token}'}
     
-    async with aiohttp.ClientSession() as session_http:
+    async with get_http_session() as session_http:
         async with session_http.get(
             f"{current_app.config['DISCORD_API_BASE']}/users/@me/guilds",
             headers=headers
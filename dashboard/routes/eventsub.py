@@ -0,0 +1,56 @@
+"""
+Twitch EventSub Webhook Receiver
+"""
+
+import json
+from quart import Blueprint, request
+
+from utils.twitch_eventsub import HEADER_ID, HEADER_TYPE, EventSubError, verify_message
+
+eventsub_bp = Blueprint('eventsub', __name__)
+
+
+def get_notifier():
+    """StreamNotifier cog, if it is loaded and EventSub is configured"""
+    from dashboard.app import get_bot
+    bot = get_bot()
+    cog = bot.get_cog('StreamNotifier') if bot else None
+    if cog is None or getattr(cog, 'eventsub', None) is None:
+        return None
+    return cog
+
+
+@eventsub_bp.route('/twitch', methods=['POST'])
+async def twitch_callback():
+    """Receive EventSub messages: challenge, notification, revocation"""
+    cog = get_notifier()
+    if cog is None:
+        return 'EventSub is not configured', 404
+
+    body = await request.get_data()
+    try:
+        verify_message(cog.eventsub.secret, request.headers, body)
+    except EventSubError as e:
+        cog.eventsub.stats['rejected'] += 1
+        return str(e), 403
+
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return 'Invalid JSON', 400
+
+    message_type = request.headers.get(HEADER_TYPE)
+    if message_type == 'webhook_callback_verification':
+        return message.get('challenge', ''), 200, {'Content-Type': 'text/plain'}
+
+    # Twitch retries deliveries; answer quickly and process each message once
+    if cog.eventsub.seen(request.headers[HEADER_ID]):
+        return '', 204
+
+    subscription = message.get('subscription', {})
+    if message_type == 'notification':
+        cog.dispatch_eventsub(subscription.get('type'), message.get('event', {}))
+    elif message_type == 'revocation':
+        cog.eventsub_revoked(subscription)
+
+    return '', 204
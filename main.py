@@ -4,6 +4,9 @@ import os
 import asyncio
 from dotenv import load_dotenv  # <— добавили
 
+from utils.http import HttpClient
+from utils.intents import apply_optional_intents, collect_required_intents, intents_report, memory_usage_mb
+
 # Dashboard imports (optional - will work without dashboard if imports fail)
 dashboard_enabled = False
 try:
@@ -15,10 +18,15 @@ except ImportError:
 class MyBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
-        intents.presences = True
+        intents.presences = True  # Выключается в setup_hook, если ни одному когу не нужен
         intents.members = True
         intents.message_content = True
         super().__init__(command_prefix='!', intents=intents, help_command=None)
+        # Тот же объект использует шлюз при IDENTIFY (он происходит после setup_hook)
+        self.requested_intents = intents
+        self.cog_intents = {}
+        # Общий HTTP-клиент для когов и дашборда (Telegram, Twitch, YouTube, OAuth2)
+        self.http_client = HttpClient()
 
     async def setup_hook(self):
         # Автозагрузка когов из ./cogs (если папка есть)
@@ -31,6 +39,14 @@ class MyBot(commands.Bot):
                     except Exception as e:
                         print(f'❌ Ошибка загрузки {filename}: {e}')
 
+        self.cog_intents = collect_required_intents(self)
+        apply_optional_intents(self.requested_intents, self.cog_intents)
+        print(intents_report(self.requested_intents, self.cog_intents))
+
+    async def close(self):
+        await super().close()
+        await self.http_client.close()
+
 
 bot = MyBot()
 
@@ -38,6 +54,10 @@ bot = MyBot()
 async def on_ready():
     print(f'🤖 Бот {bot.user} запущен!')
     print(f'📊 Подключен к {len(bot.guilds)} серверам')
+    memory = memory_usage_mb()
+    if memory is not None:
+        print(f'🧠 Память после загрузки серверов: {memory:.1f} МБ '
+              f'(presences: {"вкл" if bot.intents.presences else "выкл"})')
     
     # Синхронизация команд только при явном указании через переменную окружения
     sync_commands = os.getenv('SYNC_COMMANDS', 'false').lower() == 'true'
@@ -0,0 +1 @@
+# Вспомогательные скрипты для разработки (не загружаются ботом)
@@ -0,0 +1,142 @@
+"""
+Нагрузочный тест моста Discord → Telegram
+
+Прогоняет N синтетических сообщений Discord через TelegramBridge.on_message
+(маршрутизация, форматирование, склейка, очередь с лимитами) в локальную
+имитацию Bot API и печатает доставленные сообщения в секунду, повторы,
+ответы 429 и сквозную задержку.
+
+    python -m tools.bench_bridge --messages 5000 --chats 50 --rate-429 0.01
+    python -m tools.bench_bridge --messages 5000 --chats 5 --batch 1 --unthrottled
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import deque
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+from tools.fake_telegram import FakeTelegram  # noqa: E402
+from utils.http import HttpClient  # noqa: E402
+from utils.rate_limit import TokenBucket  # noqa: E402
+
+_MARK_RE = re.compile(r"#(\d+)#")
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def make_message(number: int, channel_id: int) -> SimpleNamespace:
+    """Синтетическое сообщение бота логов"""
+    return SimpleNamespace(
+        id=number,
+        channel=SimpleNamespace(id=channel_id, name=f"logs-{channel_id}"),
+        author=SimpleNamespace(bot=True, display_name="Logger"),
+        content=f"Событие #{number}# на сервере: участник <user> изменил ник & роль",
+        attachments=[],
+        embeds=[],
+        stickers=[],
+        type=discord.MessageType.default,
+        webhook_id=None,
+    )
+
+
+async def run(args):
+    server = FakeTelegram(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                          retry_after=args.retry_after, fail_rate=args.fail_rate, seed=1)
+    api_base = await server.start()
+
+    workdir = tempfile.mkdtemp(prefix="bridge_bench_")
+    os.chdir(workdir)  # Конфиг и спул моста создаются во временной папке
+    channels = [1000 + i for i in range(args.chats)]
+    with open("telegram_bridge_config.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "telegram_bot_token": "bench",
+            "telegram_api_base": api_base,
+            "enabled": True,
+            "forward_attachments": False,
+            "batch_messages": args.batch > 0,
+            "batch_window_seconds": args.batch or 3,
+            "routes": [{"discord_channel_id": str(c), "telegram_chat_id": f"-100{c}"} for c in channels],
+        }, f)
+
+    from cogs.tg_link import TelegramBridge
+
+    http_client = HttpClient()
+    bot = SimpleNamespace(http_client=http_client, user=None)
+    bridge = TelegramBridge(bot)
+    bridge.outbox.latencies = deque()  # Все замеры, а не последние 500
+    if args.unthrottled:
+        bridge.outbox.global_bucket = TokenBucket(rate=1e9, capacity=1e9)
+        for c in channels:
+            bridge.outbox._chat_buckets[f"-100{c}"] = TokenBucket(rate=1e9, capacity=1e9)
+    await bridge.cog_load()
+
+    print(f"🚀 {args.messages} сообщений → {args.chats} чатов "
+          f"(задержка {args.latency}с, 429: {args.rate_429:.0%}, 5xx: {args.fail_rate:.0%}, "
+          f"склейка: {f'{args.batch}с' if args.batch else 'нет'}, лимиты: {'нет' if args.unthrottled else 'Telegram'})")
+
+    sent_at = {}
+    started = time.monotonic()
+    for number in range(1, args.messages + 1):
+        sent_at[number] = time.time()
+        await bridge.on_message(make_message(number, channels[number % len(channels)]))
+        if args.interval:
+            await asyncio.sleep(args.interval)
+    enqueued = time.monotonic() - started
+
+    # Ждём, пока опустеют склейка и очередь
+    while bridge.outbox.depth() or any(b._pending for b in bridge.batchers.values()):
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - started
+
+    latencies = []
+    for chat in server.messages.values():
+        for message in chat:
+            for number in _MARK_RE.findall(message.get("text", "")):
+                latencies.append(message["received_at"] - sent_at[int(number)])
+
+    stats = bridge.outbox.stats
+    print(f"⏱️ Постановка в очередь: {enqueued:.2f}с, доставка всего: {elapsed:.2f}с")
+    print(f"📨 Доставлено сообщений Discord: {len(latencies)}/{args.messages} "
+          f"({len(latencies) / elapsed:.1f}/с), запросов sendMessage: {server.calls['sendMessage']}")
+    print(f"🔁 Повторов: {stats['retries']}, 429: {stats['rate_limited']}, отброшено: {stats['failed']} "
+          f"(подмешано сервером: {dict(server.injected)})")
+    print(f"📈 Сквозная задержка: p50 {percentile(latencies, 0.5):.3f}с, "
+          f"p95 {percentile(latencies, 0.95):.3f}с, max {max(latencies, default=0):.3f}с")
+
+    bridge.cog_unload()
+    await http_client.close()
+    await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест моста Discord → Telegram")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=50, help="Число маршрутов (чатов Telegram)")
+    parser.add_argument("--interval", type=float, default=0.0, help="Пауза между сообщениями Discord, с")
+    parser.add_argument("--batch", type=float, default=0.0, help="Окно склейки, с (0 — без склейки)")
+    parser.add_argument("--unthrottled", action="store_true", help="Снять лимиты частоты Telegram")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
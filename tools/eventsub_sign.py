@@ -0,0 +1,136 @@
+"""
+Генератор подписанных сообщений Twitch EventSub для локальной проверки
+
+Собирает сообщение так же, как Twitch (заголовки Twitch-Eventsub-*, подпись
+HMAC-SHA256 секретом), и отправляет его на адрес приёмника дашборда или
+печатает готовую команду curl.
+
+    python -m tools.eventsub_sign stream.online --login somestreamer --secret s3cret \\
+        --url http://127.0.0.1:5000/eventsub/twitch
+    python -m tools.eventsub_sign challenge --secret s3cret --url http://127.0.0.1:5000/eventsub/twitch
+    python -m tools.eventsub_sign stream.offline --login somestreamer --secret s3cret --curl
+
+--stale и --bad-signature проверяют, что приёмник отклоняет такие сообщения.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import shlex
+import sys
+import uuid
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.twitch_eventsub import (  # noqa: E402
+    HEADER_ID, HEADER_SIGNATURE, HEADER_TIMESTAMP, HEADER_TYPE, sign,
+)
+
+MESSAGE_TYPES = {
+    "stream.online": "notification",
+    "stream.offline": "notification",
+    "challenge": "webhook_callback_verification",
+    "revocation": "revocation",
+}
+
+
+def build_message(secret: str, kind: str, login: str = "teststreamer", user_id: str = "12345",
+                  callback: str = "https://example.com/eventsub/twitch", message_id: Optional[str] = None,
+                  timestamp: Optional[datetime.datetime] = None) -> Tuple[Dict[str, str], bytes]:
+    """(заголовки, тело) сообщения EventSub вида kind"""
+    now = timestamp or datetime.datetime.now(datetime.timezone.utc)
+    subscription_type = kind if kind.startswith("stream.") else "stream.online"
+    subscription = {
+        "id": str(uuid.uuid4()),
+        "status": "authorization_revoked" if kind == "revocation" else "enabled",
+        "type": subscription_type,
+        "version": "1",
+        "cost": 1,
+        "condition": {"broadcaster_user_id": user_id},
+        "transport": {"method": "webhook", "callback": callback},
+        "created_at": now.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+    }
+
+    message = {"subscription": subscription}
+    if kind == "challenge":
+        message["subscription"]["status"] = "webhook_callback_verification_pending"
+        message["challenge"] = uuid.uuid4().hex
+    elif kind.startswith("stream."):
+        event = {
+            "broadcaster_user_id": user_id,
+            "broadcaster_user_login": login,
+            "broadcaster_user_name": login,
+        }
+        if kind == "stream.online":
+            event.update(id=str(uuid.uuid4()), type="live", started_at=subscription["created_at"])
+        message["event"] = event
+
+    body = json.dumps(message).encode()
+    message_id = message_id or str(uuid.uuid4())
+    # Twitch присылает время с наносекундами
+    timestamp = now.strftime("%Y-%m-%dT%H:%M:%S.%f") + "123Z"
+    headers = {
+        HEADER_ID: message_id,
+        HEADER_TIMESTAMP: timestamp,
+        HEADER_SIGNATURE: sign(secret, message_id, timestamp, body),
+        HEADER_TYPE: MESSAGE_TYPES[kind],
+        "Twitch-Eventsub-Subscription-Type": subscription_type,
+        "Twitch-Eventsub-Subscription-Version": "1",
+        "Content-Type": "application/json",
+    }
+    return headers, body
+
+
+async def send(url: str, headers: Dict[str, str], body: bytes, repeat: int):
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        for _ in range(repeat):
+            async with session.post(url, headers=headers, data=body) as resp:
+                print(f"{resp.status} {await resp.text()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Подписанные сообщения Twitch EventSub")
+    parser.add_argument("kind", choices=sorted(MESSAGE_TYPES))
+    parser.add_argument("--secret", default=os.getenv("TWITCH_EVENTSUB_SECRET"))
+    parser.add_argument("--login", default="teststreamer")
+    parser.add_argument("--user-id", default="12345")
+    parser.add_argument("--url", help="Адрес приёмника (иначе сообщение печатается)")
+    parser.add_argument("--curl", action="store_true", help="Напечатать команду curl")
+    parser.add_argument("--repeat", type=int, default=1, help="Отправить одно сообщение несколько раз (повтор доставки)")
+    parser.add_argument("--stale", action="store_true", help="Время сообщения на 15 минут в прошлом")
+    parser.add_argument("--bad-signature", action="store_true", help="Испортить подпись")
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("нужен --secret или TWITCH_EVENTSUB_SECRET")
+
+    timestamp = None
+    if args.stale:
+        timestamp = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=15)
+    headers, body = build_message(args.secret, args.kind, args.login, args.user_id,
+                                  callback=args.url or "https://example.com/eventsub/twitch", timestamp=timestamp)
+    if args.bad_signature:
+        headers[HEADER_SIGNATURE] = "sha256=" + "0" * 64
+
+    if args.url and not args.curl:
+        asyncio.run(send(args.url, headers, body, args.repeat))
+        return
+
+    if args.curl:
+        parts = ["curl", "-i", "-X", "POST", args.url or "http://127.0.0.1:5000/eventsub/twitch"]
+        for name, value in headers.items():
+            parts += ["-H", f"{name}: {value}"]
+        parts += ["--data-binary", body.decode()]
+        print(" ".join(shlex.quote(part) for part in parts))
+        return
+
+    print(json.dumps(headers, indent=2))
+    print(body.decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Локальная имитация Telegram Bot API для нагрузочной проверки моста
+
+Поддерживает sendMessage, sendDocument, sendPhoto, sendMediaGroup,
+editMessageText, deleteMessage и getUpdates (long polling). Задержка
+ответа, доля ответов 429 и доля ошибок 5xx настраиваются.
+
+Запуск отдельно:
+    python -m tools.fake_telegram --port 8081 --latency 0.05 --rate-429 0.02
+
+и в telegram_bridge_config.json: "telegram_api_base": "http://127.0.0.1:8081"
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    """Имитация Bot API: принимает запросы любого токена и считает их"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_429: float = 0.0,
+                 retry_after: int = 1, fail_rate: float = 0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+
+        self.calls = Counter()  # Успешные вызовы по методам
+        self.injected = Counter()  # Выданные 429 и 5xx
+        self.messages: Dict[str, List[dict]] = defaultdict(list)  # chat_id → сообщения
+        self.uploaded_bytes = 0
+        self._next_message_id = 1
+        self._updates: List[dict] = []
+        self._next_update_id = 1
+        self._updates_event = asyncio.Event()
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = None
+
+    # ---------- Управление ----------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запустить сервер; возвращает базовый URL для telegram_api_base"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def push_update(self, chat_id, text: str, first_name: str = "Tester", username: str = None):
+        """Добавить входящее сообщение, которое отдаст getUpdates"""
+        sender = {"id": 1, "is_bot": False, "first_name": first_name}
+        if username:
+            sender["username"] = username
+        self._updates.append({
+            "update_id": self._next_update_id,
+            "message": {
+                "message_id": self._new_message_id(),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id)},
+                "from": sender,
+                "text": text,
+            },
+        })
+        self._next_update_id += 1
+        self._updates_event.set()
+
+    # ---------- Обработка запросов ----------
+
+    def _new_message_id(self) -> int:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return message_id
+
+    async def _read_payload(self, request: web.Request) -> dict:
+        if request.content_type.startswith("multipart/"):
+            payload = {}
+            reader = await request.multipart()
+            async for part in reader:
+                if part.filename:
+                    while True:
+                        chunk = await part.read_chunk()
+                        if not chunk:
+                            break
+                        self.uploaded_bytes += len(chunk)
+                    payload[part.name] = part.filename
+                else:
+                    payload[part.name] = await part.text()
+            return payload
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        payload = await self._read_payload(request)
+
+        if method != "getUpdates":
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+
+            roll = self.random.random()
+            if roll < self.rate_429:
+                self.injected["429"] += 1
+                return web.json_response({
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, status=429)
+            if roll < self.rate_429 + self.fail_rate:
+                self.injected["5xx"] += 1
+                return web.json_response({"ok": False, "error_code": 502, "description": "Bad Gateway"}, status=502)
+
+        handler = getattr(self, f"_{method}", None)
+        if handler is None:
+            return web.json_response({"ok": False, "error_code": 404, "description": "Not Found"}, status=404)
+
+        result = await handler(payload)
+        self.calls[method] += 1
+        return web.json_response({"ok": True, "result": result})
+
+    def _message(self, payload: dict, **extra) -> dict:
+        message = {
+            "message_id": self._new_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": int(payload["chat_id"])},
+            "received_at": time.time(),  # Не из Bot API: для замера сквозной задержки
+            **extra,
+        }
+        self.messages[str(payload["chat_id"])].append(message)
+        return message
+
+    async def _sendMessage(self, payload):
+        return self._message(payload, text=payload.get("text", ""))
+
+    async def _sendDocument(self, payload):
+        return self._message(payload, document={"file_name": payload.get("document")})
+
+    async def _sendPhoto(self, payload):
+        return self._message(payload, photo=[{"file_id": payload.get("photo")}])
+
+    async def _sendMediaGroup(self, payload):
+        files = [key for key in payload if key.startswith("file")]
+        return [self._message(payload, photo=[{"file_id": payload[key]}]) for key in files]
+
+    async def _editMessageText(self, payload):
+        for message in self.messages.get(str(payload["chat_id"]), []):
+            if message["message_id"] == int(payload["message_id"]):
+                message["text"] = payload.get("text", "")
+                return message
+        return True
+
+    async def _deleteMessage(self, payload):
+        chat = self.messages.get(str(payload["chat_id"]), [])
+        chat[:] = [m for m in chat if m["message_id"] != int(payload["message_id"])]
+        return True
+
+    async def _getUpdates(self, payload):
+        offset = int(payload.get("offset") or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._updates_event.clear()
+            try:
+                await asyncio.wait_for(self._updates_event.wait(), timeout=float(payload.get("timeout", 0)))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:100]
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Локальная имитация Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке, с")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Доля ответов 502")
+    args = parser.parse_args()
+
+    server = FakeTelegram(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                          retry_after=args.retry_after, fail_rate=args.fail_rate)
+    url = await server.start(args.host, args.port)
+    print(f"🧪 Имитация Telegram Bot API: {url}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"📊 Вызовы: {dict(server.calls)}, подмешано: {dict(server.injected)}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
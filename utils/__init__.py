@@ -0,0 +1 @@
+# Общие вспомогательные модули бота (не являются когами)
@@ -0,0 +1,117 @@
+"""
+Пакетная выборка журнала аудита
+
+Вместо отдельного API-запроса на каждое событие (fetch_ban и т.п.) все
+запросы, пришедшие в течение короткого окна, объединяются в одну
+постраничную выборку guild.audit_logs. Результаты кэшируются по ключу
+(action, target_id) на короткое время.
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+import discord
+
+
+class AuditLogFetcher:
+    """Выборка журнала аудита для одного сервера с объединением запросов"""
+
+    def __init__(self, guild: discord.Guild, ttl: float = 30.0, burst_window: float = 1.5,
+                 max_entries: int = 500, max_age: float = 60.0):
+        self.guild = guild
+        self.ttl = ttl  # Сколько секунд хранится запись в кэше
+        self.burst_window = burst_window  # Окно сбора запросов перед выборкой
+        self.max_entries = max_entries  # Ограничение на одну выборку (страницы по 100)
+        self.max_age = max_age  # Более старые записи не относятся к текущим событиям
+        self._cache: Dict[Tuple[discord.AuditLogAction, int], Tuple[discord.AuditLogEntry, float]] = {}
+        self._pending: Optional[asyncio.Task] = None
+        self._collecting = False  # Идёт окно сбора, выборка ещё не началась
+        self._last_entry_id: Optional[int] = None
+        self._forbidden_until = 0.0
+
+    def _get_cached(self, action, target_id) -> Optional[discord.AuditLogEntry]:
+        cached = self._cache.get((action, target_id))
+        if cached and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        return None
+
+    async def lookup(self, action: discord.AuditLogAction, target_id: int) -> Optional[discord.AuditLogEntry]:
+        """Найти запись журнала аудита для действия над объектом"""
+        entry = self._get_cached(action, target_id)
+        if entry:
+            return entry
+
+        if time.monotonic() < self._forbidden_until:
+            return None
+
+        # Все параллельные запросы ждут одну и ту же выборку. Если выборка уже
+        # идёт, событие могло в неё не попасть — ставим следующую за ней.
+        if self._pending is None or self._pending.done() or not self._collecting:
+            previous = self._pending if self._pending and not self._pending.done() else None
+            self._collecting = True
+            self._pending = asyncio.create_task(self._fetch_after_burst(previous))
+        await asyncio.shield(self._pending)
+
+        return self._get_cached(action, target_id)
+
+    async def _fetch_after_burst(self, previous: Optional[asyncio.Task] = None):
+        """Ждёт окончания всплеска событий и делает одну выборку"""
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        await asyncio.sleep(self.burst_window)
+        self._collecting = False
+        try:
+            await self._fetch()
+        except discord.Forbidden:
+            # Нет права view_audit_log — не повторяем попытки какое-то время
+            self._forbidden_until = time.monotonic() + self.ttl
+        except discord.HTTPException as e:
+            print(f"❌ Ошибка получения журнала аудита ({self.guild.id}): {e}")
+
+    async def _fetch(self):
+        now = time.monotonic()
+        oldest = discord.utils.utcnow().timestamp() - self.max_age
+
+        newest_first = not self._last_entry_id
+        if not newest_first:
+            # Забираем только новые записи с прошлой выборки
+            entries = self.guild.audit_logs(limit=self.max_entries, after=discord.Object(id=self._last_entry_id))
+        else:
+            # Первая выборка — от новых к старым, пока записи не старше max_age: после
+            # массового бана событий может быть больше одной страницы
+            entries = self.guild.audit_logs(limit=self.max_entries)
+
+        async for entry in entries:
+            if self._last_entry_id is None or entry.id > self._last_entry_id:
+                self._last_entry_id = entry.id
+
+            if entry.created_at.timestamp() < oldest:
+                if newest_first:
+                    break  # Дальше только более старые
+                continue
+
+            target_id = getattr(entry.target, 'id', None)
+            if target_id is None:
+                continue
+
+            key = (entry.action, target_id)
+            cached = self._cache.get(key)
+            if cached is None or cached[0].id < entry.id:
+                self._cache[key] = (entry, now)
+
+        # Чистим устаревшие записи
+        for key, (_, cached_at) in list(self._cache.items()):
+            if now - cached_at >= self.ttl:
+                del self._cache[key]
+
+
+def add_audit_fields(embed: discord.Embed, entry: Optional[discord.AuditLogEntry]):
+    """Добавляет в эмбед модератора и причину из записи журнала аудита"""
+    if entry is None:
+        return
+
+    if entry.user:
+        embed.add_field(name="Модератор", value=entry.user.mention, inline=True)
+    if entry.reason:
+        embed.add_field(name="Причина", value=entry.reason[:1024], inline=False)
@@ -0,0 +1,97 @@
+"""
+Общий HTTP-клиент бота
+
+Одна aiohttp-сессия на процесс: пул соединений с лимитом на хост,
+keep-alive, кэш DNS и общие таймауты. Запросы считаются по хостам
+(количество, ошибки, время ответа) через TraceConfig.
+"""
+
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import aiohttp
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=10, sock_connect=10, sock_read=60)
+
+
+class HostMetrics:
+    """Счётчики запросов к одному хосту"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses: Dict[int, int] = {}
+        self.latencies: Deque[float] = deque(maxlen=200)
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        }
+
+
+class HttpClient:
+    """Управляемая общая сессия aiohttp с метриками"""
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, dns_ttl: int = 300,
+                 keepalive_timeout: float = 30, timeout: aiohttp.ClientTimeout = DEFAULT_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.hosts: Dict[str, HostMetrics] = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Сессия создаётся при первом обращении (нужен запущенный event loop)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                trace_configs=[self._trace_config()],
+            )
+        return self._session
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_start(session, context, params):
+            context.started = time.monotonic()
+
+        async def on_end(session, context, params):
+            metrics = self.hosts.setdefault(params.url.host, HostMetrics())
+            metrics.requests += 1
+            metrics.statuses[params.response.status] = metrics.statuses.get(params.response.status, 0) + 1
+            metrics.latencies.append(time.monotonic() - context.started)
+
+        async def on_exception(session, context, params):
+            metrics = self.hosts.setdefault(params.url.host, HostMetrics())
+            metrics.requests += 1
+            metrics.errors += 1
+
+        trace.on_request_start.append(on_start)
+        trace.on_request_end.append(on_end)
+        trace.on_request_exception.append(on_exception)
+        return trace
+
+    def metrics(self) -> Dict[str, dict]:
+        """Метрики по хостам"""
+        return {host: metrics.summary() for host, metrics in self.hosts.items()}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,74 @@
+"""
+Привилегированные интенты по потребностям когов
+
+Ког объявляет нужные ему интенты атрибутом required_intents, например
+("presences",). Бот подключается к шлюзу после setup_hook, поэтому после
+загрузки когов необязательные интенты (presences — самый тяжёлый поток
+событий) можно выключить, если ни одному загруженному когу они не нужны.
+"""
+
+import os
+import sys
+from typing import Dict, Iterable, Tuple
+
+import discord
+from discord.ext import commands
+
+# presence — стримы по статусам участников (нужен интент presences),
+# polling — только по API Twitch/YouTube в cogs/follow.py
+STREAM_DETECTION = os.getenv("STREAM_DETECTION", "presence").lower()
+
+OPTIONAL_INTENTS = ("presences",)  # Включаются, только если нужны какому-то когу
+
+
+def collect_required_intents(bot: commands.Bot) -> Dict[str, Tuple[str, ...]]:
+    """{имя кога: интенты} для загруженных когов, которые что-то требуют"""
+    result = {}
+    for name, cog in bot.cogs.items():
+        required = tuple(getattr(cog, "required_intents", ()))
+        if required:
+            result[name] = required
+    return result
+
+
+def apply_optional_intents(intents: discord.Intents, required: Dict[str, Iterable[str]]):
+    """Выключить необязательные интенты, которые не нужны ни одному когу"""
+    needed = {intent for names in required.values() for intent in names}
+    for intent in OPTIONAL_INTENTS:
+        setattr(intents, intent, intent in needed)
+
+
+def intents_report(intents: discord.Intents, required: Dict[str, Iterable[str]]) -> str:
+    lines = ["🔌 Интенты когов:"]
+    for name, names in sorted(required.items()):
+        lines.append(f"   • {name}: {', '.join(names)}")
+    if not required:
+        lines.append("   • (ни один ког не требует привилегированных интентов)")
+
+    enabled = [name for name in ("presences", "members", "message_content") if getattr(intents, name)]
+    disabled = [name for name in OPTIONAL_INTENTS if not getattr(intents, name)]
+    lines.append(f"   Привилегированные: {', '.join(enabled) or 'нет'}"
+                 + (f"; выключены: {', '.join(disabled)}" if disabled else ""))
+    lines.append(f"   Обнаружение стримов: {STREAM_DETECTION}")
+    return "\n".join(lines)
+
+
+def memory_usage_mb():
+    """
+    RSS процесса в МБ. Без psutil — пиковый RSS из resource (сразу после
+    запуска он почти равен текущему); None, если нет и его (Windows)
+    """
+    try:
+        import psutil
+    except ImportError:
+        pass
+    else:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
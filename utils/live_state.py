@@ -0,0 +1,100 @@
+"""
+Общее хранилище «кто сейчас в эфире»
+
+Уведомители стримов держат здесь отметки об объявленных эфирах, чтобы после
+перезапуска не объявлять их снова. Каждый ког работает со своим разделом
+(обычный dict) и после изменения вызывает changed(): запись откладывается на
+несколько секунд, чтобы серия изменений дала одну запись, и выполняется
+атомарно (временный файл + os.replace) — оборванная запись не портит снимок.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional
+
+LIVE_STATE_FILE = "live_state.json"
+SAVE_DELAY = 5.0  # Окно затишья перед записью, с
+SAVE_MAX_HOLD = 30.0  # Дольше этого изменения не копятся даже при постоянном потоке
+
+
+class LiveStateStore:
+    """Разделы {имя: dict} с отложенной атомарной записью в JSON"""
+
+    def __init__(self, path: str = LIVE_STATE_FILE, delay: float = SAVE_DELAY, max_hold: float = SAVE_MAX_HOLD):
+        self.path = path
+        self.delay = delay
+        self.max_hold = max_hold
+        self._sections: Dict[str, dict] = {}
+        self._loaded = False
+        self._dirty_since: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.saves = 0
+
+    def load(self):
+        """Прочитать снимок (один раз за процесс: при перезагрузке кога состояние уже в памяти)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"❌ Ошибка чтения {self.path}: {e}")
+            return
+        for name, values in data.items():
+            if isinstance(values, dict):
+                self.section(name).update(values)
+
+    def section(self, name: str) -> dict:
+        """Раздел кога; один и тот же объект на всё время работы"""
+        return self._sections.setdefault(name, {})
+
+    def changed(self):
+        """Отметить изменение: запись после паузы в delay секунд (но не позже max_hold)"""
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(0.0, min(self.delay, self.max_hold - (now - self._dirty_since)))
+        self._timer = loop.call_later(delay, self.flush)
+
+    def flush(self):
+        """Записать снимок сейчас, если есть изменения"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._dirty_since is None:
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._sections, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"❌ Ошибка сохранения {self.path}: {e}")
+            return
+        self._dirty_since = None
+        self.saves += 1
+
+
+_stores: Dict[str, LiveStateStore] = {}
+
+
+def get_live_state(path: str = LIVE_STATE_FILE) -> LiveStateStore:
+    """Общий экземпляр для файла path (все коги пишут в один снимок)"""
+    if path not in _stores:
+        _stores[path] = LiveStateStore(path)
+    return _stores[path]
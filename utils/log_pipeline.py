@@ -0,0 +1,180 @@
+"""
+Очередь логов с классами приоритета
+
+События делятся на классы (модерация > участники > сообщения > голос).
+У каждого сервера свои очереди по классам и один отправляющий таск,
+который выбирает следующий класс взвешенным циклическим планированием
+(smooth weighted round-robin): волна смен ников не задерживает логи банов.
+
+Политика класса при переполнении очереди:
+- delay    — всё ждёт своей очереди; max_queue не действует, но есть жёсткий
+             потолок DELAY_QUEUE_FACTOR × max_queue, сверх него новые события
+             отбрасываются (иначе волна спама растила бы очередь без предела);
+- coalesce — несколько эмбедов отправляются одним сообщением (до 10 штук),
+             при переполнении вытесняются самые старые;
+- drop     — новые события отбрасываются, пока очередь полна.
+"""
+
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List
+
+import discord
+
+# Классы в порядке убывания приоритета (при равенстве весов выигрывает первый)
+LOG_CLASSES = ("moderation", "membership", "message", "voice")
+
+LOG_CLASS_TITLES = {
+    "moderation": "Модерация",
+    "membership": "Участники",
+    "message": "Сообщения",
+    "voice": "Голосовые каналы",
+}
+
+EVENT_CLASSES = {
+    "member_ban": "moderation",
+    "member_unban": "moderation",
+    "role_changes": "moderation",
+    "channel_changes": "moderation",
+    "member_join": "membership",
+    "member_leave": "membership",
+    "member_update": "membership",
+    "message_delete": "message",
+    "message_edit": "message",
+    "voice_changes": "voice",
+}
+
+POLICIES = ("delay", "coalesce", "drop")
+
+DEFAULT_PRIORITY_CLASSES = {
+    "moderation": {"weight": 8, "policy": "delay", "max_queue": 1000},
+    "membership": {"weight": 4, "policy": "coalesce", "max_queue": 500},
+    "message": {"weight": 2, "policy": "coalesce", "max_queue": 500},
+    "voice": {"weight": 1, "policy": "drop", "max_queue": 100},
+}
+
+DELAY_QUEUE_FACTOR = 10  # Потолок очереди delay в единицах max_queue
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000  # Суммарный лимит текста эмбедов в одном сообщении
+
+
+def normalize_priority_classes(raw) -> Dict[str, dict]:
+    """Дополняет настройки классов значениями по умолчанию и проверяет их"""
+    raw = raw if isinstance(raw, dict) else {}
+    result = {}
+    for log_class, defaults in DEFAULT_PRIORITY_CLASSES.items():
+        settings = raw.get(log_class) if isinstance(raw.get(log_class), dict) else {}
+        policy = settings.get("policy", defaults["policy"])
+        try:
+            weight = min(max(int(settings.get("weight", defaults["weight"])), 1), 100)
+        except (TypeError, ValueError):
+            weight = defaults["weight"]
+        try:
+            max_queue = min(max(int(settings.get("max_queue", defaults["max_queue"])), 10), 10000)
+        except (TypeError, ValueError):
+            max_queue = defaults["max_queue"]
+
+        result[log_class] = {
+            "weight": weight,
+            "policy": policy if policy in POLICIES else defaults["policy"],
+            "max_queue": max_queue,
+        }
+    return result
+
+
+class LogPipeline:
+    """Приоритетные очереди логов по серверам"""
+
+    def __init__(self, deliver: Callable[[discord.Guild, List[discord.Embed]], Awaitable],
+                 get_policies: Callable[[int], Dict[str, dict]]):
+        self.deliver = deliver  # Отправка пачки эмбедов в канал логов сервера
+        self.get_policies = get_policies
+        self._queues: Dict[int, Dict[str, Deque[discord.Embed]]] = {}
+        self._credit: Dict[int, Dict[str, int]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.dropped: Dict[int, Dict[str, int]] = {}
+
+    def put(self, guild: discord.Guild, log_class: str, embed: discord.Embed):
+        """Поставить эмбед в очередь класса"""
+        policy = self.get_policies(guild.id)[log_class]
+        queues = self._queues.setdefault(guild.id, {c: deque() for c in LOG_CLASSES})
+        queue = queues[log_class]
+
+        # delay ждёт дольше остальных, но не бесконечно: сверх потолка отбрасывает новые события
+        delay = policy["policy"] == "delay"
+        limit = policy["max_queue"] * DELAY_QUEUE_FACTOR if delay else policy["max_queue"]
+        if len(queue) >= limit:
+            dropped = self.dropped.setdefault(guild.id, {c: 0 for c in LOG_CLASSES})
+            dropped[log_class] += 1
+            if delay or policy["policy"] == "drop":
+                return
+            queue.popleft()
+
+        queue.append(embed)
+
+        worker = self._workers.get(guild.id)
+        if worker is None or worker.done():
+            self._workers[guild.id] = asyncio.create_task(self._worker(guild))
+
+    def queue_sizes(self, guild_id: int) -> Dict[str, int]:
+        queues = self._queues.get(guild_id, {})
+        return {c: len(queues.get(c, ())) for c in LOG_CLASSES}
+
+    def _pick(self, guild_id: int, policies: Dict[str, dict]):
+        """Выбор следующего класса (smooth weighted round-robin)"""
+        queues = self._queues[guild_id]
+        active = [c for c in LOG_CLASSES if queues[c]]
+        if not active:
+            return None
+
+        credit = self._credit.setdefault(guild_id, {c: 0 for c in LOG_CLASSES})
+        total = 0
+        for log_class in active:
+            credit[log_class] += policies[log_class]["weight"]
+            total += policies[log_class]["weight"]
+
+        best = max(active, key=lambda c: credit[c])
+        credit[best] -= total
+        return best
+
+    def _take_batch(self, queue: Deque[discord.Embed], coalesce: bool) -> List[discord.Embed]:
+        batch = [queue.popleft()]
+        if not coalesce:
+            return batch
+
+        chars = len(batch[0])
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(queue[0])
+            if chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(queue.popleft())
+            chars += size
+        return batch
+
+    async def _worker(self, guild: discord.Guild):
+        while True:
+            policies = self.get_policies(guild.id)
+            log_class = self._pick(guild.id, policies)
+            if log_class is None:
+                break
+
+            queue = self._queues[guild.id][log_class]
+            batch = self._take_batch(queue, policies[log_class]["policy"] == "coalesce")
+            try:
+                await self.deliver(guild, batch)
+            except Exception as e:
+                print(f"❌ Ошибка отправки логов ({guild.id}): {e}")
+
+        self._credit.pop(guild.id, None)
+
+    async def drain(self, timeout: float = 5.0):
+        """Дождаться отправки очередей (не дольше timeout), например перед выгрузкой кога"""
+        workers = [worker for worker in self._workers.values() if not worker.done()]
+        if workers:
+            await asyncio.wait(workers, timeout=timeout)
+
+    def stop(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
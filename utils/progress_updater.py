@@ -0,0 +1,134 @@
+"""
+Обновление сообщений «сейчас играет» с учётом лимитов Discord
+
+Раньше каждое сообщение правилось раз в секунду — при 30 серверах это 30
+PATCH-запросов в секунду, и глобальный лимит бота уходил на прогресс-бары.
+Теперь:
+- сообщение правится, только когда меняется видимое состояние (подпись
+  от кога — например, прогресс-бар и пауза), и не чаще min_interval;
+- правки всех серверов делят общий бюджет (TokenBucket), первыми идут самые
+  просроченные;
+- на 429 или медленный ответ интервал сообщения удваивается (до max_interval)
+  и бюджет приостанавливается, после быстрых правок интервал возвращается;
+- сообщения, под которыми уже hide_after новых сообщений, не правятся вовсе.
+"""
+
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+import discord
+
+from utils.rate_limit import TokenBucket
+
+SLOW_EDIT = 2.0  # Правка дольше этого — discord.py ждал лимит, считаем за 429
+
+
+class _Tracked:
+    __slots__ = ("message", "signature", "next_at", "interval", "after")
+
+    def __init__(self, message: discord.Message, interval: float):
+        self.message = message
+        self.signature = None  # Подпись последней отправленной версии
+        self.next_at = time.monotonic() + interval  # Свежеотправленное сообщение и так актуально
+        self.interval = interval
+        self.after = 0  # Сколько сообщений появилось в канале ниже
+
+
+class ProgressUpdater:
+    """Планировщик правок прогресс-сообщений"""
+
+    def __init__(self, edits_per_second: float = 2.0, min_interval: float = 5.0,
+                 max_interval: float = 60.0, hide_after: int = 10):
+        self.budget = TokenBucket(rate=edits_per_second, capacity=edits_per_second)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hide_after = hide_after
+
+        self._tracked: Dict[int, _Tracked] = {}  # message_id → состояние
+        self._by_channel: Dict[int, Set[int]] = {}  # channel_id → message_id
+
+        self.stats = {"edits": 0, "unchanged": 0, "rate_limited": 0, "hidden": 0, "deferred": 0}
+
+    # ---------- Состояние ----------
+
+    def _sync(self, messages: Dict[Hashable, discord.Message], signature: Callable[[Hashable], Any]):
+        """Привести отслеживание к текущим сообщениям кога"""
+        current = {message.id: (key, message) for key, message in messages.items()}
+        for message_id in set(self._tracked) - set(current):
+            tracked = self._tracked.pop(message_id)
+            channel = self._by_channel.get(tracked.message.channel.id)
+            if channel is not None:
+                channel.discard(message_id)
+                if not channel:
+                    del self._by_channel[tracked.message.channel.id]
+        for message_id, (key, message) in current.items():
+            if message_id not in self._tracked:
+                tracked = self._tracked[message_id] = _Tracked(message, self.min_interval)
+                tracked.signature = signature(key)  # Только что отправлено в актуальном виде
+                self._by_channel.setdefault(message.channel.id, set()).add(message_id)
+
+    def message_posted(self, channel_id: int, message_id: int):
+        """Новое сообщение в канале: отслеживаемые сообщения выше него уезжают из вида"""
+        for tracked_id in self._by_channel.get(channel_id, ()):
+            if message_id > tracked_id:
+                self._tracked[tracked_id].after += 1
+
+    # ---------- Правки ----------
+
+    async def tick(self, messages: Dict[Hashable, discord.Message],
+                   signature: Callable[[Hashable], Any], render: Callable[[Hashable], discord.Embed],
+                   on_gone: Optional[Callable[[Hashable], None]] = None):
+        """
+        Один проход: messages — {ключ: сообщение}, signature(ключ) — видимое состояние
+        (None — не обновлять), render(ключ) — новый embed. on_gone(ключ) — сообщение удалено.
+        """
+        self._sync(messages, signature)
+        now = time.monotonic()
+        keys = {message.id: key for key, message in messages.items()}
+
+        due = sorted((t for t in self._tracked.values() if t.next_at <= now), key=lambda t: t.next_at)
+        for tracked in due:
+            if tracked.after >= self.hide_after:
+                self.stats["hidden"] += 1
+                tracked.next_at = float("inf")  # Ниже уже много сообщений — не тратим запросы
+                continue
+
+            key = keys[tracked.message.id]
+            state = signature(key)
+            if state is None or state == tracked.signature:
+                self.stats["unchanged"] += 1
+                tracked.next_at = now + 1.0  # Проверка подписи дешёвая, без запроса
+                continue
+            if not self.budget.try_acquire():
+                self.stats["deferred"] += 1
+                break  # Остальные — в следующем проходе, самые просроченные первыми
+
+            started = time.monotonic()
+            try:
+                await tracked.message.edit(embed=render(key))
+            except discord.NotFound:
+                if on_gone:
+                    on_gone(key)
+                continue
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    if on_gone:
+                        on_gone(key)
+                    continue
+                self._back_off(tracked, getattr(e, "retry_after", None) or tracked.interval)
+                continue
+
+            elapsed = time.monotonic() - started
+            self.stats["edits"] += 1
+            tracked.signature = state
+            if elapsed > SLOW_EDIT:
+                self._back_off(tracked, elapsed)
+            else:
+                tracked.interval = max(self.min_interval, tracked.interval * 0.75)
+                tracked.next_at = time.monotonic() + tracked.interval
+
+    def _back_off(self, tracked: _Tracked, pause: float):
+        self.stats["rate_limited"] += 1
+        tracked.interval = min(self.max_interval, tracked.interval * 2)
+        tracked.next_at = time.monotonic() + tracked.interval
+        self.budget.penalize(pause)
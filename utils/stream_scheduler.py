@@ -0,0 +1,156 @@
+"""
+Адаптивное расписание проверок стримеров
+
+Каждый аккаунт ("twitch:login", "yt:channel_id") получает уровень:
+- hot  — обычно выходит в эфир в это время суток и стримил недавно;
+- warm — стримил в последние две недели, сейчас в эфире или истории ещё нет;
+- cold — давно не стримил или о его эфирах приходят push-уведомления
+  (EventSub), и опрос нужен только как страховка.
+Аккаунты лежат в куче по времени следующей проверки. Выдача ограничена
+общим бюджетом запросов в минуту: аккаунт Twitch стоит 1/100 запроса
+(Helix принимает 100 логинов), лента YouTube — целый запрос.
+
+История (гистограмма начал эфиров по часам UTC и время последнего эфира)
+хранится в JSON-файле.
+"""
+
+import heapq
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.rate_limit import TokenBucket
+
+TIER_INTERVALS = {"hot": 60, "warm": 300, "cold": 1800}
+REQUEST_COST = {"twitch": 1 / 100, "yt": 1.0}
+
+HOT_MAX_AGE = 3 * 86400
+WARM_MAX_AGE = 14 * 86400
+HOT_HOUR_SHARE = 0.15  # Доля начал эфиров в окне ±1 час, с которой время считается «обычным»
+HISTOGRAM_DECAY = 0.97  # Старые привычки постепенно забываются
+
+
+class StreamScheduler:
+    """Куча проверок с уровнями и бюджетом запросов"""
+
+    def __init__(self, history_file: str = "stream_schedule.json", requests_per_minute: float = 30):
+        self.history_file = history_file
+        self.history: Dict[str, dict] = self.load_history()
+        self.budget = TokenBucket(rate=requests_per_minute / 60, capacity=max(1.0, requests_per_minute / 4))
+
+        self._active = set()  # Привязанные аккаунты
+        self._heap: List[tuple] = []  # (next_at, key)
+        self._next_at: Dict[str, float] = {}  # Актуальное время проверки (устаревшие записи кучи пропускаются)
+        self._live: Dict[str, bool] = {}
+        self.covered: Set[str] = set()  # Аккаунты с push-уведомлениями
+        self._dirty = False
+
+    # ---------- История ----------
+
+    def load_history(self) -> Dict[str, dict]:
+        if not os.path.exists(self.history_file):
+            return {}
+        try:
+            with open(self.history_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save_history(self):
+        if not self._dirty:
+            return
+        try:
+            with open(self.history_file, "w", encoding="utf-8") as f:
+                json.dump(self.history, f, ensure_ascii=False)
+            self._dirty = False
+        except Exception as e:
+            print(f"❌ Ошибка сохранения истории стримов: {e}")
+
+    def _record_start(self, key: str, now: float):
+        entry = self.history.setdefault(key, {"hours": [0.0] * 24, "last_live": None})
+        entry["hours"] = [round(count * HISTOGRAM_DECAY, 4) for count in entry["hours"]]
+        entry["hours"][time.gmtime(now).tm_hour] += 1
+        entry["last_live"] = now
+        self._dirty = True
+
+    # ---------- Уровни ----------
+
+    def tier(self, key: str, now: Optional[float] = None) -> str:
+        now = now or time.time()
+        if key in self.covered:
+            return "cold"
+        if self._live.get(key):
+            return "warm"
+
+        entry = self.history.get(key)
+        if not entry or entry.get("last_live") is None:
+            return "warm"
+
+        age = now - entry["last_live"]
+        if age > WARM_MAX_AGE:
+            return "cold"
+
+        hours = entry["hours"]
+        total = sum(hours)
+        hour = time.gmtime(now).tm_hour
+        window = hours[(hour - 1) % 24] + hours[hour] + hours[(hour + 1) % 24]
+        if age <= HOT_MAX_AGE and total and window / total >= HOT_HOUR_SHARE:
+            return "hot"
+        return "warm"
+
+    def tiers(self) -> Dict[str, int]:
+        """Сколько аккаунтов на каждом уровне"""
+        counts = {name: 0 for name in TIER_INTERVALS}
+        for key in self._active:
+            counts[self.tier(key)] += 1
+        return counts
+
+    # ---------- Очередь ----------
+
+    def _push(self, key: str, next_at: float):
+        self._next_at[key] = next_at
+        heapq.heappush(self._heap, (next_at, key))
+
+    def sync(self, keys: Iterable[str]):
+        """Привести очередь к списку привязанных аккаунтов (новые проверяются сразу)"""
+        keys = set(keys)
+        now = time.time()
+        for key in keys - self._active:
+            self._push(key, now)
+        for key in self._active - keys:
+            self._next_at.pop(key, None)
+            self._live.pop(key, None)
+        self._active = keys
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """Аккаунты, которые пора проверить, в пределах бюджета запросов"""
+        now = now or time.time()
+        result = []
+        while self._heap and self._heap[0][0] <= now:
+            next_at, key = self._heap[0]
+            if self._next_at.get(key) != next_at:
+                heapq.heappop(self._heap)  # Отвязан или перенесён
+                continue
+            if not self.budget.try_acquire(REQUEST_COST[key.split(":", 1)[0]]):
+                break  # Остальные подождут следующего тика, самые просроченные — первыми
+            heapq.heappop(self._heap)
+            del self._next_at[key]
+            result.append(key)
+        return result
+
+    def complete(self, key: str, is_live: Optional[bool], now: Optional[float] = None):
+        """Результат проверки (None — не удалось) и постановка следующей"""
+        now = now or time.time()
+        if key not in self._active:
+            return
+        if is_live is not None:
+            last_live = self.history.get(key, {}).get("last_live") or 0
+            # Эфир, замеченный после перезапуска бота, — не новое начало
+            if is_live and not self._live.get(key) and now - last_live > TIER_INTERVALS["cold"]:
+                self._record_start(key, now)
+            elif is_live:
+                self.history[key]["last_live"] = now
+                self._dirty = True
+            self._live[key] = is_live
+        self._push(key, now + TIER_INTERVALS[self.tier(key, now)])
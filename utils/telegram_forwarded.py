@@ -0,0 +1,121 @@
+"""
+Журнал пересланных сообщений моста
+
+Ограниченное по размеру и времени LRU-множество ID сообщений Discord,
+уже отправленных в Telegram. Защищает от дублей при повторе событий
+шлюза (resume) и запоминает message_id созданного сообщения Telegram,
+чтобы правки и удаления шли через editMessageText/deleteMessage.
+Хранится в той же базе SQLite, что и исходящая очередь.
+"""
+
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 48 * 3600  # Telegram позволяет боту удалять сообщения не старше 48 часов
+PRUNE_EVERY = 500
+DELETED = 0  # telegram_id удалённого сообщения (настоящие message_id положительны)
+
+
+class ForwardedMessages:
+    """ID пересланных сообщений Discord → (чат, message_id в Telegram)"""
+
+    def __init__(self, db: sqlite3.Connection, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.db = db
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Optional[str], Optional[int], float]]" = OrderedDict()
+        self._writes = 0
+
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS forwarded ("
+            "discord_id INTEGER PRIMARY KEY, "
+            "chat_id TEXT, "
+            "telegram_id INTEGER, "
+            "created_at REAL NOT NULL)"
+        )
+        self.db.commit()
+        self._prune()
+
+        rows = self.db.execute(
+            "SELECT discord_id, chat_id, telegram_id, created_at FROM forwarded "
+            "ORDER BY created_at DESC LIMIT ?", (max_entries,)
+        ).fetchall()
+        for discord_id, chat_id, telegram_id, created_at in reversed(rows):
+            self._entries[discord_id] = (chat_id, telegram_id, created_at)
+
+        self.duplicates = 0  # Сколько повторных событий отсеяно
+
+    def __len__(self):
+        return len(self._entries)
+
+    def claim(self, discord_id: int) -> bool:
+        """Отметить сообщение как пересылаемое. False — оно уже было переслано"""
+        now = time.time()
+        entry = self._entries.get(discord_id)
+        if entry is not None and now - entry[2] < self.ttl:
+            self.duplicates += 1
+            return False
+
+        self._entries[discord_id] = (None, None, now)
+        self._entries.move_to_end(discord_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO forwarded (discord_id, chat_id, telegram_id, created_at) VALUES (?, NULL, NULL, ?)",
+            (discord_id, now)
+        )
+        self.db.commit()
+
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self._prune()
+        return True
+
+    def release(self, discord_id: int):
+        """Пересылка не состоялась — снять отметку, чтобы повтор события переслал сообщение"""
+        if self._entries.pop(discord_id, None) is not None:
+            self.db.execute("DELETE FROM forwarded WHERE discord_id = ?", (discord_id,))
+            self.db.commit()
+
+    def set_target(self, discord_id: int, chat_id: str, telegram_id: int):
+        """Запомнить сообщение Telegram, созданное для сообщения Discord"""
+        entry = self._entries.get(discord_id)
+        created_at = entry[2] if entry else time.time()
+        self._entries[discord_id] = (chat_id, telegram_id, created_at)
+        self.db.execute(
+            "INSERT OR REPLACE INTO forwarded (discord_id, chat_id, telegram_id, created_at) VALUES (?, ?, ?, ?)",
+            (discord_id, chat_id, telegram_id, created_at)
+        )
+        self.db.commit()
+
+    def target(self, discord_id: int) -> Optional[Tuple[str, int]]:
+        """(чат, message_id) в Telegram или None, если сообщение не пересылалось отдельно"""
+        entry = self._entries.get(discord_id)
+        if entry is None or entry[1] in (None, DELETED) or time.time() - entry[2] >= self.ttl:
+            return None
+        return entry[0], entry[1]
+
+    def is_deleted(self, discord_id: int) -> bool:
+        """Копия в Telegram уже удалена (повтор события удаления игнорируется)"""
+        entry = self._entries.get(discord_id)
+        return entry is not None and entry[1] == DELETED
+
+    def clear_target(self, discord_id: int):
+        """Сообщение в Telegram удалено; ID остаётся отметкой-надгробием для защиты от дублей"""
+        entry = self._entries.get(discord_id)
+        if entry is not None:
+            self._entries[discord_id] = (entry[0], DELETED, entry[2])
+            self.db.execute("UPDATE forwarded SET telegram_id = ? WHERE discord_id = ?", (DELETED, discord_id))
+            self.db.commit()
+
+    def _prune(self):
+        self.db.execute("DELETE FROM forwarded WHERE created_at < ?", (time.time() - self.ttl,))
+        self.db.execute(
+            "DELETE FROM forwarded WHERE discord_id NOT IN "
+            "(SELECT discord_id FROM forwarded ORDER BY created_at DESC LIMIT ?)", (self.max_entries,)
+        )
+        self.db.commit()
@@ -0,0 +1,146 @@
+"""
+Работа с HTML-разметкой Telegram
+
+split_html режет длинный текст на части под лимит Telegram, не разрывая
+теги и HTML-сущности: открытые теги закрываются в конце части и заново
+открываются в начале следующей.
+
+TelegramBatcher склеивает сообщения, пришедшие в течение короткого окна,
+в одно сообщение Telegram (до лимита длины).
+"""
+
+import asyncio
+import re
+from typing import Callable, List, Optional
+
+TELEGRAM_TEXT_LIMIT = 4096
+BATCH_SEPARATOR = "\n\n"
+
+_TOKEN_RE = re.compile(r'(<[^>]*>|&#?\w+;)')
+_TAG_NAME_RE = re.compile(r'<\s*(/?)\s*([a-zA-Z][\w-]*)')
+
+
+def split_html(text: str, limit: int = TELEGRAM_TEXT_LIMIT) -> List[str]:
+    """Разбить HTML-текст на части не длиннее limit с корректной вложенностью тегов"""
+    if len(text) <= limit:
+        return [text]
+
+    parts = []
+    stack = []  # (имя тега, открывающий тег)
+    chunk = ""
+    prefix_len = 0
+    has_content = False
+
+    def closing() -> str:
+        return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+    def flush():
+        nonlocal chunk, prefix_len, has_content
+        if has_content:
+            parts.append(chunk + closing())
+        chunk = "".join(tag for _, tag in stack)
+        prefix_len = len(chunk)  # Переоткрытые теги в начале новой части
+        has_content = False
+
+    for token in _TOKEN_RE.split(text):
+        if not token:
+            continue
+
+        if token.startswith("<"):
+            match = _TAG_NAME_RE.match(token)
+            if not match:
+                continue
+            is_closing, name = match.group(1) == "/", match.group(2).lower()
+            extra = 0 if is_closing or token.endswith("/>") else len(f"</{name}>")
+            if len(chunk) + len(token) + len(closing()) + extra > limit:
+                flush()
+            chunk += token
+            if is_closing:
+                for i in range(len(stack) - 1, -1, -1):
+                    if stack[i][0] == name:
+                        del stack[i:]
+                        break
+            elif not token.endswith("/>"):
+                stack.append((name, token))
+
+        elif token.startswith("&"):
+            # Сущность (&amp; и т.п.) неделима
+            if len(chunk) + len(token) + len(closing()) > limit:
+                flush()
+            chunk += token
+            has_content = True
+
+        else:
+            while token:
+                room = limit - len(chunk) - len(closing())
+                if len(token) <= room:
+                    chunk += token
+                    has_content = True
+                    break
+                if room <= 0 and (has_content or len(chunk) > prefix_len):
+                    flush()
+                    continue
+                room = max(room, 1)
+                # Предпочитаем резать по переводу строки
+                cut = token.rfind("\n", 0, room)
+                if cut <= 0:
+                    cut = room
+                chunk += token[:cut]
+                has_content = True
+                token = token[cut:]
+                flush()
+
+    if has_content:
+        parts.append(chunk + closing())
+    return parts
+
+
+class TelegramBatcher:
+    """Склейка сообщений, пришедших в течение окна, в одно сообщение Telegram"""
+
+    def __init__(self, send: Callable[[str], None], window: float = 3.0,
+                 limit: int = TELEGRAM_TEXT_LIMIT, separator: str = BATCH_SEPARATOR):
+        self.send = send  # Постановка готового текста в исходящую очередь
+        self.window = window
+        self.limit = limit
+        self.separator = separator
+        self._pending: List[str] = []
+        self._pending_len = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.messages = 0  # Сколько сообщений прошло через склейку
+        self.batches = 0  # Сколько сообщений Telegram из них получилось
+
+    def add(self, text: str):
+        if self._pending and self._pending_len + len(self.separator) + len(text) > self.limit:
+            self.flush()
+
+        self._pending.append(text)
+        self._pending_len += len(text) + (len(self.separator) if len(self._pending) > 1 else 0)
+        self.messages += 1
+
+        if self._pending_len >= self.limit:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        text = self.separator.join(self._pending)
+        self._pending = []
+        self._pending_len = 0
+        for part in split_html(text, self.limit):
+            self.send(part)
+            self.batches += 1
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """Сколько сообщений Discord в среднем приходится на одно сообщение Telegram"""
+        if not self.batches:
+            return None
+        return self.messages / self.batches
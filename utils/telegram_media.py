@@ -0,0 +1,154 @@
+"""
+Пересылка вложений Discord в Telegram
+
+Файл не скачивается целиком: ответ CDN Discord читается кусками и сразу
+передаётся в multipart-загрузку sendPhoto/sendDocument/sendMediaGroup
+через общую HTTP-сессию. Изображения группируются по 10 в один
+sendMediaGroup, остальные файлы уходят отдельными sendDocument.
+
+Вложения описываются словарями (describe): описание ставится в исходящую
+очередь чата следом за текстом сообщения и хранится в её спуле.
+"""
+
+import asyncio
+import json
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+import discord
+
+from utils.telegram_outbox import TelegramOutbox, UploadRejected
+
+CHUNK_SIZE = 64 * 1024
+MEDIA_GROUP_LIMIT = 10
+PHOTO_MAX_BYTES = 10 * 1024 * 1024  # Больше — Telegram принимает только как документ
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+CAPTION_LIMIT = 1024
+
+
+class AttachmentTooLarge(UploadRejected):
+    """Файл оказался больше лимита уже во время загрузки"""
+
+
+async def _stream(response: aiohttp.ClientResponse, max_bytes: int):
+    """Отдаёт тело ответа кусками, обрывая поток при превышении лимита"""
+    total = 0
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_bytes:
+            raise AttachmentTooLarge(f"больше {max_bytes} байт")
+        yield chunk
+
+
+def describe(attachment: discord.Attachment) -> Dict:
+    """То, что нужно для пересылки (сам объект вложения в спул не сохранить)"""
+    return {
+        "url": attachment.url,
+        "filename": attachment.filename,
+        "size": attachment.size,
+        "content_type": attachment.content_type,
+    }
+
+
+def is_photo(attachment: Dict) -> bool:
+    return attachment["filename"].lower().endswith(PHOTO_EXTENSIONS) and attachment["size"] <= PHOTO_MAX_BYTES
+
+
+class AttachmentRelay:
+    """Потоковая пересылка вложений с ограничением размера и числа одновременных загрузок"""
+
+    def __init__(self, outbox: TelegramOutbox, get_session: Callable[[], aiohttp.ClientSession],
+                 max_bytes: int = 20 * 1024 * 1024, concurrency: int = 3):
+        self.outbox = outbox
+        self.get_session = get_session
+        self.max_bytes = max_bytes
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+        self.stats = {"files": 0, "bytes": 0, "skipped": 0, "failed": 0}
+
+    async def relay(self, chat_id, attachments: List[Dict], caption: str = "") -> List[str]:
+        """
+        Переслать вложения сообщения (описания из describe). Возвращает имена
+        файлов, которые не были отправлены (слишком большие или ошибка загрузки)
+        """
+        skipped = [a["filename"] for a in attachments if a["size"] > self.max_bytes]
+        self.stats["skipped"] += len(skipped)
+        attachments = [a for a in attachments if a["size"] <= self.max_bytes]
+
+        photos = [a for a in attachments if is_photo(a)]
+        documents = [a for a in attachments if not is_photo(a)]
+
+        groups = [photos[i:i + MEDIA_GROUP_LIMIT] for i in range(0, len(photos), MEDIA_GROUP_LIMIT)]
+        groups += [[document] for document in documents]
+
+        # Порядок загрузок сохраняем: группы и файлы одного сообщения идут последовательно;
+        # корутина создаётся только перед ожиданием, чтобы ошибка не оставила остальные неожидаемыми
+        failed = []
+        for index, group in enumerate(groups):
+            group_caption = caption if index == 0 else ""
+            async with self.semaphore:
+                if is_photo(group[0]):
+                    result = await self._send_group(chat_id, group, group_caption)
+                else:
+                    result = await self._send_single(chat_id, group[0], group_caption)
+            if result is None:
+                failed.extend(a["filename"] for a in group)
+                self.stats["failed"] += len(group)
+            else:
+                self.stats["files"] += len(group)
+                self.stats["bytes"] += sum(a["size"] for a in group)
+
+        return skipped + failed
+
+    @asynccontextmanager
+    async def _form(self, attachments: List[Dict], build):
+        """Открывает потоки CDN для всех файлов и собирает FormData; потоки закрываются после запроса"""
+        async with AsyncExitStack() as stack:
+            form = aiohttp.FormData()
+            for index, attachment in enumerate(attachments):
+                response = await stack.enter_async_context(self.get_session().get(attachment["url"]))
+                response.raise_for_status()
+                # attachment.size мог не совпасть с тем, что отдаёт CDN: проверяем до отправки
+                if response.content_length is not None and response.content_length > self.max_bytes:
+                    raise AttachmentTooLarge(f"{attachment['filename']}: больше {self.max_bytes} байт")
+                build(form, index, attachment, _stream(response, self.max_bytes))
+            yield form
+
+    async def _send_single(self, chat_id, attachment: Dict, caption: str):
+        method, field = ("sendPhoto", "photo") if is_photo(attachment) else ("sendDocument", "document")
+
+        def build(form, index, item, stream):
+            form.add_field(field, stream, filename=item["filename"],
+                           content_type=item["content_type"] or "application/octet-stream")
+            if caption:
+                form.add_field("caption", caption[:CAPTION_LIMIT])
+                form.add_field("parse_mode", "HTML")
+
+        return await self._upload(chat_id, method, [attachment], build)
+
+    async def _send_group(self, chat_id, photos: List[Dict], caption: str):
+        if len(photos) == 1:
+            return await self._send_single(chat_id, photos[0], caption)
+
+        media = []
+        for index in range(len(photos)):
+            item = {"type": "photo", "media": f"attach://file{index}"}
+            if index == 0 and caption:
+                item.update(caption=caption[:CAPTION_LIMIT], parse_mode="HTML")
+            media.append(item)
+
+        def build(form, index, item, stream):
+            if index == 0:
+                form.add_field("media", json.dumps(media, ensure_ascii=False))
+            form.add_field(f"file{index}", stream, filename=item["filename"],
+                           content_type=item["content_type"] or "application/octet-stream")
+
+        return await self._upload(chat_id, "sendMediaGroup", photos, build)
+
+    async def _upload(self, chat_id, method: str, attachments: List[Dict], build) -> Optional[dict]:
+        try:
+            return await self.outbox.send_form(chat_id, method, lambda: self._form(attachments, build))
+        except (aiohttp.ClientError, asyncio.TimeoutError, AttachmentTooLarge) as e:
+            print(f"❌ Не удалось переслать вложения в Telegram ({method}): {e}")
+            return None
@@ -0,0 +1,328 @@
+"""
+Исходящая очередь Telegram Bot API
+
+Запросы к Telegram складываются в очередь с диском (SQLite) и отправляются
+фоновыми таскам — по одному на чат, чтобы лимит одного чата не задерживал
+остальные. Частота ограничена корзинами токенов по лимитам Telegram:
+~30 сообщений/сек на бота, 1/сек в личный чат, 20/мин в группу.
+На 429 ждём retry_after, на сетевые ошибки и 5xx — экспоненциальная пауза.
+Неотправленное переживает перезапуск бота и недоступность Telegram.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from collections import deque
+from typing import AsyncContextManager, Awaitable, Callable, Deque, Dict, Optional
+
+import aiohttp
+
+from utils.rate_limit import TokenBucket
+
+TELEGRAM_API_BASE = "https://api.telegram.org"
+DEFAULT_SPOOL_FILE = "telegram_outbox.sqlite3"
+MAX_BACKOFF_SECONDS = 300
+UPLOAD_TIMEOUT = 300  # Загрузка файла целиком; sock_read общей сессии (60 с) для неё не подходит
+# Псевдо-метод: пересылка вложений выполняется обработчиком on_relay в очереди чата,
+# чтобы файлы шли после текста своего сообщения и переживали перезапуск вместе с ним
+RELAY_METHOD = "relayAttachments"
+
+
+class UploadRejected(Exception):
+    """Данные формы негодны (например, файл больше лимита) — повтор запроса не поможет"""
+
+
+def _rejected_upload(error: BaseException) -> bool:
+    # aiohttp заворачивает исключение из потока тела запроса в ClientError
+    while error is not None:
+        if isinstance(error, UploadRejected):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class TelegramOutbox:
+    """Персистентная очередь запросов к Telegram с ограничением частоты"""
+
+    def __init__(self, get_token: Callable[[], str], get_session: Callable[[], aiohttp.ClientSession],
+                 spool_file: str = DEFAULT_SPOOL_FILE, api_base: str = TELEGRAM_API_BASE):
+        self.get_token = get_token
+        self.get_session = get_session
+        self.api_base = api_base
+
+        self.db = sqlite3.connect(spool_file)
+        # WAL + NORMAL: запись одной строки занимает доли миллисекунды
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "chat_id TEXT NOT NULL, "
+            "method TEXT NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        # ref — ID исходного сообщения Discord (колонка добавлена позже, старые спулы дополняем)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(outbox)")]
+        if "ref" not in columns:
+            self.db.execute("ALTER TABLE outbox ADD COLUMN ref TEXT")
+        # Служебное состояние моста (offset getUpdates и т.п.)
+        self.db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+
+        self.global_bucket = TokenBucket(rate=30, capacity=30)
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._queues: Dict[str, Deque[dict]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._started = False
+        # Вызывается после успешной отправки запроса с ref: on_sent(item, result)
+        self.on_sent: Optional[Callable[[dict, dict], None]] = None
+        # Выполняет запрос RELAY_METHOD: on_relay(chat_id, payload); загрузки сам ограничивает через send_form
+        self.on_relay: Optional[Callable[[str, dict], Awaitable[None]]] = None
+
+        # Метрики
+        self.stats = {"sent": 0, "retries": 0, "rate_limited": 0, "failed": 0}
+        self.latencies: Deque[float] = deque(maxlen=500)  # от постановки в очередь до доставки
+
+    # ---------- Очередь ----------
+
+    def start(self):
+        """Загрузить неотправленное из спула и запустить отправку"""
+        if self._started:
+            return
+        self._started = True
+
+        rows = self.db.execute(
+            "SELECT id, chat_id, method, payload, created_at, ref FROM outbox ORDER BY id"
+        ).fetchall()
+        for row_id, chat_id, method, payload, created_at, ref in rows:
+            self._queues.setdefault(chat_id, deque()).append({
+                "id": row_id,
+                "chat_id": chat_id,
+                "method": method,
+                "payload": json.loads(payload),
+                "created_at": created_at,
+                "ref": ref,
+            })
+
+        for chat_id in self._queues:
+            self._ensure_worker(chat_id)
+
+        if rows:
+            print(f"📤 Telegram: восстановлено {len(rows)} неотправленных сообщений")
+
+    def enqueue(self, chat_id, method: str, payload: dict, ref: Optional[str] = None):
+        """Поставить запрос в очередь (сразу сохраняется на диск)"""
+        chat_id = str(chat_id)
+        payload = dict(payload, chat_id=chat_id)
+        created_at = time.time()
+
+        cursor = self.db.execute(
+            "INSERT INTO outbox (chat_id, method, payload, created_at, ref) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, method, json.dumps(payload, ensure_ascii=False), created_at, ref)
+        )
+        self.db.commit()
+
+        self._queues.setdefault(chat_id, deque()).append({
+            "id": cursor.lastrowid,
+            "chat_id": chat_id,
+            "method": method,
+            "payload": payload,
+            "created_at": created_at,
+            "ref": ref,
+        })
+        if self._started:
+            self._ensure_worker(chat_id)
+
+    def get_state(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, key: str, value):
+        self.db.execute(
+            "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value))
+        )
+        self.db.commit()
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _ensure_worker(self, chat_id: str):
+        worker = self._workers.get(chat_id)
+        if worker is None or worker.done():
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Отрицательный ID — группа/канал: не больше 20 сообщений в минуту
+            if chat_id.startswith("-"):
+                bucket = TokenBucket(rate=20 / 60, capacity=3)
+            else:
+                bucket = TokenBucket(rate=1, capacity=1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _worker(self, chat_id: str):
+        queue = self._queues[chat_id]
+        attempts = 0
+
+        while queue:
+            item = queue[0]
+            if item["method"] == RELAY_METHOD:
+                await self._relay(item)
+                continue
+
+            bucket = self._chat_bucket(chat_id)
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+
+            status, data, retry_after = await self._post(item["method"], item["payload"])
+
+            if status == "ok":
+                queue.popleft()
+                self._forget(item["id"])
+                self.stats["sent"] += 1
+                self.latencies.append(time.time() - item["created_at"])
+                attempts = 0
+                if item["ref"] and self.on_sent is not None:
+                    self.on_sent(item, data)
+            elif status == "rate_limited":
+                self.stats["rate_limited"] += 1
+                bucket.penalize(retry_after)
+            elif status == "retry":
+                attempts += 1
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(2 ** attempts, MAX_BACKOFF_SECONDS))
+            else:
+                # Ошибка запроса (неверный чат, разметка и т.п.) — повтор не поможет
+                queue.popleft()
+                self._forget(item["id"])
+                self.stats["failed"] += 1
+                attempts = 0
+                print(f"❌ Telegram отклонил {item['method']} для {chat_id}: {data}")
+
+    async def _relay(self, item: dict):
+        """Вложения пересылаются один раз: повторы отдельных загрузок делает send_form"""
+        try:
+            if self.on_relay is not None:
+                await self.on_relay(item["chat_id"], item["payload"])
+        except Exception as e:
+            print(f"❌ Не удалось переслать вложения в Telegram для {item['chat_id']}: {e}")
+        self._queues[item["chat_id"]].popleft()
+        self._forget(item["id"])
+
+    def _forget(self, row_id: int):
+        self.db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        self.db.commit()
+
+    # ---------- HTTP ----------
+
+    async def _post(self, method: str, payload: Optional[dict] = None, form: Optional[aiohttp.FormData] = None,
+                    timeout: Optional[float] = None):
+        """
+        Выполнить запрос (JSON или multipart). Возвращает (status, data, retry_after), где status:
+        ok / rate_limited / retry / error
+        """
+        token = self.get_token()
+        if not token:
+            return "retry", None, 0
+
+        url = f"{self.api_base}/bot{token}/{method}"
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        try:
+            if form is not None:
+                request = self.get_session().post(url, data=form, **kwargs)
+            else:
+                request = self.get_session().post(url, json=payload, **kwargs)
+            async with request as response:
+                data = await response.json(content_type=None)
+                http_status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            return ("error" if _rejected_upload(e) else "retry"), str(e), 0
+
+        if http_status == 200 and data.get("ok"):
+            return "ok", data.get("result"), 0
+        if http_status == 429:
+            retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+            return "rate_limited", data, retry_after
+        if http_status >= 500:
+            return "retry", data, 0
+        return "error", data.get("description", data), 0
+
+    async def call(self, method: str, payload: dict, timeout: Optional[float] = None):
+        """Запрос вне очереди и без лимитов отправки (getUpdates и т.п.). Возвращает (status, data, retry_after)"""
+        return await self._post(method, payload, timeout=timeout)
+
+    async def send_now(self, chat_id, method: str, payload: dict):
+        """Отправить сразу, минуя очередь (с учётом лимитов). Возвращает result или None"""
+        chat_id = str(chat_id)
+        await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+        status, data, retry_after = await self._post(method, dict(payload, chat_id=chat_id))
+        if status == "rate_limited":
+            self.stats["rate_limited"] += 1
+            self._chat_bucket(chat_id).penalize(retry_after)
+        if status != "ok":
+            print(f"❌ Ошибка отправки в Telegram: {data}")
+            return None
+        return data
+
+    async def send_form(self, chat_id, method: str, make_form: Callable[[], AsyncContextManager[aiohttp.FormData]],
+                        attempts: int = 3, timeout: float = UPLOAD_TIMEOUT):
+        """
+        Отправить multipart-запрос (загрузку файлов) с учётом лимитов.
+        make_form — асинхронный контекстный менеджер, отдающий свежий FormData:
+        поток файла нельзя перемотать, поэтому на каждый повтор форма собирается заново.
+        """
+        chat_id = str(chat_id)
+        bucket = self._chat_bucket(chat_id)
+        data = None
+        for attempt in range(attempts):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            async with make_form() as form:
+                form.add_field("chat_id", chat_id)
+                status, data, retry_after = await self._post(method, form=form, timeout=timeout)
+
+            if status == "ok":
+                self.stats["sent"] += 1
+                return data
+            if status == "rate_limited":
+                self.stats["rate_limited"] += 1
+                bucket.penalize(retry_after)
+            elif status == "retry":
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(2 ** (attempt + 1), MAX_BACKOFF_SECONDS))
+            else:
+                break
+
+        self.stats["failed"] += 1
+        print(f"❌ Telegram отклонил {method} для {chat_id}: {data}")
+        return None
+
+    # ---------- Метрики ----------
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            "depth": self.depth(),
+            "chats": len([q for q in self._queues.values() if q]),
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            **self.stats,
+        }
+
+    def close(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
+        self.db.close()
@@ -0,0 +1,75 @@
+"""
+Входящие сообщения Telegram (long polling)
+
+getUpdates держит соединение открытым до появления обновлений (timeout),
+поэтому в простое это один висящий запрос раз в минуту. offset хранится
+в спуле исходящей очереди и сдвигается только после обработки пачки —
+после перезапуска необработанные обновления приходят заново.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from utils.telegram_outbox import MAX_BACKOFF_SECONDS, TelegramOutbox
+
+POLL_TIMEOUT = 50  # Секунд ожидания обновлений на стороне Telegram
+OFFSET_KEY = "updates_offset"
+
+
+class TelegramPoller:
+    """Цикл getUpdates с сохраняемым offset"""
+
+    def __init__(self, outbox: TelegramOutbox, handle: Callable[[dict], Awaitable],
+                 allowed_updates=("message",)):
+        self.outbox = outbox
+        self.handle = handle  # Обработчик одного update
+        self.allowed_updates = list(allowed_updates)
+        self.offset = outbox.get_state(OFFSET_KEY)
+        self.task: Optional[asyncio.Task] = None
+
+        self.stats = {"polls": 0, "updates": 0, "errors": 0}
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def _loop(self):
+        attempts = 0
+        while True:
+            payload = {"timeout": POLL_TIMEOUT, "allowed_updates": self.allowed_updates}
+            if self.offset is not None:
+                payload["offset"] = self.offset
+
+            status, data, retry_after = await self.outbox.call("getUpdates", payload, timeout=POLL_TIMEOUT + 15)
+            self.stats["polls"] += 1
+
+            if status == "ok":
+                attempts = 0
+                if not data:
+                    continue
+                for update in data:
+                    try:
+                        await self.handle(update)
+                    except Exception as e:
+                        print(f"❌ Ошибка обработки обновления Telegram {update.get('update_id')}: {e}")
+                    self.offset = update["update_id"] + 1
+                self.stats["updates"] += len(data)
+                self.outbox.set_state(OFFSET_KEY, self.offset)
+            elif status == "rate_limited":
+                await asyncio.sleep(retry_after)
+            else:
+                # Нет токена, сеть, 409 (включён вебхук) и т.п.
+                attempts += 1
+                self.stats["errors"] += 1
+                if attempts == 1 and status == "error":
+                    print(f"❌ Telegram getUpdates: {data}")
+                await asyncio.sleep(min(2 ** attempts, MAX_BACKOFF_SECONDS))
@@ -0,0 +1,83 @@
+"""
+Таблица маршрутов моста Discord ↔ Telegram
+
+Маршрут связывает канал Discord с чатом Telegram и задаёт свой формат
+и фильтры. Основная пара из настроек (discord_log_channel_id ↔
+telegram_chat_id) — маршрут по умолчанию, остальные лежат в списке
+"routes". Таблица компилируется в словарь с ключом int(ID канала):
+сообщение из канала без моста отсеивается одним поиском в словаре.
+"""
+
+from typing import Dict, Tuple
+
+import discord
+
+MESSAGE_FORMATS = ("detailed", "simple")
+
+# Обычные сообщения; всё остальное (закрепы, бусты, входы) считается системным
+_REGULAR_TYPES = (discord.MessageType.default, discord.MessageType.reply)
+
+
+def normalize_route(raw: dict, defaults: dict) -> dict:
+    """Маршрут с недостающими настройками, взятыми из общих"""
+    message_format = raw.get("message_format", defaults.get("message_format", "detailed"))
+    keywords = raw.get("keywords") or []
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+
+    return {
+        "discord_channel_id": str(raw["discord_channel_id"]),
+        "telegram_chat_id": str(raw["telegram_chat_id"]),
+        "message_format": message_format if message_format in MESSAGE_FORMATS else "detailed",
+        "include_bot_messages": bool(raw.get("include_bot_messages", defaults.get("include_bot_messages", True))),
+        "include_system_messages": bool(raw.get("include_system_messages",
+                                                defaults.get("include_system_messages", True))),
+        "forward_attachments": bool(raw.get("forward_attachments", defaults.get("forward_attachments", True))),
+        "keywords": [k.strip().lower() for k in keywords if k.strip()],
+        "inbound": bool(raw.get("inbound", True)),  # Пересылать ли ответы из Telegram в этот канал
+    }
+
+
+def compile_routes(config: dict) -> Tuple[Dict[int, dict], Dict[str, int]]:
+    """
+    Возвращает (исходящие, входящие): канал Discord → маршрут и
+    чат Telegram → канал Discord (для обратного направления побеждает первый маршрут)
+    """
+    raw_routes = []
+    if config.get("discord_log_channel_id") and config.get("telegram_chat_id"):
+        raw_routes.append({
+            "discord_channel_id": config["discord_log_channel_id"],
+            "telegram_chat_id": config["telegram_chat_id"],
+        })
+    raw_routes.extend(config.get("routes") or [])
+
+    outbound: Dict[int, dict] = {}
+    inbound: Dict[str, int] = {}
+    for raw in raw_routes:
+        try:
+            route = normalize_route(raw, config)
+            channel_id = int(route["discord_channel_id"])
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"❌ Неверный маршрут моста {raw}: {e}")
+            continue
+
+        outbound.setdefault(channel_id, route)
+        if route["inbound"]:
+            inbound.setdefault(route["telegram_chat_id"], channel_id)
+    return outbound, inbound
+
+
+def route_accepts(route: dict, message: discord.Message) -> bool:
+    """Проходит ли сообщение фильтры маршрута"""
+    if message.author.bot and not route["include_bot_messages"]:
+        return False
+    if message.type not in _REGULAR_TYPES and not route["include_system_messages"]:
+        return False
+    if route["keywords"]:
+        # Логи ботов обычно в эмбедах — ищем и в них
+        content = " ".join(
+            [message.content] + [f"{e.title or ''} {e.description or ''}" for e in message.embeds]
+        ).lower()
+        if not any(keyword in content for keyword in route["keywords"]):
+            return False
+    return True
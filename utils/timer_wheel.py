@@ -0,0 +1,90 @@
+"""
+Колесо таймеров
+
+Один фоновый таск обслуживает любое количество отложенных вызовов вместо
+отдельного таска (или asyncio.sleep) на каждый ключ. Точность — один тик.
+Когда таймеров нет, таск завершается и не тратит ресурсы.
+"""
+
+import asyncio
+import math
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+
+class TimerWheel:
+    """Хэшированное колесо таймеров с переназначением по ключу"""
+
+    def __init__(self, tick: float = 1.0, slots: int = 64):
+        self.tick = tick
+        self._slots: List[Dict[Hashable, list]] = [{} for _ in range(slots)]
+        self._where: Dict[Hashable, int] = {}  # ключ -> номер слота
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+        self._handlers: Set[asyncio.Task] = set()  # Запущенные асинхронные обработчики
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable):
+        """Запланировать вызов callback через delay секунд (старый таймер ключа сбрасывается)"""
+        self.cancel(key)
+
+        ticks = max(1, math.ceil(delay / self.tick))
+        index = (self._cursor + ticks) % len(self._slots)
+        rounds = (ticks - 1) // len(self._slots)  # Полных оборотов до срабатывания
+
+        self._slots[index][key] = [rounds, callback]
+        self._where[key] = index
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self, key: Hashable) -> bool:
+        """Отменить таймер ключа"""
+        index = self._where.pop(key, None)
+        if index is None:
+            return False
+        self._slots[index].pop(key, None)
+        return True
+
+    def stop(self):
+        """Отменить все таймеры и остановить колесо"""
+        for slot in self._slots:
+            slot.clear()
+        self._where.clear()
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def _run(self):
+        while self._where:
+            await asyncio.sleep(self.tick)
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            slot = self._slots[self._cursor]
+
+            due = []
+            for key, item in list(slot.items()):
+                if item[0] > 0:
+                    item[0] -= 1
+                    continue
+                del slot[key]
+                del self._where[key]
+                due.append(item[1])
+
+            for callback in due:
+                try:
+                    result = callback()
+                    if asyncio.iscoroutine(result):
+                        # Не блокируем колесо медленными обработчиками; ссылку держим, пока таск не завершится
+                        task = asyncio.create_task(result)
+                        self._handlers.add(task)
+                        task.add_done_callback(self._handler_done)
+                except Exception as e:
+                    print(f"❌ Ошибка в обработчике таймера: {e}")
+
+    def _handler_done(self, task: asyncio.Task):
+        self._handlers.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"❌ Ошибка в обработчике таймера: {task.exception()}")
@@ -0,0 +1,128 @@
+"""
+Подготовка следующего трека заранее
+
+Раньше следующий трек начинал загружаться, только когда текущий доиграл:
+секунды тишины между треками и всплеск работы. Теперь для каждого сервера:
+- warm(ключ, трек) — как только трек стал следующим в очереди, в фоне
+  получается ссылка на поток (дорогая часть — yt-dlp);
+- ensure(ключ, трек) — за несколько секунд до конца текущего трека собирается
+  сам источник (FFmpeg запущен и уже отдал первый кадр);
+- take(ключ, трек) — готовый источник при переключении, если это тот же трек.
+
+Заготовка привязана к объекту трека: если очередь изменилась и следующим
+стал другой трек, старая заготовка освобождается (FFmpeg завершается).
+Заготовка старше max_age тоже выбрасывается: соединение простаивало
+(например, на паузе) и могло оборваться.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+MAX_AGE = 60.0
+
+
+class _Slot:
+    __slots__ = ("item", "task", "created")
+
+    def __init__(self, item: Any, task: asyncio.Task):
+        self.item = item
+        self.task = task
+        self.created = time.monotonic()
+
+
+class TrackPrefetcher:
+    """Одна заготовка следующего трека на сервер"""
+
+    def __init__(self, resolve: Callable[[Any], Awaitable[Any]], build: Callable[[Any], Awaitable[Any]],
+                 release: Callable[[Any], None], max_age: float = MAX_AGE):
+        self.resolve = resolve  # Получить ссылку на поток (результат не нужен, только кэш)
+        self.build = build  # Собрать готовый к воспроизведению источник
+        self.release = release  # Освободить собранный, но ненужный источник
+        self.max_age = max_age
+
+        self._slots: Dict[Hashable, _Slot] = {}
+        self._warmed: Dict[Hashable, Any] = {}  # ключ → трек, для которого уже запрошена ссылка
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.stats = {"warmed": 0, "built": 0, "hits": 0, "stale": 0, "failed": 0}
+
+    # ---------- Подготовка ----------
+
+    def warm(self, key: Hashable, item: Any):
+        if self._warmed.get(key) is item:
+            return
+        self._warmed[key] = item
+        self.stats["warmed"] += 1
+        task = asyncio.create_task(self._resolve_quietly(item))
+        self._tasks.add(task)  # Ссылку держим, пока таск не завершится
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve_quietly(self, item: Any):
+        try:
+            await self.resolve(item)
+        except Exception as e:
+            print(f"⚠️ Не удалось заранее получить ссылку на трек: {e}")
+
+    def ensure(self, key: Hashable, item: Any):
+        """Собрать источник для item, если ещё не собран (другой трек — выбросить)"""
+        slot = self._slots.get(key)
+        if slot is not None and slot.item is item and not self._expired(slot):
+            return
+        if slot is not None:
+            self.stats["stale"] += 1
+        self.discard(key)
+        self._slots[key] = _Slot(item, asyncio.create_task(self.build(item)))
+        self.stats["built"] += 1
+
+    def discard_expired(self, key: Hashable):
+        """Выбросить устаревшую заготовку (на паузе она держит FFmpeg и соединение)"""
+        slot = self._slots.get(key)
+        if slot is not None and self._expired(slot):
+            self.stats["stale"] += 1
+            del self._slots[key]
+            self._release(slot)
+
+    def _expired(self, slot: _Slot) -> bool:
+        return time.monotonic() - slot.created > self.max_age
+
+    # ---------- Использование ----------
+
+    async def take(self, key: Hashable, item: Any) -> Optional[Any]:
+        """Готовый источник для item или None (тогда его собирают как обычно)"""
+        slot = self._slots.pop(key, None)
+        self._warmed.pop(key, None)
+        if slot is None:
+            return None
+        if slot.item is not item or self._expired(slot):
+            self.stats["stale"] += 1
+            self._release(slot)
+            return None
+        try:
+            source = await asyncio.shield(slot.task)  # Если ещё собирается — дождаться, а не начинать заново
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"⚠️ Заготовка трека не удалась: {e}")
+            return None
+        self.stats["hits"] += 1
+        return source
+
+    def discard(self, key: Hashable):
+        """Очередь изменилась или воспроизведение остановлено"""
+        self._warmed.pop(key, None)
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._release(slot)
+
+    def discard_all(self):
+        for key in list(self._slots):
+            self.discard(key)
+        self._warmed.clear()
+        for task in self._tasks:
+            task.cancel()
+
+    def _release(self, slot: _Slot):
+        if not slot.task.done():
+            slot.task.cancel()  # build сам освобождает недособранный источник
+        elif not slot.task.cancelled() and slot.task.exception() is None:
+            self.release(slot.task.result())
@@ -0,0 +1,325 @@
+"""
+Потоковая запись транскриптов
+
+Текст пишется по частям во временный файл (в памяти, пока он небольшой,
+затем на диске), а не собирается в одну строку. Перед отправкой файл при
+необходимости сжимается gzip и режется на части под лимит вложений Discord.
+
+HtmlTranscript рендерит сообщения в один самодостаточный HTML-файл
+(стили и аватары встроены). Сообщения накапливаются пачками, каждая пачка
+рендерится в пуле потоков и сразу дописывается в файл.
+"""
+
+import asyncio
+import base64
+import gzip
+import html
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+SPOOL_MAX_MEMORY = 1024 * 1024  # Больше 1 МБ — сбрасываем на диск
+COPY_CHUNK_SIZE = 64 * 1024
+MAX_FILES_PER_MESSAGE = 10  # Ограничение Discord на число вложений
+REQUEST_OVERHEAD = 64 * 1024  # Заголовки multipart и эмбед тоже входят в лимит запроса
+
+HTML_CHUNK_SIZE = 200  # Сообщений в одной пачке рендеринга
+AVATAR_SIZE = 64
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+# Отдельный пул, чтобы рендеринг не занимал стандартный executor
+_render_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="transcript")
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ background: #313338; color: #dbdee1; font-family: "gg sans", "Segoe UI", Arial, sans-serif; margin: 0; }}
+header {{ background: #2b2d31; padding: 16px 24px; border-bottom: 1px solid #1e1f22; }}
+header h1 {{ margin: 0 0 8px; font-size: 20px; color: #f2f3f5; }}
+header div {{ font-size: 13px; color: #b5bac1; }}
+main {{ padding: 8px 0; }}
+.msg {{ display: flex; padding: 4px 24px; }}
+.msg:hover {{ background: #2e3035; }}
+.avatar {{ width: 40px; height: 40px; border-radius: 50%; flex: none; margin-right: 16px;
+           background: #5865f2 center / cover no-repeat; }}
+.body {{ min-width: 0; }}
+.author {{ font-weight: 600; color: #f2f3f5; }}
+.bot {{ background: #5865f2; color: #fff; font-size: 10px; padding: 1px 4px; border-radius: 3px; margin-left: 4px; }}
+.time {{ font-size: 12px; color: #949ba4; margin-left: 8px; }}
+.content {{ white-space: pre-wrap; word-wrap: break-word; }}
+.attachment {{ margin-top: 4px; }}
+.attachment img {{ max-width: 400px; max-height: 300px; border-radius: 4px; display: block; }}
+.attachment a {{ color: #00a8fc; }}
+.embed {{ border-left: 4px solid #1e1f22; background: #2b2d31; border-radius: 4px; padding: 8px 12px;
+          margin-top: 4px; max-width: 520px; }}
+.embed-title {{ font-weight: 600; color: #f2f3f5; }}
+.embed-field {{ margin-top: 4px; }}
+.embed-field b {{ display: block; font-size: 13px; }}
+.embed img {{ max-width: 100%; border-radius: 4px; margin-top: 8px; }}
+footer {{ padding: 16px 24px; font-size: 12px; color: #949ba4; border-top: 1px solid #1e1f22; }}
+</style>
+</head>
+<body>
+"""
+
+
+class TranscriptWriter:
+    """Потоковый писатель транскрипта во временный файл"""
+
+    def __init__(self, max_memory: int = SPOOL_MAX_MEMORY):
+        self.max_memory = max_memory
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode='w+b')
+        self._extra = []  # Временные файлы, созданные при сжатии/разбиении
+        self.size = 0
+
+    def write(self, text: str):
+        data = text.encode('utf-8')
+        self._file.write(data)
+        self.size += len(data)
+
+    def build_files(self, filename: str, limit: int) -> List[discord.File]:
+        """
+        Готовит вложения не больше limit байт каждое:
+        как есть → сжатый .gz → .gz, разрезанный на части (собрать через cat).
+        Блокирующая операция — вызывать через asyncio.to_thread.
+        """
+        self._file.seek(0)
+        if self.size <= limit:
+            return [discord.File(self._file, filename=filename)]
+
+        compressed = self._spool()
+        with gzip.GzipFile(filename=filename, fileobj=compressed, mode='wb') as gz:
+            shutil.copyfileobj(self._file, gz, COPY_CHUNK_SIZE)
+        compressed_size = compressed.tell()
+        compressed.seek(0)
+
+        if compressed_size <= limit:
+            return [discord.File(compressed, filename=f"{filename}.gz")]
+
+        files = []
+        part_number = 1
+        while True:
+            part = self._spool()
+            remaining = limit
+            while remaining > 0:
+                chunk = compressed.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                part.write(chunk)
+                remaining -= len(chunk)
+
+            if part.tell() == 0:
+                break
+
+            part.seek(0)
+            files.append(discord.File(part, filename=f"{filename}.gz.part{part_number:03d}"))
+            part_number += 1
+
+        return files
+
+    def _spool(self):
+        spool = tempfile.SpooledTemporaryFile(max_size=self.max_memory, mode='w+b')
+        self._extra.append(spool)
+        return spool
+
+    def close(self):
+        self._file.close()
+        for spool in self._extra:
+            spool.close()
+        self._extra.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _file_size(file: discord.File) -> int:
+    position = file.fp.tell()
+    size = file.fp.seek(0, 2)
+    file.fp.seek(position)
+    return size - position
+
+
+def upload_limit(filesize_limit: int) -> int:
+    """Сколько байт файлов помещается в одно сообщение при лимите сервера filesize_limit"""
+    return filesize_limit - REQUEST_OVERHEAD
+
+
+def batch_files(files: List[discord.File], limit: int) -> List[List[discord.File]]:
+    """
+    Разбивает вложения на группы по лимитам одного сообщения: не больше 10 файлов
+    и не больше limit байт суммарно (лимит Discord действует на весь запрос)
+    """
+    batches, batch, batch_size = [], [], 0
+    for file in files:
+        size = _file_size(file)
+        if batch and (len(batch) >= MAX_FILES_PER_MESSAGE or batch_size + size > limit):
+            batches.append(batch)
+            batch, batch_size = [], 0
+        batch.append(file)
+        batch_size += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _escape(text) -> str:
+    return html.escape(str(text)) if text else ""
+
+
+def _render_messages(messages: List[dict]) -> str:
+    """Рендеринг пачки сообщений (выполняется в пуле потоков)"""
+    parts = []
+    for msg in messages:
+        if msg["avatar_style"]:
+            parts.append(msg["avatar_style"])
+
+        parts.append('<div class="msg">')
+        parts.append(f'<div class="avatar {msg["avatar_class"]}"></div><div class="body">')
+        parts.append(f'<span class="author" title="{msg["author_id"]}">{_escape(msg["author"])}</span>')
+        if msg["bot"]:
+            parts.append('<span class="bot">BOT</span>')
+        parts.append(f'<span class="time">{msg["created_at"]}{" (изменено)" if msg["edited"] else ""}</span>')
+
+        if msg["content"]:
+            parts.append(f'<div class="content">{_escape(msg["content"])}</div>')
+
+        for filename, url, size, is_image in msg["attachments"]:
+            parts.append('<div class="attachment">')
+            if is_image:
+                parts.append(f'<a href="{_escape(url)}"><img src="{_escape(url)}" alt="{_escape(filename)}" loading="lazy"></a>')
+            else:
+                parts.append(f'📎 <a href="{_escape(url)}">{_escape(filename)}</a> ({size} bytes)')
+            parts.append('</div>')
+
+        for embed in msg["embeds"]:
+            color = f' style="border-left-color: #{embed["color"]:06x}"' if embed["color"] is not None else ""
+            parts.append(f'<div class="embed"{color}>')
+            if embed["title"]:
+                title = _escape(embed["title"])
+                if embed["url"]:
+                    title = f'<a href="{_escape(embed["url"])}">{title}</a>'
+                parts.append(f'<div class="embed-title">{title}</div>')
+            if embed["description"]:
+                parts.append(f'<div class="content">{_escape(embed["description"])}</div>')
+            for name, value in embed["fields"]:
+                parts.append(f'<div class="embed-field"><b>{_escape(name)}</b>'
+                             f'<span class="content">{_escape(value)}</span></div>')
+            if embed["image"]:
+                parts.append(f'<img src="{_escape(embed["image"])}" loading="lazy">')
+            parts.append('</div>')
+
+        parts.append('</div></div>\n')
+
+    return "".join(parts)
+
+
+class HtmlTranscript:
+    """
+    Инкрементальный рендер сообщений в самодостаточный HTML-файл.
+    Аватары скачиваются и встраиваются один раз на автора (CSS-класс),
+    поэтому память ограничена размером пачки, а не длиной истории.
+    """
+
+    def __init__(self, title: str, info: Optional[List[Tuple[str, str]]] = None,
+                 chunk_size: int = HTML_CHUNK_SIZE):
+        self.writer = TranscriptWriter()
+        self.chunk_size = chunk_size
+        self.message_count = 0
+        self._chunk: List[dict] = []
+        self._avatars: Dict[str, str] = {}  # url аватара -> CSS-класс
+
+        self.writer.write(HTML_HEAD.format(title=_escape(title)))
+        self.writer.write(f"<header><h1>{_escape(title)}</h1>")
+        for label, value in info or []:
+            self.writer.write(f"<div>{_escape(label)}: {_escape(value)}</div>")
+        self.writer.write("</header>\n<main>\n")
+
+    async def _avatar_class(self, user) -> Tuple[str, Optional[str]]:
+        """CSS-класс аватара; при первом появлении — ещё и <style> со встроенной картинкой"""
+        asset = user.display_avatar.replace(size=AVATAR_SIZE, format='png')
+        css_class = self._avatars.get(asset.url)
+        if css_class:
+            return css_class, None
+
+        css_class = f"av{len(self._avatars)}"
+        self._avatars[asset.url] = css_class
+        try:
+            data = await asset.read()
+        except (discord.HTTPException, discord.NotFound, ValueError):
+            return css_class, None
+
+        encoded = base64.b64encode(data).decode('ascii')
+        style = f'<style>.{css_class} {{ background-image: url(data:image/png;base64,{encoded}); }}</style>\n'
+        return css_class, style
+
+    async def add_message(self, message: discord.Message):
+        """Добавить сообщение; полная пачка сразу рендерится и пишется в файл"""
+        avatar_class, avatar_style = await self._avatar_class(message.author)
+
+        attachments = [
+            (a.filename, a.url, a.size,
+             (a.content_type or "").startswith("image/") or a.filename.lower().endswith(IMAGE_EXTENSIONS))
+            for a in message.attachments
+        ]
+        embeds = [
+            {
+                "title": e.title,
+                "url": e.url,
+                "description": e.description,
+                "color": e.color.value if e.color else None,
+                "fields": [(f.name, f.value) for f in e.fields],
+                "image": e.image.url if e.image else None,
+            }
+            for e in message.embeds
+        ]
+
+        self._chunk.append({
+            "author": message.author.display_name,
+            "author_id": message.author.id,
+            "bot": message.author.bot,
+            "avatar_class": avatar_class,
+            "avatar_style": avatar_style,
+            "created_at": message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            "edited": message.edited_at is not None,
+            "content": message.content,
+            "attachments": attachments,
+            "embeds": embeds,
+        })
+        self.message_count += 1
+
+        if len(self._chunk) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        """Отрендерить накопленную пачку в пуле потоков и дописать в файл"""
+        if not self._chunk:
+            return
+        chunk, self._chunk = self._chunk, []
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(_render_pool, _render_messages, chunk)
+        self.writer.write(rendered)
+
+    async def finish(self, filename: str, limit: int) -> List[discord.File]:
+        """Завершить документ и подготовить вложения под лимит размера"""
+        await self.flush()
+        self.writer.write(f"</main>\n<footer>Сообщений: {self.message_count}</footer>\n</body>\n</html>\n")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_render_pool, self.writer.build_files, filename, limit)
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
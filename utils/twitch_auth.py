@@ -0,0 +1,140 @@
+"""
+App access token Twitch (client credentials)
+
+Токен берётся по TWITCH_CLIENT_ID + TWITCH_CLIENT_SECRET, хранится вместе со
+временем истечения и обновляется заранее, в фоне. Одновременные обновления
+склеиваются в один запрос. Ответ 401 на запрос Helix вызывает ровно одно
+обновление и повтор запроса.
+
+Без секрета используется статический TWITCH_TOKEN (как раньше): обновить его
+нельзя, об истечении бот сообщит в консоль.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Optional, Tuple
+
+import aiohttp
+
+TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+REFRESH_MARGIN = 600  # Обновлять за 10 минут до истечения
+RETRY_DELAY = 30  # Пауза после неудачного обновления, с
+
+
+class TwitchAppToken:
+    """Токен приложения Twitch с упреждающим обновлением"""
+
+    def __init__(self, get_session: Callable[[], aiohttp.ClientSession], client_id: Optional[str],
+                 client_secret: Optional[str] = None, static_token: Optional[str] = None):
+        self.get_session = get_session
+        self.client_id = client_id
+        self.client_secret = client_secret
+
+        self._token = None if client_secret else static_token
+        self._expires_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._failed_at = 0.0
+        self._expired_warned = False
+
+        self.stats = {"refreshes": 0, "failures": 0, "retries_401": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client_id and (self.client_secret or self._token))
+
+    @property
+    def can_refresh(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    @property
+    def expires_in(self) -> Optional[float]:
+        """Сколько секунд осталось (None — статический токен или токена нет)"""
+        if not self.can_refresh or not self._token:
+            return None
+        return max(0.0, self._expires_at - time.time())
+
+    # ---------- Получение токена ----------
+
+    async def token(self) -> Optional[str]:
+        """Действующий токен; None — получить не удалось"""
+        if not self.can_refresh:
+            return self._token
+
+        now = time.time()
+        if self._token and now < self._expires_at:
+            if now >= self._expires_at - REFRESH_MARGIN:
+                self._start_refresh()  # Текущий ещё действует — обновляем в фоне
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self) -> Optional[str]:
+        """Обновить токен (или дождаться уже идущего обновления)"""
+        task = self._start_refresh()
+        if task is None:
+            return self._token
+        return await asyncio.shield(task)
+
+    def _start_refresh(self) -> Optional[asyncio.Task]:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return self._refresh_task
+        if time.time() - self._failed_at < RETRY_DELAY:
+            return None
+        self._refresh_task = asyncio.create_task(self._fetch())
+        return self._refresh_task
+
+    async def _fetch(self) -> Optional[str]:
+        data = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "client_credentials",
+        }
+        try:
+            async with self.get_session().post(TOKEN_URL, data=data) as resp:
+                payload = await resp.json(content_type=None)
+                if resp.status != 200 or "access_token" not in payload:
+                    raise ValueError(payload.get("message") or f"HTTP {resp.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self._failed_at = time.time()
+            self.stats["failures"] += 1
+            print(f"❌ Twitch: не удалось получить токен приложения: {e}")
+            return None
+
+        self._token = payload["access_token"]
+        self._expires_at = time.time() + int(payload.get("expires_in", 3600))
+        self._failed_at = 0.0
+        self.stats["refreshes"] += 1
+        return self._token
+
+    def _invalidate(self, token: str):
+        # Только если токен не успели обновить: иначе параллельные 401 вызвали бы повторные обновления
+        if self._token == token:
+            self._token = None
+
+    # ---------- Запросы ----------
+
+    async def request(self, method: str, url: str, **kwargs) -> Tuple[int, Any]:
+        """
+        Запрос к Helix с заголовками авторизации: (status, json | None).
+        status 0 — сетевая ошибка или токена нет. На 401 токен обновляется и запрос повторяется один раз.
+        """
+        for attempt in range(2):
+            token = await self.token()
+            if not token:
+                return 0, None
+            headers = {"Client-ID": self.client_id, "Authorization": f"Bearer {token}"}
+            try:
+                async with self.get_session().request(method, url, headers=headers, **kwargs) as resp:
+                    if resp.status == 401:
+                        if attempt == 0 and self.can_refresh:
+                            self.stats["retries_401"] += 1
+                            self._invalidate(token)
+                            continue
+                        if not self.can_refresh and not self._expired_warned:
+                            self._expired_warned = True
+                            print("⚠️ Twitch: TWITCH_TOKEN недействителен. Задайте TWITCH_CLIENT_SECRET, "
+                                  "чтобы бот сам получал и обновлял токен")
+                    data = await resp.json(content_type=None) if resp.status != 204 else None
+                    return resp.status, data
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                return 0, None
+        return 401, None
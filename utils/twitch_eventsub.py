@@ -0,0 +1,188 @@
+"""
+Twitch EventSub (транспорт webhook)
+
+Twitch сам присылает stream.online / stream.offline на адрес дашборда, поэтому
+начало эфира видно через секунды, а не через интервал опроса Helix.
+
+- verify_message проверяет подпись HMAC-SHA256 (message_id + timestamp + тело)
+  и свежесть сообщения (не старше 10 минут);
+- EventSubManager отсеивает повторные доставки по Twitch-Eventsub-Message-Id и
+  приводит подписки на сервере Twitch к списку привязанных логинов.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from utils.twitch_auth import TwitchAppToken
+
+HELIX_URL = "https://api.twitch.tv/helix"
+SUBSCRIPTION_TYPES = ("stream.online", "stream.offline")
+MAX_MESSAGE_AGE = 600  # Twitch советует отклонять сообщения старше 10 минут
+SEEN_MESSAGES = 5000  # Сколько ID сообщений помним для отсева повторов
+USERS_BATCH_SIZE = 100
+CREATE_CONCURRENCY = 4
+ALIVE_STATUSES = ("enabled", "webhook_callback_verification_pending")
+
+# Заголовки сообщений EventSub
+HEADER_ID = "Twitch-Eventsub-Message-Id"
+HEADER_TIMESTAMP = "Twitch-Eventsub-Message-Timestamp"
+HEADER_SIGNATURE = "Twitch-Eventsub-Message-Signature"
+HEADER_TYPE = "Twitch-Eventsub-Message-Type"
+
+
+class EventSubError(Exception):
+    """Сообщение не прошло проверку"""
+
+
+def sign(secret: str, message_id: str, timestamp: str, body: bytes) -> str:
+    """Значение заголовка Twitch-Eventsub-Message-Signature"""
+    digest = hmac.new(secret.encode(), message_id.encode() + timestamp.encode() + body, hashlib.sha256)
+    return "sha256=" + digest.hexdigest()
+
+
+def parse_timestamp(value: str) -> float:
+    """RFC 3339 с наносекундами ("2024-01-01T12:00:00.123456789Z") → unix time"""
+    value = value.strip().replace("Z", "+00:00")
+    if "." in value:
+        head, rest = value.split(".", 1)
+        digits = rest[:len(rest) - len(rest.lstrip("0123456789"))]
+        value = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def verify_message(secret: str, headers: Mapping[str, str], body: bytes, now: Optional[float] = None):
+    """Проверить подпись и возраст сообщения; при ошибке — EventSubError"""
+    message_id = headers.get(HEADER_ID)
+    timestamp = headers.get(HEADER_TIMESTAMP)
+    signature = headers.get(HEADER_SIGNATURE)
+    if not message_id or not timestamp or not signature:
+        raise EventSubError("нет заголовков EventSub")
+
+    if not hmac.compare_digest(sign(secret, message_id, timestamp, body), signature):
+        raise EventSubError("неверная подпись")
+
+    try:
+        sent_at = parse_timestamp(timestamp)
+    except ValueError:
+        raise EventSubError("неверное время сообщения")
+    if abs((now or time.time()) - sent_at) > MAX_MESSAGE_AGE:
+        raise EventSubError("сообщение устарело")
+
+
+class EventSubManager:
+    """Подписки stream.online/offline для привязанных логинов"""
+
+    def __init__(self, auth: TwitchAppToken, callback_url: str, secret: str):
+        self.auth = auth
+        self.callback_url = callback_url
+        self.secret = secret
+
+        self._user_ids: Dict[str, str] = {}  # login → broadcaster_user_id
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self.covered: Set[str] = set()  # Логины, у которых обе подписки активны
+
+        self.stats = {"notifications": 0, "duplicates": 0, "rejected": 0, "revoked": 0,
+                      "created": 0, "deleted": 0, "subscriptions": 0}
+
+    # ---------- Входящие сообщения ----------
+
+    def seen(self, message_id: str) -> bool:
+        """True, если сообщение уже обрабатывалось (Twitch повторяет доставку)"""
+        if message_id in self._seen:
+            self._seen.move_to_end(message_id)
+            self.stats["duplicates"] += 1
+            return True
+        self._seen[message_id] = None
+        if len(self._seen) > SEEN_MESSAGES:
+            self._seen.popitem(last=False)
+        return False
+
+    # ---------- Helix ----------
+
+    async def _helix(self, method: str, path: str, params=None, payload=None) -> Tuple[int, dict]:
+        status, data = await self.auth.request(method, f"{HELIX_URL}/{path}", params=params, json=payload)
+        return status, data or {}
+
+    async def resolve_ids(self, logins: List[str]) -> Optional[Dict[str, str]]:
+        """ID каналов по логинам (по 100 за запрос, с кэшем); None — Helix не ответил"""
+        missing = [login for login in logins if login not in self._user_ids]
+        for i in range(0, len(missing), USERS_BATCH_SIZE):
+            chunk = missing[i:i + USERS_BATCH_SIZE]
+            status, data = await self._helix("GET", "users", params=[("login", login) for login in chunk])
+            if status != 200:
+                return None
+            for user in data.get("data", []):
+                self._user_ids[user["login"].lower()] = user["id"]
+        return {login: self._user_ids[login] for login in logins if login in self._user_ids}
+
+    async def list_subscriptions(self) -> Optional[List[dict]]:
+        """Подписки этого адреса (все страницы); None — ошибка"""
+        result, cursor = [], None
+        while True:
+            params = {"after": cursor} if cursor else None
+            status, data = await self._helix("GET", "eventsub/subscriptions", params=params)
+            if status != 200:
+                return None
+            result += [sub for sub in data.get("data", [])
+                       if sub.get("transport", {}).get("callback") == self.callback_url]
+            cursor = data.get("pagination", {}).get("cursor")
+            if not cursor:
+                return result
+
+    async def reconcile(self, logins: List[str]) -> bool:
+        """
+        Привести подписки к списку логинов: лишние и сломанные удалить, недостающие создать.
+        Возвращает True, если стоит повторить скоро: подписки ждут подтверждения адреса
+        или Helix не ответил (тогда ничего не удаляется).
+        """
+        if not self.auth.configured:
+            return False
+
+        user_ids = await self.resolve_ids(logins)
+        if user_ids is None:
+            # Без ID часть логинов выглядела бы отвязанной, и их рабочие подписки были бы удалены
+            return True
+        logins_by_id = {user_id: login for login, user_id in user_ids.items()}
+        existing = await self.list_subscriptions()
+        if existing is None:
+            return True
+
+        active: Dict[Tuple[str, str], str] = {}  # (type, broadcaster_id) → status
+        for sub in existing:
+            key = (sub["type"], sub.get("condition", {}).get("broadcaster_user_id"))
+            if key[0] in SUBSCRIPTION_TYPES and key[1] in logins_by_id \
+                    and sub["status"] in ALIVE_STATUSES and key not in active:
+                active[key] = sub["status"]
+                continue
+            status, _ = await self._helix("DELETE", "eventsub/subscriptions", params={"id": sub["id"]})
+            if status == 204:
+                self.stats["deleted"] += 1
+
+        semaphore = asyncio.Semaphore(CREATE_CONCURRENCY)
+
+        async def create(sub_type: str, user_id: str):
+            payload = {
+                "type": sub_type,
+                "version": "1",
+                "condition": {"broadcaster_user_id": user_id},
+                "transport": {"method": "webhook", "callback": self.callback_url, "secret": self.secret},
+            }
+            async with semaphore:
+                status, data = await self._helix("POST", "eventsub/subscriptions", payload=payload)
+            if status == 202:
+                self.stats["created"] += 1
+                active[(sub_type, user_id)] = data["data"][0]["status"]
+
+        await asyncio.gather(*(create(sub_type, user_id)
+                               for user_id in logins_by_id for sub_type in SUBSCRIPTION_TYPES
+                               if (sub_type, user_id) not in active))
+
+        self.covered = {login for user_id, login in logins_by_id.items()
+                        if all(active.get((t, user_id)) == "enabled" for t in SUBSCRIPTION_TYPES)}
+        self.stats["subscriptions"] = len(active)
+        return any(status != "enabled" for status in active.values())
@@ -0,0 +1,232 @@
+"""
+Определение эфиров YouTube с учётом квоты Data API
+
+search.list стоит 100 единиц квоты, поэтому каналы не опрашиваются через
+него. Вместо этого:
+1. бесплатная RSS-лента канала запрашивается условным GET
+   (ETag / If-Modified-Since) — новые ролики видны без квоты;
+2. новые ролики и уже отслеживаемые эфиры проверяются пачками по 50 ID
+   через videos.list (1 единица за запрос);
+3. QuotaBudget равномерно распределяет дневную квоту по суткам
+   (квота сбрасывается в полночь по тихоокеанскому времени).
+"""
+
+import asyncio
+import datetime
+import time
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:  # Нет базы часовых поясов (Windows без tzdata)
+    QUOTA_TZ = datetime.timezone(datetime.timedelta(hours=-8))
+
+FEED_URL = "https://www.youtube.com/feeds/videos.xml"
+VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+VIDEOS_BATCH_SIZE = 50
+FEED_CONCURRENCY = 8
+RECENT_PER_CHANNEL = 15  # Сколько последних ID ленты помним, чтобы узнавать новые
+UPCOMING_MAX_AGE = 7 * 24 * 3600  # Запланированные эфиры дольше недели перестаём отслеживать
+WATCH_INTERVAL = 120  # Отслеживаемые эфиры перепроверяются не чаще, чем раз в 2 минуты
+
+_ATOM = {"atom": "http://www.w3.org/2005/Atom", "yt": "http://www.youtube.com/xml/schemas/2015"}
+
+
+class QuotaBudget:
+    """Дневная квота, выдаваемая равномерно в течение суток"""
+
+    def __init__(self, daily_limit: int = 10000, burst: int = 50):
+        self.daily_limit = daily_limit
+        self.burst = burst  # Сколько можно потратить сверх равномерного графика
+        self.spent = 0
+        self._day = self._today()
+
+    @staticmethod
+    def _today() -> datetime.date:
+        return datetime.datetime.now(QUOTA_TZ).date()
+
+    def _day_fraction(self) -> float:
+        now = datetime.datetime.now(QUOTA_TZ)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return (now - midnight).total_seconds() / 86400
+
+    def available(self) -> int:
+        """Сколько единиц можно потратить прямо сейчас"""
+        if self._today() != self._day:
+            self._day = self._today()
+            self.spent = 0
+        allowance = int(self.daily_limit * self._day_fraction()) + self.burst
+        return max(0, min(allowance, self.daily_limit) - self.spent)
+
+    def spend(self, units: int):
+        self.spent += units
+
+
+class YouTubeLiveTracker:
+    """Отслеживание эфиров по RSS и пакетным videos.list"""
+
+    def __init__(self, get_session: Callable[[], aiohttp.ClientSession], api_key: Optional[str],
+                 budget: Optional[QuotaBudget] = None):
+        self.get_session = get_session
+        self.api_key = api_key
+        self.budget = budget or QuotaBudget()
+
+        self._feeds: Dict[str, dict] = {}  # channel_id → {etag, modified, recent: [video_id]}
+        self._pending: Dict[str, str] = {}  # Новые ролики, ещё не проверенные: video_id → channel_id
+        self._watching: Dict[str, dict] = {}  # Эфиры и запланированные: video_id → {channel, status, title, since}
+
+        self.stats = {"feeds": 0, "not_modified": 0, "videos_calls": 0, "deferred": 0}
+
+    # ---------- RSS ----------
+
+    async def _fetch_feed(self, channel_id: str) -> bool:
+        """Получить ленту канала; новые ролики попадают в _pending. False — ошибка"""
+        state = self._feeds.setdefault(channel_id, {"etag": None, "modified": None, "recent": None})
+        headers = {}
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state["modified"]:
+            headers["If-Modified-Since"] = state["modified"]
+
+        try:
+            async with self.get_session().get(FEED_URL, params={"channel_id": channel_id},
+                                              headers=headers) as resp:
+                if resp.status == 304:
+                    self.stats["not_modified"] += 1
+                    return True
+                if resp.status != 200:
+                    return False
+                body = await resp.read()
+                state["etag"] = resp.headers.get("ETag")
+                state["modified"] = resp.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+        self.stats["feeds"] += 1
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            return False
+        video_ids = [e.findtext("yt:videoId", namespaces=_ATOM) for e in root.findall("atom:entry", _ATOM)]
+        video_ids = [v for v in video_ids if v]
+
+        if state["recent"] is None:
+            # Первый запрос: проверяем только самые свежие ролики — идущий эфир будет среди них
+            new_ids = video_ids[:3]
+        else:
+            known = set(state["recent"])
+            new_ids = [v for v in video_ids if v not in known]
+        state["recent"] = video_ids[:RECENT_PER_CHANNEL]
+
+        for video_id in new_ids:
+            if video_id not in self._watching:
+                self._pending[video_id] = channel_id
+        return True
+
+    # ---------- Data API ----------
+
+    async def _fetch_videos(self, video_ids: List[str]) -> Optional[Dict[str, dict]]:
+        params = {
+            "part": "snippet,liveStreamingDetails",
+            "id": ",".join(video_ids),
+            "key": self.api_key,
+            "maxResults": VIDEOS_BATCH_SIZE,
+        }
+        self.budget.spend(1)
+        self.stats["videos_calls"] += 1
+        try:
+            async with self.get_session().get(VIDEOS_URL, params=params) as resp:
+                if resp.status != 200:
+                    return None
+                data = await resp.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+        return {item["id"]: item for item in data.get("items", [])}
+
+    def _apply(self, video_id: str, channel_id: str, item: Optional[dict]):
+        """Обновить отслеживание по ответу videos.list"""
+        status = (item or {}).get("snippet", {}).get("liveBroadcastContent", "none")
+        if status in ("live", "upcoming"):
+            watched = self._watching.get(video_id)
+            since = watched["since"] if watched else time.time()
+            if status == "upcoming" and time.time() - since > UPCOMING_MAX_AGE:
+                self._watching.pop(video_id, None)
+                return
+            self._watching[video_id] = {
+                "channel": channel_id,
+                "status": status,
+                "title": item["snippet"].get("title", ""),
+                "since": since,
+                "checked_at": time.time(),
+            }
+        else:
+            self._watching.pop(video_id, None)
+
+    # ---------- Проверка ----------
+
+    async def poll(self, channel_ids: List[str],
+                   linked: Optional[List[str]] = None) -> Tuple[Dict[str, dict], Set[str]]:
+        """
+        Проверить ленты channel_ids (и все отслеживаемые эфиры).
+        linked — все привязанные каналы (по умолчанию channel_ids): эфиры прочих забываются.
+        Возвращает (live: {channel_id: {title, url}}, checked: set каналов).
+        Статус каналов не из checked (ошибка ленты или отложенная из-за квоты проверка) не известен.
+        """
+        if not self.api_key:
+            return {}, set()
+
+        wanted = set(linked if linked is not None else channel_ids)
+        for video_id in [v for v, w in self._watching.items() if w["channel"] not in wanted]:
+            del self._watching[video_id]
+        for video_id in [v for v, c in self._pending.items() if c not in wanted]:
+            del self._pending[video_id]
+
+        semaphore = asyncio.Semaphore(FEED_CONCURRENCY)
+
+        async def fetch(channel_id):
+            async with semaphore:
+                return channel_id, await self._fetch_feed(channel_id)
+
+        results = await asyncio.gather(*(fetch(c) for c in channel_ids))
+        checked = {channel_id for channel_id, ok in results if ok}
+
+        # Сначала идущие эфиры (чтобы заметить конец), затем запланированные, затем новые ролики
+        now = time.time()
+        stale = {v: w for v, w in self._watching.items() if now - w["checked_at"] >= WATCH_INTERVAL}
+        queue = [v for v, w in stale.items() if w["status"] == "live"]
+        queue += [v for v, w in stale.items() if w["status"] == "upcoming"]
+        queue += [v for v in self._pending if v not in self._watching]
+
+        batches = [queue[i:i + VIDEOS_BATCH_SIZE] for i in range(0, len(queue), VIDEOS_BATCH_SIZE)]
+        affordable = min(len(batches), self.budget.available())
+        if affordable < len(batches):
+            self.stats["deferred"] += len(batches) - affordable
+            # Каналы с непроверенными роликами считаем непроверенными
+            for video_id in [v for batch in batches[affordable:] for v in batch]:
+                channel_id = self._watching[video_id]["channel"] if video_id in self._watching \
+                    else self._pending[video_id]
+                checked.discard(channel_id)
+
+        for batch in batches[:affordable]:
+            items = await self._fetch_videos(batch)
+            for video_id in batch:
+                channel_id = self._watching[video_id]["channel"] if video_id in self._watching \
+                    else self._pending[video_id]
+                if items is None:
+                    checked.discard(channel_id)
+                    continue
+                self._pending.pop(video_id, None)
+                self._apply(video_id, channel_id, items.get(video_id))
+
+        live = {}
+        for video_id, watched in self._watching.items():
+            if watched["status"] == "live" and watched["channel"] not in live:
+                live[watched["channel"]] = {
+                    "title": watched["title"],
+                    "url": f"https://www.youtube.com/watch?v={video_id}",
+                }
+        return live, checked
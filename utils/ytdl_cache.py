@@ -0,0 +1,206 @@
+"""
+Кэш метаданных yt-dlp
+
+extract_info занимает секунды, а популярные треки запрашиваются десятки раз
+в день. Кэш хранит результаты по нормализованному ключу (ID видео YouTube,
+ссылка без мусорных параметров или поисковый запрос):
+- в памяти — LRU на max_entries записей;
+- на диске (db_path=None — без диска) — SQLite с TTL, переживает перезапуск.
+
+Метаданные (название, длительность, автор) стабильны и живут metadata_ttl.
+Ссылка на поток истекает (у YouTube — параметр expire в URL), поэтому для
+воспроизведения (stream=True) она проверяется отдельно и при истечении
+извлекается заново. Одновременные запросы одного ключа ждут одно извлечение.
+"""
+
+import asyncio
+import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+DEFAULT_DB_FILE = "ytdl_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 512
+METADATA_TTL = 7 * 24 * 3600
+STREAM_TTL = 30 * 60  # Если в ссылке нет expire
+STREAM_MARGIN = 10 * 60  # Ссылка должна жить ещё хотя бы столько, чтобы трек успел доиграть
+
+# Поля, которые нужны плееру: весь ответ yt-dlp (форматы и т.п.) занимает сотни КБ
+KEEP_FIELDS = ("id", "title", "url", "webpage_url", "duration", "thumbnail", "uploader", "extractor", "ext")
+DROP_PARAMS = ("si", "feature", "pp", "list", "index", "t", "start_radio")
+
+_YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com")
+
+
+def normalize_query(query: str) -> str:
+    """Ключ кэша: yt:<id> для YouTube, ссылка без мусора, search:<запрос> для поиска"""
+    query = query.strip()
+    if not re.match(r"^https?://", query, re.IGNORECASE):
+        return "search:" + " ".join(query.casefold().split())
+
+    parts = urlsplit(query)
+    host = parts.netloc.lower()
+    params = parse_qs(parts.query)
+    video_id = None
+    if host in ("youtu.be", "www.youtu.be"):
+        video_id = parts.path.strip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        if parts.path == "/watch":
+            video_id = params.get("v", [None])[0]
+        elif parts.path.startswith(("/shorts/", "/live/", "/embed/")):
+            video_id = parts.path.split("/")[2]
+    if video_id and _YOUTUBE_ID.match(video_id):
+        return f"yt:{video_id}"
+
+    kept = [(k, v) for k, values in sorted(params.items()) if k not in DROP_PARAMS and not k.startswith("utm_")
+            for v in values]
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/"), urlencode(kept), ""))
+
+
+def stream_expires_at(data: dict, now: float) -> float:
+    """Когда истекает ссылка на поток (0 — ссылки нет)"""
+    url = data.get("url")
+    if not url:
+        return 0.0
+    expire = parse_qs(urlsplit(url).query).get("expire")
+    if not expire:
+        match = re.search(r"/expire/(\d+)", url)  # HLS-ссылки YouTube
+        expire = [match.group(1)] if match else None
+    try:
+        return float(expire[0]) if expire else now + STREAM_TTL
+    except ValueError:
+        return now + STREAM_TTL
+
+
+class YTDLCache:
+    """LRU + SQLite кэш результатов extract_info с объединением одновременных запросов"""
+
+    def __init__(self, extract: Callable[[str], Awaitable[dict]], db_path: Optional[str] = DEFAULT_DB_FILE,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, metadata_ttl: float = METADATA_TTL):
+        self.extract = extract  # Асинхронное извлечение (в пуле), возвращает одну запись без entries
+        self.max_entries = max_entries
+        self.metadata_ttl = metadata_ttl
+
+        # ключ → (данные, время извлечения, срок ссылки на поток)
+        self._entries: "OrderedDict[str, Tuple[dict, float, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS ytdl_cache ("
+                "key TEXT PRIMARY KEY, "
+                "data TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, "
+                "stream_expires_at REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM ytdl_cache WHERE fetched_at < ?", (time.time() - metadata_ttl,))
+            self.db.commit()
+
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stream_refreshes": 0, "coalesced": 0}
+
+    # ---------- Хранилище ----------
+
+    def _lookup(self, key: str) -> Optional[Tuple[dict, float, float]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        if self.db is None:
+            return None
+        row = self.db.execute(
+            "SELECT data, fetched_at, stream_expires_at FROM ytdl_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = (json.loads(row[0]), row[1], row[2])
+        self._remember(key, entry)
+        self.stats["disk_hits"] += 1
+        return entry
+
+    def _remember(self, key: str, entry: Tuple[dict, float, float]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _store(self, keys, data: dict):
+        now = time.time()
+        entry = (data, now, stream_expires_at(data, now))
+        for key in keys:
+            self._remember(key, entry)
+        if self.db is not None:
+            payload = json.dumps(data, ensure_ascii=False)
+            self.db.executemany(
+                "INSERT OR REPLACE INTO ytdl_cache (key, data, fetched_at, stream_expires_at) VALUES (?, ?, ?, ?)",
+                [(key, payload, entry[1], entry[2]) for key in keys]
+            )
+            self.db.commit()
+
+    def invalidate_stream(self, query: str):
+        """Ссылка на поток не сработала — при следующем запросе извлечь заново (метаданные остаются)"""
+        key = normalize_query(query)
+        entry = self._lookup(key)
+        # Запись хранится под несколькими ключами (поиск, ссылки на видео) — сбрасываем все
+        webpage_url = entry[0].get("webpage_url") if entry is not None else None
+        stale = [k for k, e in self._entries.items()
+                 if k == key or (webpage_url and e[0].get("webpage_url") == webpage_url)]
+        for k in stale:
+            data, fetched_at, _ = self._entries[k]
+            self._entries[k] = (data, fetched_at, 0.0)
+        if self.db is not None:
+            self.db.execute(
+                "UPDATE ytdl_cache SET stream_expires_at = 0 "
+                "WHERE key = ? OR json_extract(data, '$.webpage_url') = ?", (key, webpage_url)
+            )
+            self.db.commit()
+
+    # ---------- Получение ----------
+
+    async def get(self, query: str, stream: bool = False) -> dict:
+        """
+        Данные трека (копия). stream=True — нужна действующая ссылка на поток,
+        иначе достаточно метаданных. Ошибки извлечения пробрасываются.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        entry = self._lookup(key)
+        if entry is not None and now - entry[1] < self.metadata_ttl:
+            if not stream or entry[2] - now > STREAM_MARGIN:
+                self.stats["hits"] += 1
+                return dict(entry[0])
+            self.stats["stream_refreshes"] += 1
+        else:
+            self.stats["misses"] += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            # Извлечение — отдельная задача: отмена одного из ожидающих (например, выброшенной
+            # заготовки трека) не отменяет его для остальных
+            task = self._inflight[key] = asyncio.create_task(self._fetch(key, query))
+            task.add_done_callback(lambda done: self._fetched(key, done))
+        return dict(await asyncio.shield(task))
+
+    def _fetched(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Все ожидающие могли уйти: не шумим «exception was never retrieved»
+
+    async def _fetch(self, key: str, query: str) -> dict:
+        data = await self.extract(query)
+        data = {field: data[field] for field in KEEP_FIELDS if data.get(field) is not None}
+        # Поиск и ссылки разного вида ведут на одно видео: сохраняем и под его ключом
+        keys = {key}
+        if data.get("webpage_url"):
+            keys.add(normalize_query(data["webpage_url"]))
+        self._store(keys, data)
+        return data
@@ -0,0 +1,224 @@
+"""
+Отдельный пул процессов для yt-dlp
+
+Разбор страниц yt-dlp — чистый Python: в общем пуле потоков он держит GIL,
+тормозит цикл событий (вплоть до пропуска heartbeat шлюза) и занимает потоки,
+нужные другим блокирующим вызовам. Здесь извлечение идёт в нескольких
+процессах:
+- процессы ответвляются от forkserver, в котором yt-dlp уже импортирован
+  (а не от работающего бота с его потоками и памятью); экземпляр YoutubeDL
+  создаётся в каждом процессе один раз, start() прогревает их заранее;
+- очередь ждёт в боте, а не в пуле: вызов уходит в пул, только когда есть
+  свободный процесс, поэтому таймаут считает само извлечение; зависший
+  процесс можно остановить только вместе с пулом — он пересоздаётся, а
+  остальные прерванные этим вызовы повторяются;
+- считается время ожидания в очереди и время самого извлечения.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import yt_dlp as youtube_dl
+
+from utils.ytdl_cache import KEEP_FIELDS
+
+DEFAULT_WORKERS = 2
+EXTRACT_TIMEOUT = 90  # yt-dlp сам повторяет запросы (retries), даём ему время
+SLOW_WAIT = 5.0  # Ожидание в очереди дольше этого — пулу не хватает процессов
+SLOW_EXTRACT = 30.0
+
+
+# Создаем ytdl с обработчиком ошибок
+class CustomYTDL(youtube_dl.YoutubeDL):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def extract_info(self, url, download=True, process=False, force_generic_extractor=False):
+        try:
+            return super().extract_info(url, download, process, force_generic_extractor)
+        except Exception as e:
+            print(f"YTDL Error: {e}")
+            # Пробуем альтернативный подход
+            return self._extract_with_fallback(url)
+
+    def _extract_with_fallback(self, url):
+        # Альтернативные настройки для проблемных видео
+        fallback_options = self.params.copy()
+        fallback_options.update({
+            'format': 'worstaudio/worst',
+            'retries': 20,
+            'fragment_retries': 20,
+            'skip_unavailable_fragments': True,
+            'ignoreerrors': True,
+        })
+
+        with youtube_dl.YoutubeDL(fallback_options) as ytdl_fallback:
+            return ytdl_fallback.extract_info(url, download=False)
+
+
+# ---------- Код рабочих процессов ----------
+
+_ytdl: Optional[CustomYTDL] = None
+
+
+def _init_worker(options: dict):
+    global _ytdl
+    _ytdl = CustomYTDL(options)
+
+
+def _warm_up():
+    time.sleep(0.5)  # Занять процесс, чтобы следующий прогрев достался новому
+
+
+def _extract(query: str, download: bool):
+    """(данные трека, начало, конец) — время по time.time(), чтобы сравнивать между процессами"""
+    started = time.time()
+    data = _ytdl.extract_info(query, download=download)
+    if data is None:
+        raise ValueError(f"yt-dlp ничего не нашёл: {query}")
+    if 'entries' in data:
+        # StopIteration нельзя передать в asyncio-future — вызывающий завис бы до таймаута
+        data = next(iter(data['entries']), None)
+        if data is None:
+            raise ValueError(f"yt-dlp ничего не нашёл: {query}")
+    result = {field: data[field] for field in KEEP_FIELDS if data.get(field) is not None}
+    if download:
+        result['filepath'] = _ytdl.prepare_filename(data)
+    # Полный ответ с форматами весит сотни КБ — через процесс передаём только нужное
+    return result, started, time.time()
+
+
+def _mp_context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # __main__ — иначе каждый процесс заново выполнял бы main.py; теперь это происходит один раз
+        # в самом forkserver, а процессы пула ответвляются от него уже с импортированным yt-dlp
+        context.set_forkserver_preload(["__main__", __name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+# ---------- Пул ----------
+
+class YTDLPool:
+    """Ограниченный пул процессов с прогретыми экземплярами YoutubeDL"""
+
+    def __init__(self, options: dict, max_workers: int = DEFAULT_WORKERS, timeout: float = EXTRACT_TIMEOUT):
+        self.options = options
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max_workers)  # Свободные процессы
+        self._timed_out: Optional[ProcessPoolExecutor] = None  # Пул, остановленный из-за таймаута
+
+        self.stats = {"extractions": 0, "errors": 0, "timeouts": 0, "restarts": 0,
+                      "wait_total": 0.0, "wait_max": 0.0, "extract_total": 0.0, "extract_max": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=_mp_context(),
+                initializer=_init_worker,
+                initargs=(self.options,),
+            )
+        return self._executor
+
+    def start(self):
+        """Запустить процессы заранее, чтобы первый /play не ждал импорта yt-dlp"""
+        executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(_warm_up)
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _restart(self):
+        """Остановить все процессы (зависший иначе не прервать) и прогреть новые"""
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        self.stats["restarts"] += 1
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    async def extract(self, query: str, download: bool = False, timeout: Optional[float] = None) -> dict:
+        """
+        Данные трека (первый результат для поиска/плейлиста). download=True — скачать,
+        путь к файлу в 'filepath'. По таймауту — asyncio.TimeoutError.
+        """
+        for attempt in range(2):
+            queued = time.time()
+            # Очередь держим у себя: в пул уходит не больше вызовов, чем процессов, поэтому отправленный
+            # вызов сразу выполняется, и таймаут считает только время извлечения, а не ожидание
+            await self._slots.acquire()
+            executor = self._get_executor()
+            try:
+                return await self._run(executor, query, download, timeout or self.timeout, time.time() - queued)
+            except BrokenProcessPool:
+                # Пул перезапущен из-за чужого зависшего вызова — этот ни при чём, повторяем один раз
+                if attempt or executor is not self._timed_out:
+                    raise
+
+    def _release_slot(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            pass  # Цикл событий уже закрыт — бот выключается
+
+    async def _run(self, executor: ProcessPoolExecutor, query: str, download: bool,
+                   timeout: float, waited: float) -> dict:
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        try:
+            future = executor.submit(_extract, query, download)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Место освобождается, когда процесс закончил, даже если вызывающий уже не ждёт
+        future.add_done_callback(lambda _: self._release_slot(loop))
+        try:
+            data, started, finished = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            print(f"⏱️ yt-dlp: извлечение дольше {timeout} с, перезапуск пула ({query})")
+            if self._executor is executor:
+                self._timed_out = executor
+                self._restart()  # Зависший процесс иначе не остановить
+            raise
+        except BrokenProcessPool:
+            if executor is not self._timed_out:
+                self.stats["errors"] += 1
+                if self._executor is executor:
+                    self._restart()
+            raise
+        except asyncio.CancelledError:
+            raise  # Запущенное извлечение доработает, результат просто не нужен
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+        wait, elapsed = waited + max(0.0, started - submitted), finished - started
+        self.stats["extractions"] += 1
+        self.stats["wait_total"] += wait
+        self.stats["extract_total"] += elapsed
+        self.stats["wait_max"] = max(self.stats["wait_max"], wait)
+        self.stats["extract_max"] = max(self.stats["extract_max"], elapsed)
+        if wait > SLOW_WAIT or elapsed > SLOW_EXTRACT:
+            print(f"🐢 yt-dlp: ожидание в очереди {wait:.1f} с, извлечение {elapsed:.1f} с ({query})")
+        return data
+
+    def report(self) -> str:
+        count = self.stats["extractions"] or 1
+        return (f"yt-dlp: {self.stats['extractions']} извлечений, "
+                f"очередь ср. {self.stats['wait_total'] / count:.2f} с (макс. {self.stats['wait_max']:.1f}), "
+                f"извлечение ср. {self.stats['extract_total'] / count:.2f} с (макс. {self.stats['extract_max']:.1f}), "
+                f"таймаутов {self.stats['timeouts']}, перезапусков {self.stats['restarts']}")